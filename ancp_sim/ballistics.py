@@ -0,0 +1,506 @@
+"""
+This module simulates the internal ballistics of solid motors over a burn.
+
+A motor design is a grain (BATES, tubular or end-burner), a throat and a
+nozzle expansion ratio. The grain burns back by the Saint-Robert law of the
+configuration, with the ferric oxide catalyst multiplier, and the chamber
+pressure follows from the quasi-steady mass balance
+
+    rho_p * A_burn * r(Pc) = Pc * A_throat / C*(Pc),
+
+which holds because the chamber fills and empties in milliseconds while the
+grain burns for seconds. The burn is stepped in web distance rather than in
+time, so every design takes the same number of steps however long it burns,
+and all designs advance together as NumPy arrays. After burnout the chamber
+gas blows down exponentially through the throat.
+
+C* and gamma come from a ChamberLookup: a handful of equilibrium solves over
+a pressure grid (through the result cache) or a precomputed ThermoTable,
+interpolated in log(p). No Cantera call is made during the burn.
+"""
+import argparse
+import csv
+import json
+import logging
+import math
+import sys
+
+import numpy as np
+
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.config import load_config
+from ancp_sim.main import (add_cache_arguments, cache_from_args, warm_start_index_from_args, add_logging_arguments,
+                           load_recipe)
+from ancp_sim.performance import GAS_CONSTANT, G0, burn_rate_law
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.ballistics')
+
+# Grain type -> (core burns, number of burning end faces). The outer surface
+# is always inhibited (case-bonded or cartridge-loaded).
+GRAIN_TYPES = {
+    'bates': (True, 2),
+    'tubular': (True, 0),
+    'end_burner': (False, 1),
+}
+
+# Chamber pressures at which the lookup is solved by default, in bar
+LOOKUP_PRESSURES_BAR = (2.0, 5.0, 10.0, 20.0, 35.0, 50.0, 70.0, 100.0, 150.0, 200.0)
+
+DEFAULT_STEPS = 200
+
+# Number of samples of the blowdown after burnout, spanning TAIL_TIME_CONSTANTS
+TAIL_STEPS = 20
+TAIL_TIME_CONSTANTS = 5.0
+
+# Bisection iterations of the exit Mach number (the bracket shrinks 2^-50-fold)
+MACH_ITERATIONS = 50
+
+
+class ChamberLookup:
+    """
+    C*, gamma and the gas constant times temperature over chamber pressure.
+
+    Values are interpolated linearly in log(p) and held constant outside
+    the tabulated pressures.
+    """
+
+    def __init__(self, pressures_bar, c_star_m_s, gamma, rt):
+        """
+        Args:
+            pressures_bar (array-like): Increasing chamber pressures in bar.
+            c_star_m_s (array-like): Ideal characteristic velocity at each pressure.
+            gamma (array-like): Ratio of specific heats at each pressure.
+            rt (array-like): Specific gas constant times flame temperature
+                (R_u / M * T_flame) in J/kg at each pressure.
+        """
+        self.pressures_bar = np.asarray(pressures_bar, dtype=float)
+        if self.pressures_bar.ndim != 1 or len(self.pressures_bar) < 1 or np.any(np.diff(self.pressures_bar) <= 0):
+            raise ValueError("The lookup pressures must be increasing.")
+        self._log_p = np.log(self.pressures_bar)
+        self.c_star_m_s = np.asarray(c_star_m_s, dtype=float)
+        self.gamma = np.asarray(gamma, dtype=float)
+        self.rt = np.asarray(rt, dtype=float)
+        if np.any(~np.isfinite(self.c_star_m_s)) or np.any(~np.isfinite(self.gamma)):
+            raise ValueError("The lookup contains failed points.")
+
+    @classmethod
+    def from_engine(cls, engine, recipe, ingredients_db, pressures_bar=LOOKUP_PRESSURES_BAR):
+        """
+        Solves the chamber equilibrium at each lookup pressure.
+
+        Args:
+            engine (ThermoEngine): The engine; its result cache and warm-start
+                index are used, so repeated runs do not solve again.
+            recipe (dict): Ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            pressures_bar (iterable): Increasing chamber pressures in bar.
+
+        Returns:
+            ChamberLookup: The lookup.
+        """
+        from ancp_sim.performance import ideal_performance
+
+        c_star, gamma, rt = [], [], []
+        warm_start = None
+        for pressure in pressures_bar:
+            state = engine.chamber_state(recipe, ingredients_db, pressure, warm_start=warm_start)
+            c_star.append(ideal_performance(state)['c_star_m_s'])
+            gamma.append(state.gamma)
+            rt.append(GAS_CONSTANT / state.molecular_weight_g_mol * state.t_flame_K)
+            warm_start = (state.t_flame_K, state.product_mole_fractions)
+        return cls(pressures_bar, c_star, gamma, rt)
+
+    @classmethod
+    def from_table(cls, table, recipe):
+        """
+        Reads the lookup from a thermochemistry table along its pressure axis.
+
+        Args:
+            table (ThermoTable): A table from `ancp_sim.tables`.
+            recipe (dict): The recipe; its percentages of the table's
+                composition axis ingredients select the table point.
+
+        Returns:
+            ChamberLookup: The lookup, at the table's pressures.
+        """
+        composition = []
+        for name in table.axis_names[1:]:
+            if name not in recipe:
+                raise ValueError(f"The recipe has no '{name}', which is a composition axis of the table.")
+            composition.append(recipe[name])
+        pressures = table.axes[0]
+        values = {quantity: table.interpolate(quantity, pressures, *composition)
+                  for quantity in ('c_star_m_s', 'gamma', 't_flame_K', 'product_molecular_weight_g_mol')}
+        rt = GAS_CONSTANT / values['product_molecular_weight_g_mol'] * values['t_flame_K']
+        return cls(pressures, values['c_star_m_s'], values['gamma'], rt)
+
+    def __call__(self, pressure_bar):
+        """
+        Looks up the chamber properties at an array of pressures.
+
+        Args:
+            pressure_bar (array-like): Chamber pressures in bar.
+
+        Returns:
+            tuple: Arrays (c_star_m_s, gamma, rt) shaped like pressure_bar.
+        """
+        pressure_bar = np.asarray(pressure_bar, dtype=float)
+        x = np.log(np.maximum(pressure_bar, 1e-12)).ravel()
+        return tuple(np.interp(x, self._log_p, values).reshape(pressure_bar.shape)
+                     for values in (self.c_star_m_s, self.gamma, self.rt))
+
+    def covers(self, pressure_bar):
+        """Returns whether all pressures lie within the tabulated range."""
+        pressure_bar = np.asarray(pressure_bar, dtype=float)
+        return bool(np.all((pressure_bar >= self.pressures_bar[0]) & (pressure_bar <= self.pressures_bar[-1])))
+
+
+def parse_design(data):
+    """
+    Validates a motor design.
+
+    Args:
+        data (dict): The design, e.g. {"name": "38mm 2-grain", "grain": {"type": "bates",
+            "outer_diameter_mm": 33, "core_diameter_mm": 12, "length_mm": 60, "segments": 2},
+            "throat_diameter_mm": 8, "expansion_ratio": 6}. 'core_diameter_mm' is not used by
+            end-burners, 'segments' defaults to 1 and 'expansion_ratio' to 1 (no divergent).
+
+    Returns:
+        dict: The design with numeric values and its defaults filled in.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('grain'), dict):
+        raise ValueError("A design needs a 'grain' object.")
+    grain = dict(data['grain'])
+    grain_type = grain.get('type')
+    if grain_type not in GRAIN_TYPES:
+        raise ValueError(f"Unknown grain type {grain_type!r}, expected one of {list(GRAIN_TYPES)}.")
+
+    def number(source, key, default=None):
+        value = source.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"'{key}' must be a number.")
+        return float(value)
+
+    grain['outer_diameter_mm'] = number(grain, 'outer_diameter_mm')
+    grain['length_mm'] = number(grain, 'length_mm')
+    grain['segments'] = int(number(grain, 'segments', 1))
+    core, _ = GRAIN_TYPES[grain_type]
+    grain['core_diameter_mm'] = number(grain, 'core_diameter_mm') if core else 0.0
+    if grain['outer_diameter_mm'] <= 0 or grain['length_mm'] <= 0 or grain['segments'] < 1:
+        raise ValueError("The grain dimensions and segment count must be positive.")
+    if core and not 0 < grain['core_diameter_mm'] < grain['outer_diameter_mm']:
+        raise ValueError("The core diameter must lie between 0 and the outer diameter.")
+
+    design = {
+        'name': str(data.get('name', grain_type)),
+        'grain': grain,
+        'throat_diameter_mm': number(data, 'throat_diameter_mm'),
+        'expansion_ratio': number(data, 'expansion_ratio', 1.0),
+    }
+    if design['throat_diameter_mm'] <= 0:
+        raise ValueError("The throat diameter must be positive.")
+    if design['expansion_ratio'] < 1:
+        raise ValueError("The expansion ratio must be at least 1.")
+    return design
+
+
+class _Grains:
+    """The geometry of many grains as arrays, in meters."""
+
+    def __init__(self, designs):
+        grains = [design['grain'] for design in designs]
+        self.outer = np.array([grain['outer_diameter_mm'] for grain in grains]) / 1000
+        self.core = np.array([grain['core_diameter_mm'] for grain in grains]) / 1000
+        self.length = np.array([grain['length_mm'] for grain in grains]) / 1000
+        self.segments = np.array([grain['segments'] for grain in grains], dtype=float)
+        self.core_burns = np.array([GRAIN_TYPES[grain['type']][0] for grain in grains], dtype=float)
+        self.burning_ends = np.array([GRAIN_TYPES[grain['type']][1] for grain in grains], dtype=float)
+
+        radial = np.where(self.core_burns > 0, (self.outer - self.core) / 2, np.inf)
+        with np.errstate(divide='ignore'):
+            axial = np.where(self.burning_ends > 0, self.length / self.burning_ends, np.inf)
+        self.web = np.minimum(radial, axial)
+
+    def _dimensions(self, regression):
+        core = self.core + 2 * regression * self.core_burns
+        length = self.length - regression * self.burning_ends
+        return core, length
+
+    def burn_area(self, regression):
+        """Burning surface area in m2 after a web regression in m (broadcast against the designs)."""
+        core, length = self._dimensions(regression)
+        return self.segments * (self.core_burns * math.pi * core * length
+                                + self.burning_ends * math.pi / 4 * (self.outer**2 - core**2))
+
+    def volume(self, regression):
+        """Propellant volume in m3 left after a web regression in m."""
+        core, length = self._dimensions(regression)
+        return self.segments * math.pi / 4 * (self.outer**2 - core**2) * length
+
+    @property
+    def case_volume(self):
+        """The volume inside the case along the grain, in m3."""
+        return self.segments * math.pi / 4 * self.outer**2 * self.length
+
+
+def exit_pressure_ratio(expansion_ratio, gamma):
+    """
+    Solves the supersonic area-Mach relation for the exit-to-chamber pressure ratio.
+
+    Args:
+        expansion_ratio (array-like): Exit-to-throat area ratios (>= 1).
+        gamma (array-like): Ratios of specific heats; broadcast against expansion_ratio.
+
+    Returns:
+        np.ndarray: pe/pc of isentropic, frozen expansion.
+    """
+    expansion_ratio, gamma = np.broadcast_arrays(np.asarray(expansion_ratio, dtype=float),
+                                                 np.asarray(gamma, dtype=float))
+    exponent = (gamma + 1) / (2 * (gamma - 1))
+    low = np.ones(expansion_ratio.shape)
+    high = np.full(expansion_ratio.shape, 50.0)
+    for _ in range(MACH_ITERATIONS):
+        mach = (low + high) / 2
+        area = (2 / (gamma + 1) * (1 + (gamma - 1) / 2 * mach**2))**exponent / mach
+        # The area ratio increases with Mach on the supersonic branch
+        too_fast = area > expansion_ratio
+        high = np.where(too_fast, mach, high)
+        low = np.where(too_fast, low, mach)
+    mach = (low + high) / 2
+    return (1 + (gamma - 1) / 2 * mach**2)**(-gamma / (gamma - 1))
+
+
+def thrust_coefficient(gamma, expansion_ratio, chamber_pressure_bar, ambient_pressure_bar):
+    """
+    Computes the ideal thrust coefficient, with the pressure thrust at ambient.
+
+    All arguments are broadcast against each other.
+
+    Returns:
+        np.ndarray: C_F = F / (Pc * A_throat).
+    """
+    gamma = np.asarray(gamma, dtype=float)
+    pressure_ratio = exit_pressure_ratio(expansion_ratio, gamma)
+    momentum = np.sqrt(2 * gamma**2 / (gamma - 1) * (2 / (gamma + 1))**((gamma + 1) / (gamma - 1))
+                       * (1 - pressure_ratio**((gamma - 1) / gamma)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pressure = (pressure_ratio - ambient_pressure_bar / chamber_pressure_bar) * expansion_ratio
+    return momentum + np.nan_to_num(pressure, nan=0.0, neginf=0.0)
+
+
+def motor_class(total_impulse_ns):
+    """Returns the motor class letter of a total impulse (A: up to 2.5 Ns, each letter doubling)."""
+    if total_impulse_ns <= 2.5:
+        return 'A'
+    return chr(ord('A') + math.ceil(math.log2(total_impulse_ns / 2.5)))
+
+
+def propellant_density_g_cm3(recipe, ingredients_db):
+    """Returns the ideal-mixing (void-free) density of a recipe in g/cm3."""
+    total = sum(recipe.values())
+    missing = [name for name in recipe if 'density_g_cm3' not in ingredients_db.get(name, {})]
+    if missing:
+        raise ValueError(f"No density for {missing}.")
+    return total / sum(pct / ingredients_db[name]['density_g_cm3'] for name, pct in recipe.items())
+
+
+def simulate_motors(designs, lookup, config, composition, density_g_cm3,
+                    ambient_pressure_bar=1.01325, steps=DEFAULT_STEPS):
+    """
+    Simulates the burn of many motor designs of one propellant together.
+
+    Args:
+        designs (list): Motor designs (see `parse_design`).
+        lookup (ChamberLookup): C*, gamma and R*T over chamber pressure.
+        config (Mapping): The configuration; its burn-rate law and catalyst
+            multiplier give the regression rate, its combustion efficiency
+            scales C* and its nozzle and two-phase efficiencies the thrust.
+        composition (dict): The recipe, for the catalyst check.
+        density_g_cm3 (float): Propellant density.
+        ambient_pressure_bar (float): Ambient pressure for the pressure thrust.
+        steps (int): Web increments of each burn.
+
+    Returns:
+        dict: 'designs' (the parsed designs) and, shaped (steps + TAIL_STEPS,
+            number of designs), 'time_s', 'pressure_bar', 'thrust_N' and
+            'mass_flow_kg_s', plus 'summary': one dict per design with
+            'name', 'propellant_mass_kg', 'kn_initial', 'kn_max',
+            'burn_time_s', 'max_pressure_bar', 'average_pressure_bar',
+            'total_impulse_Ns', 'delivered_isp_s' and 'motor_class'.
+    """
+    designs = [parse_design(design) for design in designs]
+    if not designs:
+        raise ValueError("No motor designs given.")
+    law = burn_rate_law(composition, config)
+    if law is None:
+        raise ValueError("The configuration has no burn-rate law.")
+    a, n = law
+    if not 0 <= n < 1:
+        raise ValueError(f"Burn-rate exponent {n} gives no stable chamber pressure; it must lie in [0, 1).")
+    efficiencies = config.get('efficiencies', {})
+    combustion_efficiency = efficiencies.get('combustion_efficiency', 1.0)
+    thrust_efficiency = efficiencies.get('nozzle_efficiency', 1.0) * efficiencies.get('two_phase_efficiency', 1.0)
+
+    grains = _Grains(designs)
+    throat_area = math.pi / 4 * (np.array([design['throat_diameter_mm'] for design in designs]) / 1000)**2
+    expansion_ratio = np.array([design['expansion_ratio'] for design in designs])
+    density = density_g_cm3 * 1000
+
+    # Web regression at the step edges and midpoints, shaped (steps (+1), designs)
+    fractions = np.linspace(0.0, 1.0, steps + 1)[:, None]
+    edges = fractions * grains.web
+    midpoints = (edges[1:] + edges[:-1]) / 2
+    kn = grains.burn_area(midpoints) / throat_area
+
+    # Quasi-steady pressure: Pc = (rho * Kn * C* * a')^(1 / (1 - n)) in Pa with
+    # r = a' * Pc^n in m/s, solved by fixed-point iteration on C*(Pc)
+    rate_coefficient = a * 1e-3 * 1e-6**n
+    pressure_bar = np.full(kn.shape, 70.0)
+    for _ in range(4):
+        c_star = lookup(pressure_bar)[0] * combustion_efficiency
+        pressure_bar = (density * kn * c_star * rate_coefficient)**(1 / (1 - n)) / 1e5
+    c_star, gamma, rt = lookup(pressure_bar)
+    c_star = c_star * combustion_efficiency
+    if not lookup.covers(pressure_bar[kn > 0]):
+        logger.warning(f"Chamber pressures of {pressure_bar.min():.3g}-{pressure_bar.max():.3g} bar leave the "
+                       f"lookup range {lookup.pressures_bar[0]:g}-{lookup.pressures_bar[-1]:g} bar; "
+                       "C* and gamma are held at the edge values.")
+
+    rate = rate_coefficient * (pressure_bar * 1e5)**n
+    step_time = (edges[1:] - edges[:-1]) / rate
+    burned = grains.volume(edges[:-1]) - grains.volume(edges[1:])
+    mass_flow = density * burned / step_time
+    time = np.cumsum(step_time, axis=0) - step_time / 2
+    burn_time = time[-1] + step_time[-1] / 2
+    cf = thrust_coefficient(gamma, expansion_ratio, pressure_bar, ambient_pressure_bar)
+    thrust = np.maximum(cf * thrust_efficiency * pressure_bar * 1e5 * throat_area, 0.0)
+
+    # Blowdown of the chamber gas: dPc/dt = -Pc * A_t * R*T / (V * C*)
+    time_constant = grains.case_volume * c_star[-1] / (throat_area * rt[-1])
+    tail = np.linspace(0.0, TAIL_TIME_CONSTANTS, TAIL_STEPS + 1)[1:, None]
+    tail_pressure = pressure_bar[-1] * np.exp(-tail)
+    tail_cf = thrust_coefficient(gamma[-1], expansion_ratio, tail_pressure, ambient_pressure_bar)
+    tail_thrust = np.maximum(tail_cf * thrust_efficiency * tail_pressure * 1e5 * throat_area, 0.0)
+    tail_time = burn_time + tail * time_constant
+
+    time = np.vstack([time, tail_time])
+    pressure_bar = np.vstack([pressure_bar, tail_pressure])
+    thrust = np.vstack([thrust, tail_thrust])
+    mass_flow = np.vstack([mass_flow, tail_pressure * 1e5 * throat_area / c_star[-1]])
+
+    burn_impulse = (thrust[:steps] * step_time).sum(axis=0)
+    # Trapezoidal rule from the last burn step through the blowdown
+    tail_curve = thrust[steps - 1:]
+    tail_impulse = ((tail_curve[1:] + tail_curve[:-1]) / 2 * np.diff(time[steps - 1:], axis=0)).sum(axis=0)
+    total_impulse = burn_impulse + tail_impulse
+    propellant_mass = density * grains.volume(0.0)
+
+    summary = []
+    for i, design in enumerate(designs):
+        summary.append({
+            'name': design['name'],
+            'propellant_mass_kg': float(propellant_mass[i]),
+            'kn_initial': float(grains.burn_area(0.0)[i] / throat_area[i]),
+            'kn_max': float(kn[:, i].max()),
+            'burn_time_s': float(burn_time[i]),
+            'max_pressure_bar': float(pressure_bar[:steps, i].max()),
+            'average_pressure_bar': float((pressure_bar[:steps, i] * step_time[:, i]).sum() / burn_time[i]),
+            'total_impulse_Ns': float(total_impulse[i]),
+            'delivered_isp_s': float(total_impulse[i] / (propellant_mass[i] * G0)),
+            'motor_class': motor_class(total_impulse[i]),
+        })
+
+    return {
+        'designs': designs,
+        'time_s': time,
+        'pressure_bar': pressure_bar,
+        'thrust_N': thrust,
+        'mass_flow_kg_s': mass_flow,
+        'summary': summary,
+    }
+
+
+def load_designs(path):
+    """Loads motor designs from a JSON file holding a list or {"designs": [...]}."""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('designs', [data])
+    if not isinstance(data, list):
+        raise ValueError(f"{path} holds no list of designs.")
+    return data
+
+
+def write_curves(path, result):
+    """Writes the pressure, thrust and mass flow curves of all designs as CSV rows."""
+    f = sys.stdout if path == '-' else open(path, 'w', newline='')
+    try:
+        writer = csv.writer(f)
+        writer.writerow(('design', 'time_s', 'pressure_bar', 'thrust_N', 'mass_flow_kg_s'))
+        for i, design in enumerate(result['designs']):
+            for row in zip(result['time_s'][:, i], result['pressure_bar'][:, i], result['thrust_N'][:, i],
+                           result['mass_flow_kg_s'][:, i]):
+                writer.writerow((design['name'],) + tuple(f"{value:.6g}" for value in row))
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="ANCP-Sim: simulate motor burns of a recipe")
+    parser.add_argument('recipe_file', type=str, help="Path to the recipe JSON file")
+    parser.add_argument('designs_file', type=str,
+                        help="JSON file with a list of motor designs (grain, throat and expansion ratio)")
+    parser.add_argument('--table', type=str, default=None, metavar='PATH',
+                        help="Take C* and gamma from a lookup table instead of solving the recipe")
+    parser.add_argument('--density', type=float, default=None, metavar='G_CM3',
+                        help="Propellant density (default: ideal mixing of the ingredient densities)")
+    parser.add_argument('--ambient-pressure', type=float, default=1.01325, metavar='BAR',
+                        help="Ambient pressure in bar (default: sea level)")
+    parser.add_argument('--steps', type=int, default=DEFAULT_STEPS, help="Web increments of each burn")
+    parser.add_argument('--curves', type=str, default=None, metavar='PATH',
+                        help="Write the pressure, thrust and mass flow curves as CSV ('-' for stdout)")
+    parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    add_cache_arguments(parser)
+    add_logging_arguments(parser)
+
+    args = parser.parse_args(argv)
+    output.configure_logging(args.quiet, args.verbose)
+
+    config = load_config(args.config)
+    ingredients_db = load_chemdb(*args.ingredients)
+    recipe_data = load_recipe(args.recipe_file)
+    if not ingredients_db or config is None or recipe_data is None:
+        return 1
+    composition = recipe_data.get('composition', {})
+
+    try:
+        designs = load_designs(args.designs_file)
+        density = args.density or propellant_density_g_cm3(composition, ingredients_db)
+        if args.table:
+            from ancp_sim.tables import ThermoTable
+            lookup = ChamberLookup.from_table(ThermoTable.load(args.table), composition)
+        else:
+            from ancp_sim.thermo import ThermoEngine
+            engine = ThermoEngine(cache=cache_from_args(args), warm_start_index=warm_start_index_from_args(args))
+            lookup = ChamberLookup.from_engine(engine, composition, ingredients_db)
+        result = simulate_motors(designs, lookup, config, composition, density,
+                                 ambient_pressure_bar=args.ambient_pressure, steps=args.steps)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.error(f"Error during the ballistics simulation: {e}")
+        return 1
+
+    if not args.quiet:
+        output.print_banner()
+        output.print_ballistics(result['summary'])
+    if args.curves:
+        write_curves(args.curves, result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+This module runs many (recipe, chamber pressure) cases across a process pool.
+
+Each worker process keeps its own warm ThermoEngine, so Cantera is imported
+and the product species are loaded once per worker instead of once per case.
+"""
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.config import load_config
+from ancp_sim.instrumentation import SolveStatistics
+from ancp_sim.main import (parse_pressure_sweep, add_cache_arguments, cache_from_args, warm_start_index_from_args,
+                           add_output_arguments, writer_from_args)
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.batch')
+
+# Equilibrium engines selectable with --engine
+ENGINES = ('cantera', 'native')
+
+# Cases solved together by the native engine; bounds the memory of one batch
+NATIVE_CHUNK_SIZE = 4096
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def load_recipes(source, errors=None):
+    """
+    Loads recipes from a directory, a glob pattern, a JSON file or a JSONL file.
+
+    Args:
+        source (str): A directory of *.json recipes, a glob pattern, a single
+            recipe file, or a .jsonl file with one recipe object per line.
+        errors (list): If given, files and JSONL lines that cannot be read are
+            skipped and reported here as (recipe_id, message) tuples, so one
+            bad recipe does not stop the others. Otherwise the error is raised.
+
+    Returns:
+        list: (recipe_id, recipe_data) tuples, in a stable order.
+    """
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, '*.json')))
+    elif any(char in source for char in '*?['):
+        paths = sorted(glob.glob(source, recursive=True))
+    else:
+        paths = [source]
+
+    recipes = []
+    for path in paths:
+        recipe_id = path
+        try:
+            if path.endswith('.jsonl'):
+                with open(path, 'r') as f:
+                    for lineno, line in enumerate(f, start=1):
+                        if not line.strip():
+                            continue
+                        recipe_id = f"{path}:{lineno}"
+                        try:
+                            recipe_data = _recipe_object(json.loads(line))
+                        except ValueError as e:
+                            if errors is None:
+                                raise
+                            errors.append((recipe_id, f"{type(e).__name__}: {e}"))
+                            continue
+                        recipes.append((recipe_data.get('propellant_name', recipe_id), recipe_data))
+            else:
+                with open(path, 'r') as f:
+                    recipes.append((path, _recipe_object(json.load(f))))
+        except (OSError, ValueError) as e:
+            if errors is None:
+                raise
+            errors.append((recipe_id, f"{type(e).__name__}: {e}"))
+    return recipes
+
+
+def _recipe_object(recipe_data):
+    """Checks that a parsed recipe is a JSON object."""
+    if not isinstance(recipe_data, dict):
+        raise ValueError(f"Expected a recipe object, got {type(recipe_data).__name__}")
+    return recipe_data
+
+
+def load_error_records(errors, pressures_bar):
+    """Turns the recipes `load_recipes` could not read into one failed record per chamber pressure."""
+    return [{'recipe': recipe_id, 'propellant_name': 'N/A', 'chamber_pressure_bar': pc, 'error': message}
+            for recipe_id, message in errors for pc in pressures_bar]
+
+
+def make_jobs(recipes, pressures_bar):
+    """Crosses every recipe with every chamber pressure."""
+    return [(recipe_id, recipe_data, pc) for recipe_id, recipe_data in recipes for pc in pressures_bar]
+
+
+def _init_worker(ingredients_db, config, cache=None, log_level=None, warm_start_index=None, multiphase=False):
+    """Creates the warm engine held by a worker process."""
+    from ancp_sim.thermo import ThermoEngine
+    if log_level is not None:
+        output.configure_logging(level=log_level)
+    _worker['engine'] = ThermoEngine(cache=cache, warm_start_index=warm_start_index, multiphase=multiphase)
+    _worker['ingredients_db'] = ingredients_db
+    _worker['config'] = config
+
+
+def _run_job(job):
+    """Evaluates one (recipe, Pc) job. Never raises; failures are reported in the record."""
+    recipe_id, recipe_data, pc = job
+    record = {
+        'recipe': recipe_id,
+        'propellant_name': recipe_data.get('propellant_name', 'N/A'),
+        'chamber_pressure_bar': pc,
+    }
+    try:
+        results = _worker['engine'].calculate(
+            recipe_data.get('composition', {}),
+            _worker['ingredients_db'],
+            _worker['config'],
+            chamber_pressure_bar=pc
+        )
+        record.update(results)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+        record['traceback'] = traceback.format_exc()
+    return record
+
+
+def run_batch(jobs, ingredients_db, config, workers=None, cache=None, worker_log_level=logging.WARNING,
+              warm_start_index=None, multiphase=False):
+    """
+    Evaluates jobs over a process pool and yields results as they complete.
+
+    Args:
+        jobs (list): (recipe_id, recipe_data, chamber_pressure_bar) tuples.
+        ingredients_db (dict): The ingredient database.
+        config (dict): The simulation configuration.
+        workers (int): Number of worker processes. Defaults to the CPU count;
+            1 runs everything in the current process.
+        cache (ResultCache): Optional result cache shared by all workers.
+        worker_log_level (int): Logging level of the worker processes. Per-case
+            diagnostics would interleave across workers, so only warnings and
+            errors are shown by default.
+        warm_start_index (WarmStartIndex): Optional warm-start index shared
+            by all workers; each case starts from its nearest solved neighbour.
+        multiphase (bool): Solve with separate condensed phases (see
+            `ThermoEngine`).
+
+    Yields:
+        dict: One record per job in completion order, holding the job
+            identification and either the `calculate_thermo` results (with
+            their 'diagnostics') or an 'error' message.
+    """
+    if workers == 1:
+        _init_worker(ingredients_db, config, cache, warm_start_index=warm_start_index, multiphase=multiphase)
+        for job in jobs:
+            yield _run_job(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(ingredients_db, config, cache, worker_log_level, warm_start_index,
+                                       multiphase)) as pool:
+        futures = {pool.submit(_run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker itself died (e.g. BrokenProcessPool); report and carry on
+                recipe_id, recipe_data, pc = futures[future]
+                yield {
+                    'recipe': recipe_id,
+                    'propellant_name': recipe_data.get('propellant_name', 'N/A'),
+                    'chamber_pressure_bar': pc,
+                    'error': f"{type(e).__name__}: {e}",
+                    't_flame_K': 0
+                }
+
+
+def run_batch_native(jobs, ingredients_db, config, chunk_size=NATIVE_CHUNK_SIZE):
+    """
+    Evaluates jobs with the vectorized in-house equilibrium solver.
+
+    The jobs are solved in this process, chunk_size cases at a time, instead
+    of one Cantera solve per case across a pool. See `ancp_sim.gibbs` for how
+    the results relate to the Cantera path.
+
+    Args:
+        jobs (list): (recipe_id, recipe_data, chamber_pressure_bar) tuples.
+        ingredients_db (dict): The ingredient database.
+        config (dict): The simulation configuration.
+        chunk_size (int): Cases per vectorized solve.
+
+    Yields:
+        dict: One record per job in job order, like those of `run_batch`.
+    """
+    from ancp_sim.gibbs import NativeEngine
+
+    engine = NativeEngine()
+    for start in range(0, len(jobs), chunk_size):
+        chunk = jobs[start:start + chunk_size]
+        results = engine.calculate([recipe_data.get('composition', {}) for _, recipe_data, _ in chunk],
+                                   ingredients_db, config, [pc for _, _, pc in chunk])
+        for (recipe_id, recipe_data, pc), result in zip(chunk, results):
+            record = {
+                'recipe': recipe_id,
+                'propellant_name': recipe_data.get('propellant_name', 'N/A'),
+                'chamber_pressure_bar': pc,
+            }
+            record.update(result)
+            yield record
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="ANCP-Sim batch mode: evaluate many recipes across a process pool")
+    parser.add_argument('source', type=str, help="Directory, glob pattern, recipe JSON or JSONL file of recipes")
+    parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    pressure_group = parser.add_mutually_exclusive_group()
+    pressure_group.add_argument('--pc', type=float, nargs='+', default=[70.0], help="Chamber pressure(s) in bar")
+    pressure_group.add_argument('--pc-sweep', type=parse_pressure_sweep, metavar='START:STOP:STEP',
+                                help="Sweep the chamber pressure in bar (stop inclusive), e.g. 20:200:10")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument('--engine', choices=ENGINES, default='cantera',
+                        help="Equilibrium solver: Cantera per case across the worker pool (default), or the "
+                             "vectorized native solver for large screening runs (no result cache)")
+    parser.add_argument('--multiphase', action='store_true',
+                        help="Solve the chamber equilibrium with the condensed products as separate phases "
+                             "(Cantera engine only)")
+    add_cache_arguments(parser)
+    add_output_arguments(parser)
+
+    args = parser.parse_args(argv)
+    if args.multiphase and args.engine != 'cantera':
+        parser.error("--multiphase requires --engine cantera")
+    output.configure_logging(args.quiet, args.verbose)
+    report = not args.quiet
+
+    if report:
+        output.print_banner()
+
+    config = load_config(args.config)
+    ingredients_db = load_chemdb(*args.ingredients)
+    if not ingredients_db or config is None:
+        return 1
+
+    load_errors = []
+    recipes = load_recipes(args.source, errors=load_errors)
+    for recipe_id, message in load_errors:
+        logger.error(f"Could not load recipe {recipe_id}: {message}")
+
+    pressures = args.pc_sweep or args.pc
+    jobs = make_jobs(recipes, pressures)
+    logger.info(f"Running {len(jobs)} cases ({len(recipes)} recipes x {len(pressures)} pressures)")
+
+    if args.engine == 'native':
+        records = run_batch_native(jobs, ingredients_db, config)
+    else:
+        records = run_batch(jobs, ingredients_db, config, workers=args.workers, cache=cache_from_args(args),
+                            worker_log_level=logging.DEBUG if args.verbose else logging.WARNING,
+                            warm_start_index=warm_start_index_from_args(args), multiphase=args.multiphase)
+
+    failed = 0
+    statistics = SolveStatistics()
+    with writer_from_args(args) as writer:
+        for record in itertools.chain(load_error_records(load_errors, pressures), records):
+            if 'error' in record:
+                failed += 1
+            statistics.add(record, label=record['recipe'])
+            if report:
+                output.print_batch_record(record)
+            if writer:
+                writer.write(record)
+
+    if report:
+        output.print_solve_statistics(statistics.summary())
+    logger.info(f"Completed {len(jobs) + len(load_errors) * len(pressures)} cases, {failed} failed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+This module benchmarks the simulator's hot paths and checks them against a baseline.
+
+It times formula parsing, stoichiometry, product species loading, Solution
+setup and the full equilibrium calculation on a set of representative
+AN/KN/Mg recipes across chamber pressures, with the single-phase and the
+multiphase model, plus the startup time of the command-line interface in a
+fresh interpreter. Results can be saved as a
+baseline file; later runs are compared against it and any benchmark slower
+than the baseline by more than the threshold is reported as a regression,
+e.g. after a Cantera upgrade or a change to the thermo path.
+"""
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.main import add_logging_arguments
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.benchmark')
+
+BENCHMARK_FORMAT_VERSION = 1
+DEFAULT_BASELINE_PATH = 'benchmark_baseline.json'
+
+# Relative slowdown above which a benchmark counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+RECIPES = {
+    'AN-KN': {
+        "Ammonium Nitrate": 80.0,
+        "Potassium Nitrate": 10.0,
+        "Castor Oil": 5.0,
+        "Methylene Diphenyl Diisocyanate": 5.0
+    },
+    'AN-Mg': {
+        "Ammonium Nitrate": 65.0,
+        "Potassium Nitrate": 5.0,
+        "Magnesium": 15.0,
+        "Castor Oil": 7.5,
+        "Methylene Diphenyl Diisocyanate": 7.5
+    },
+    'AN-Mg-rich': {
+        "Ammonium Nitrate": 55.0,
+        "Potassium Nitrate": 10.0,
+        "Magnesium": 25.0,
+        "Castor Oil": 5.0,
+        "Methylene Diphenyl Diisocyanate": 5.0
+    },
+}
+
+PRESSURES_BAR = (20.0, 70.0, 150.0)
+
+# Repository root, so the startup benchmarks can run the CLI in a fresh interpreter
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_RECIPE_PATH = os.path.join(REPO_ROOT, 'data', 'example_recipe.json')
+
+# Fresh-interpreter commands timed by the startup benchmarks
+STARTUP_COMMANDS = {
+    'python': ['-c', 'pass'],
+    'import ancp_sim.main': ['-c', 'import ancp_sim.main'],
+    'import ancp_sim.thermo': ['-c', 'import ancp_sim.thermo'],
+    'stoich': ['-m', 'ancp_sim.main', 'stoich', '--quiet', EXAMPLE_RECIPE_PATH],
+}
+
+CONFIG = {
+    "efficiencies": {
+        "combustion_efficiency": 0.90,
+        "nozzle_efficiency": 0.92,
+        "two_phase_efficiency": 0.95
+    }
+}
+
+
+def time_call(func, setup=None, repeat=5, number=1):
+    """
+    Times a function, timeit style.
+
+    Args:
+        func (callable): The code under test, called without arguments.
+        setup (callable): Called before each repetition, outside the timing.
+        repeat (int): Number of timed repetitions.
+        number (int): Calls per repetition.
+
+    Returns:
+        float: The best (minimum) time per call in seconds, which is the
+            least noisy estimate on a shared machine.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def _run_python(arguments):
+    """Runs a fresh Python interpreter with the repository on the import path."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (REPO_ROOT, os.environ.get('PYTHONPATH')))))
+    subprocess.run([sys.executable, *arguments], check=True, env=env, stdout=subprocess.DEVNULL)
+
+
+def _benchmarks(ingredients_db):
+    """Yields (name, func, setup, number) for every benchmark."""
+    from ancp_sim.stoichiometry import parse_formula, calculate_stoichiometry
+    from ancp_sim.thermo import ThermoEngine
+
+    formulas = [data['formula'] for data in ingredients_db.values()]
+    yield 'parse_formula', lambda: [parse_formula(formula) for formula in formulas], None, 1000
+
+    for label, recipe in RECIPES.items():
+        yield f'calculate_stoichiometry[{label}]', lambda recipe=recipe: calculate_stoichiometry(recipe, ingredients_db), None, 1000
+
+    # Product species files are parsed once per engine
+    engine = ThermoEngine()
+    yield 'product_species_load', lambda: engine.product_species, lambda: setattr(engine, '_product_species', None), 1
+
+    # Element filtering and Solution construction, with the species files already loaded
+    def reset_solutions():
+        engine._species_by_elements.clear()
+        engine._solutions.clear()
+
+    for label, recipe in RECIPES.items():
+        yield f'solution_setup[{label}]', lambda recipe=recipe: engine.get_solution(recipe, ingredients_db), reset_solutions, 1
+
+    # Cold TP pre-equilibration, HP solve and performance, on a warm Solution
+    for label, recipe in RECIPES.items():
+        for pc in PRESSURES_BAR:
+            yield (f'calculate_thermo[{label}@{pc:g}bar]',
+                   lambda recipe=recipe, pc=pc: engine.calculate(recipe, ingredients_db, CONFIG, chamber_pressure_bar=pc),
+                   lambda recipe=recipe: engine.get_solution(recipe, ingredients_db), 1)
+
+    # The same cases with separate condensed phases, on a warm Mixture
+    multiphase = ThermoEngine(multiphase=True)
+    for label, recipe in RECIPES.items():
+        for pc in PRESSURES_BAR:
+            yield (f'calculate_thermo_multiphase[{label}@{pc:g}bar]',
+                   lambda recipe=recipe, pc=pc: multiphase.calculate(recipe, ingredients_db, CONFIG, chamber_pressure_bar=pc),
+                   lambda recipe=recipe: multiphase.get_mixture(
+                       calculate_stoichiometry(recipe, ingredients_db)['elemental_moles']), 1)
+
+    # Process startup: the stoich command should not pay for importing Cantera
+    for label, arguments in STARTUP_COMMANDS.items():
+        yield f'startup[{label}]', lambda arguments=arguments: _run_python(arguments), None, 1
+
+
+def run_benchmarks(ingredients_db, repeat=5, pattern='*'):
+    """
+    Runs the benchmarks whose names match a pattern.
+
+    Args:
+        ingredients_db (dict): The ingredient database.
+        repeat (int): Timed repetitions per benchmark; the best is kept.
+        pattern (str): fnmatch pattern selecting benchmarks by name.
+
+    Returns:
+        dict: Benchmark name -> best time per call in seconds.
+    """
+    results = {}
+    for name, func, setup, number in _benchmarks(ingredients_db):
+        if not fnmatch.fnmatchcase(name, pattern):
+            continue
+        results[name] = time_call(func, setup, repeat=repeat, number=number)
+        logger.info(f"  {name}: {results[name] * 1e3:.3f} ms")
+    return results
+
+
+def environment():
+    """Returns the versions that benchmark results depend on."""
+    import cantera
+    import numpy
+    return {
+        'python': platform.python_version(),
+        'cantera': cantera.__version__,
+        'numpy': numpy.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def save_baseline(path, results):
+    """Writes benchmark results and the environment they were measured in."""
+    with open(path, 'w') as f:
+        json.dump({'version': BENCHMARK_FORMAT_VERSION, 'environment': environment(), 'results': results}, f, indent=2)
+
+
+def load_baseline(path):
+    """Loads a baseline written by `save_baseline`."""
+    with open(path, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BENCHMARK_FORMAT_VERSION:
+        raise ValueError(f"Unsupported baseline version {baseline.get('version')} in {path}.")
+    return baseline
+
+
+def compare(results, baseline_results, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares benchmark results with a baseline.
+
+    Args:
+        results (dict): Benchmark name -> seconds, as from `run_benchmarks`.
+        baseline_results (dict): The same for the baseline.
+        threshold (float): Relative slowdown counted as a regression, e.g.
+            0.25 flags anything more than 25% slower.
+
+    Returns:
+        list: (name, baseline_seconds, seconds, ratio, status) rows, where
+            status is 'regression', 'improvement', 'ok' or 'new'.
+    """
+    rows = []
+    for name, seconds in results.items():
+        reference = baseline_results.get(name)
+        if reference is None:
+            rows.append((name, None, seconds, None, 'new'))
+            continue
+        ratio = seconds / reference
+        if ratio > 1.0 + threshold:
+            status = 'regression'
+        elif ratio < 1.0 / (1.0 + threshold):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((name, reference, seconds, ratio, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANCP-Sim: benchmark the thermo path against a baseline")
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE_PATH,
+                        help=f"Baseline file (default: {DEFAULT_BASELINE_PATH})")
+    parser.add_argument('--save', action='store_true', help="Save this run as the new baseline instead of comparing")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Relative slowdown reported as a regression (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed repetitions per benchmark (default: 5)")
+    parser.add_argument('--filter', type=str, default='*', metavar='PATTERN',
+                        help="Only run benchmarks matching this glob pattern, e.g. 'calculate_thermo*'")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    add_logging_arguments(parser)
+
+    args = parser.parse_args()
+    output.configure_logging(args.quiet, args.verbose)
+
+    ingredients_db = load_chemdb(*args.ingredients)
+    if not ingredients_db:
+        sys.exit(2)
+
+    results = run_benchmarks(ingredients_db, repeat=args.repeat, pattern=args.filter)
+
+    if args.save or not os.path.exists(args.baseline):
+        save_baseline(args.baseline, results)
+        output.print_benchmark(compare(results, {}), args.threshold)
+        logger.info(f"Saved baseline to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    current = environment()
+    for key, value in baseline['environment'].items():
+        if current.get(key) != value:
+            logger.warning(f"Baseline was measured with {key} {value}, now running {current.get(key)}.")
+
+    rows = compare(results, baseline['results'], args.threshold)
+    output.print_benchmark(rows, args.threshold)
+    regressions = [row for row in rows if row[4] == 'regression']
+    if regressions:
+        logger.error(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
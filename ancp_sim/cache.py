@@ -0,0 +1,384 @@
+"""
+This module provides persistent, SQLite-backed stores for the thermo engine.
+
+ResultCache is a content-addressed cache of chamber equilibrium states,
+keyed by a canonical hash of the normalized composition, chamber pressure,
+ingredient database and product species files. The least recently used
+entries are evicted once it grows beyond its size bound.
+
+WarmStartIndex keeps converged chamber states, keyed by normalized elemental
+composition and pressure, so a new solve can start from its nearest
+previously solved neighbour instead of cold.
+
+SQLite's locking makes both safe to share between many worker processes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# Bump when a change to the thermo path makes previously cached results stale
+CACHE_FORMAT_VERSION = 7
+
+DEFAULT_CACHE_DIR = os.environ.get('ANCP_SIM_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'ancp_sim')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds to wait for another process holding the database lock
+LOCK_TIMEOUT = 30.0
+
+# Cache hits whose access times are held in memory before they are written
+TOUCH_BATCH = 256
+
+# Bump when the stored warm-start states change meaning
+WARM_START_FORMAT_VERSION = 3
+DEFAULT_MAX_STATES = 20000
+
+# Weight of ln(pressure) against the element mole fractions in the neighbour
+# distance: a factor of e in pressure counts like a 0.01 shift in composition
+PRESSURE_WEIGHT = 0.01
+
+
+def hash_ingredients_db(ingredients_db):
+    """Returns the content hash of an ingredient database (ChemDB or plain dict)."""
+    if hasattr(ingredients_db, 'content_hash'):
+        return ingredients_db.content_hash
+    return hashlib.sha256(
+        json.dumps(dict(ingredients_db), sort_keys=True, separators=(',', ':')).encode('utf-8')
+    ).hexdigest()
+
+
+def result_key(recipe, chamber_pressure_bar, db_hash, species_hash):
+    """
+    Builds the canonical cache key of a chamber equilibrium.
+
+    The composition is normalized to mass fractions (so 65/35 and 130/70 hit
+    the same entry), zero entries are dropped and the ingredient order is
+    irrelevant. The configuration is not part of the key: the cache stores
+    chamber states, and the efficiencies and burn rate are applied afterwards.
+
+    Args:
+        recipe (dict): Ingredient names mapped to mass percentages.
+        chamber_pressure_bar (float): Chamber pressure in bar.
+        db_hash (str): Content hash of the ingredient database.
+        species_hash (str): Hash of the product species definitions.
+
+    Returns:
+        str: A hex SHA-256 digest, or None if the recipe has no positive
+            percentage and cannot be normalized (such a case is not cached).
+    """
+    total = sum(pct for pct in recipe.values() if pct > 0)
+    if total <= 0:
+        return None
+    composition = {name: f"{pct / total:.12g}" for name, pct in sorted(recipe.items()) if pct > 0}
+    payload = {
+        'version': CACHE_FORMAT_VERSION,
+        'composition': composition,
+        'pressure_bar': f"{float(chamber_pressure_bar):.12g}",
+        'ingredients': db_hash,
+        'species': species_hash,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of result dictionaries in a SQLite file.
+
+    Each process opens its own connection on first use, so a cache object
+    can be handed to worker processes before or after forking. The access
+    times of hits are kept in memory and written in one go with the next
+    `put` or every TOUCH_BATCH hits, so reads never take the write lock.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path (str): The database file. Defaults to results.sqlite in the
+                ANCP_SIM_CACHE_DIR directory (~/.cache/ancp_sim).
+            max_bytes (int): Total size of stored results above which the
+                least recently used entries are evicted.
+        """
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, 'results.sqlite')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        # key -> last access time of the hits not yet written
+        self._touched = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        state['_touched'] = {}
+        return state
+
+    def _connect(self):
+        """Returns this process's connection, creating the database on first use."""
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # Not shared between threads at the same time, but the server may
+            # open it on the main thread and then use it from its worker thread
+            connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key):
+        """Returns the cached result for a key, or None on a miss."""
+        connection = self._connect()
+        row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._touched[key] = time.time()
+        if len(self._touched) >= TOUCH_BATCH:
+            self.flush()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def flush(self):
+        """Writes the access times of the hits held in memory."""
+        if not self._touched:
+            return
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_touched(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _write_touched(self, connection):
+        """Updates the access times of the pending hits, within the caller's transaction."""
+        connection.executemany("UPDATE results SET last_used = ? WHERE key = ?",
+                               [(last_used, key) for key, last_used in self._touched.items()])
+        self._touched = {}
+
+    def put(self, key, result):
+        """Stores a result and evicts least recently used entries beyond the size bound."""
+        value = json.dumps(result)
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Pending hits first, so the eviction sees their recency
+            self._write_touched(connection)
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            self._evict(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection):
+        """Deletes the oldest entries until the total size is within max_bytes."""
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def clear(self):
+        """Removes every cached result."""
+        self._touched = {}
+        self._connect().execute("DELETE FROM results")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class WarmStartIndex:
+    """
+    Persistent nearest-neighbour index of converged chamber states.
+
+    States are grouped by the set of elements present, since a product state
+    is only a useful initial guess for a case with the same elements. Within
+    a group the distance between two cases is the Euclidean distance of their
+    element mole fractions, with ln(pressure) scaled by PRESSURE_WEIGHT as an
+    extra coordinate.
+
+    Each process reads a group from the database the first time it is
+    needed and searches it in memory. New states are written through, so
+    other processes see them once they load the group. The oldest states
+    are dropped once there are more than max_states, both from the database
+    and from the groups held in memory.
+    """
+
+    def __init__(self, path=None, max_states=DEFAULT_MAX_STATES):
+        """
+        Args:
+            path (str): The database file. Defaults to warmstart.sqlite in the
+                ANCP_SIM_CACHE_DIR directory (~/.cache/ancp_sim).
+            max_states (int): Number of stored states above which the oldest
+                are evicted.
+        """
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, 'warmstart.sqlite')
+        self.max_states = max_states
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        # element signature -> {'ids': row ids, 'points': N x (elements + 1) array, 'states': [(T, X), ...]}
+        self._groups = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        state['_groups'] = {}
+        return state
+
+    def _connect(self):
+        """Returns this process's connection, creating the database on first use."""
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # Not shared between threads at the same time, but the server may
+            # open it on the main thread and then use it from its worker thread
+            connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS states ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " version INTEGER NOT NULL,"
+                " elements TEXT NOT NULL,"
+                " point TEXT NOT NULL,"
+                " temperature REAL NOT NULL,"
+                " mole_fractions TEXT NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS states_elements ON states (elements)")
+            self._connection = connection
+            self._pid = os.getpid()
+            self._groups = {}
+        return self._connection
+
+    @staticmethod
+    def _point(element_names, element_moles, pressure_pa):
+        """Returns (signature, point) of a case: its element set and its coordinates in the index."""
+        present = sorted((name, float(moles)) for name, moles in zip(element_names, element_moles) if moles > 0)
+        total = sum(moles for _, moles in present)
+        signature = ','.join(name for name, _ in present)
+        point = [moles / total for _, moles in present] + [PRESSURE_WEIGHT * np.log(pressure_pa)]
+        return signature, np.array(point)
+
+    def _group(self, signature):
+        """Returns the in-memory states of an element set, loading them on first use."""
+        connection = self._connect()
+        group = self._groups.get(signature)
+        if group is None:
+            rows = connection.execute(
+                "SELECT id, point, temperature, mole_fractions FROM states"
+                " WHERE elements = ? AND version = ? ORDER BY id",
+                (signature, WARM_START_FORMAT_VERSION)
+            ).fetchall()
+            group = {
+                'ids': [row_id for row_id, _, _, _ in rows],
+                'points': np.array([json.loads(point) for _, point, _, _ in rows]) if rows else None,
+                'states': [(temperature, json.loads(X)) for _, _, temperature, X in rows],
+            }
+            self._groups[signature] = group
+        return group
+
+    def nearest(self, element_names, element_moles, pressure_pa):
+        """
+        Returns the stored state closest to a case.
+
+        Args:
+            element_names (list): The element names.
+            element_moles (array-like): Moles of each element in the reactants
+                (any consistent scale; only the proportions matter).
+            pressure_pa (float): Chamber pressure in Pa.
+
+        Returns:
+            tuple: (T, {species name: mole fraction}) of the nearest state with
+                the same elements, or None if there is none.
+        """
+        signature, point = self._point(element_names, element_moles, pressure_pa)
+        group = self._group(signature)
+        if not group['states']:
+            self.misses += 1
+            return None
+        self.hits += 1
+        distances = np.sum((group['points'] - point) ** 2, axis=1)
+        return group['states'][int(np.argmin(distances))]
+
+    def add(self, element_names, element_moles, pressure_pa, temperature, mole_fractions):
+        """
+        Stores a converged state, unless the same case is stored already.
+
+        Args:
+            element_names (list): The element names.
+            element_moles (array-like): Moles of each element in the reactants.
+            pressure_pa (float): Chamber pressure in Pa.
+            temperature (float): The equilibrium temperature in K.
+            mole_fractions (dict): Species name -> equilibrium mole fraction.
+        """
+        signature, point = self._point(element_names, element_moles, pressure_pa)
+        group = self._group(signature)
+        if group['states'] and np.min(np.sum((group['points'] - point) ** 2, axis=1)) < 1e-24:
+            return
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row_id = connection.execute(
+                "INSERT INTO states (version, elements, point, temperature, mole_fractions) VALUES (?, ?, ?, ?, ?)",
+                (WARM_START_FORMAT_VERSION, signature, json.dumps(point.tolist()), float(temperature),
+                 json.dumps(mole_fractions))
+            ).lastrowid
+            connection.execute("DELETE FROM states WHERE id <= ?", (row_id - self.max_states,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        group['ids'].append(row_id)
+        group['points'] = np.vstack([group['points'], point]) if group['states'] else point[None, :]
+        group['states'].append((float(temperature), dict(mole_fractions)))
+        self._evict(row_id - self.max_states)
+
+    def _evict(self, stale_id):
+        """Drops the in-memory states with a row id up to stale_id, as the database just did."""
+        for signature, group in list(self._groups.items()):
+            if not group['ids'] or group['ids'][0] > stale_id:
+                continue
+            keep = next((i for i, row_id in enumerate(group['ids']) if row_id > stale_id), len(group['ids']))
+            if keep == len(group['ids']):
+                del self._groups[signature]
+                continue
+            group['ids'] = group['ids'][keep:]
+            group['points'] = group['points'][keep:]
+            group['states'] = group['states'][keep:]
+
+    def clear(self):
+        """Removes every stored state."""
+        self._connect().execute("DELETE FROM states")
+        self._groups = {}
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM states").fetchone()[0]
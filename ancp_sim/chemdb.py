@@ -1,6 +1,29 @@
+import copy
+import hashlib
 import json
+import logging
+import os
+import re
+from collections.abc import Mapping
+from .stoichiometry import parse_formula
 
-def load_ingredients(filepath="data/ingredients.json"):
+logger = logging.getLogger(__name__)
+
+# The ingredient database shipped with the simulator
+DEFAULT_INGREDIENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'ingredients.json')
+
+# Environment variable listing site-local overlay files (os.pathsep separated)
+OVERLAY_ENV_VAR = 'ANCP_SIM_INGREDIENTS'
+
+REQUIRED_FIELDS = ('formula', 'enthalpy_formation_kJ_mol', 'molecular_weight_g_mol')
+
+# Format version of the compiled (binary) database
+COMPILED_FORMAT_VERSION = 1
+
+_FORMULA_PATTERN = re.compile(r'(?:[A-Z][a-z]*\d*|\(|\)\d*)+')
+
+
+def load_ingredients(filepath=DEFAULT_INGREDIENTS_PATH):
     """
     Loads the chemical properties of ingredients from a JSON file.
 
@@ -14,8 +37,245 @@ def load_ingredients(filepath="data/ingredients.json"):
         with open(filepath, 'r') as f:
             return json.load(f)
     except FileNotFoundError:
-        print(f"Error: The file {filepath} was not found.")
+        logger.error(f"The file {filepath} was not found.")
         return None
     except json.JSONDecodeError:
-        print(f"Error: The file {filepath} is not a valid JSON file.")
+        logger.error(f"The file {filepath} is not a valid JSON file.")
         return None
+
+
+def validate_ingredient(name, data):
+    """
+    Checks that an ingredient record is complete and physically sensible.
+
+    Raises:
+        ValueError: If a required field is missing or invalid.
+    """
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise ValueError(f"Ingredient '{name}' is missing the '{field}' field.")
+
+    formula = data['formula']
+    if not isinstance(formula, str) or not _FORMULA_PATTERN.fullmatch(formula) \
+            or formula.count('(') != formula.count(')'):
+        raise ValueError(f"Ingredient '{name}' has an invalid formula '{formula}'.")
+
+    for field in ('enthalpy_formation_kJ_mol', 'molecular_weight_g_mol', 'density_g_cm3'):
+        if field in data and (isinstance(data[field], bool) or not isinstance(data[field], (int, float))):
+            raise ValueError(f"Ingredient '{name}' has a non-numeric '{field}'.")
+
+    if data['molecular_weight_g_mol'] <= 0:
+        raise ValueError(f"Ingredient '{name}' must have a positive molecular weight.")
+    if data.get('density_g_cm3', 1.0) <= 0:
+        raise ValueError(f"Ingredient '{name}' must have a positive density.")
+
+
+def default_ingredient_paths():
+    """Returns the shipped database followed by the site-local overlays from the environment."""
+    overlays = [path for path in os.environ.get(OVERLAY_ENV_VAR, '').split(os.pathsep) if path]
+    return (DEFAULT_INGREDIENTS_PATH, *overlays)
+
+
+class ChemDB(Mapping):
+    """
+    Validated, indexed ingredient database.
+
+    Behaves as a read-only mapping of ingredient name -> record, so it can be
+    passed anywhere a plain ingredients dictionary is accepted. On top of
+    that it precomputes each ingredient's element counts and element vector
+    once, and exposes a content hash suitable for cache keys.
+    """
+
+    def __init__(self, records, sources=()):
+        """
+        Args:
+            records (dict): Ingredient name -> record, as in ingredients.json.
+            sources (tuple): The files the records were loaded from.
+        """
+        self.sources = tuple(sources)
+        self._records = {}
+        self._element_counts = {}
+        for name, data in records.items():
+            validate_ingredient(name, data)
+            self._records[name] = dict(data)
+            self._element_counts[name] = parse_formula(data['formula'])
+        self._finalize()
+
+    def _finalize(self):
+        """Builds the element index and element vectors."""
+        elements = []
+        for counts in self._element_counts.values():
+            elements.extend(element for element in counts if element not in elements)
+        self.elements = tuple(elements)
+
+        self._element_vectors = {
+            name: tuple(float(counts.get(element, 0)) for element in self.elements)
+            for name, counts in self._element_counts.items()
+        }
+        self._content_hash = None
+
+    @classmethod
+    def load(cls, *paths):
+        """
+        Loads and validates a database, layering overlay files on top.
+
+        The first file is the base database; each following file overrides it
+        field by field, so an overlay can add new ingredients or change a
+        single property (e.g. an enthalpy of formation) of an existing one.
+        When no path is given, the shipped database is loaded together with
+        any overlays listed in the ANCP_SIM_INGREDIENTS environment variable.
+
+        Args:
+            *paths (str): The base database followed by overlay files.
+
+        Returns:
+            ChemDB: The merged, validated database.
+        """
+        if not paths:
+            paths = default_ingredient_paths()
+
+        records = {}
+        for path in paths:
+            with open(path, 'r') as f:
+                layer = json.load(f)
+            if not isinstance(layer, dict):
+                raise ValueError(f"The ingredient file {path} must contain a JSON object.")
+            for name, data in layer.items():
+                records[name] = {**records.get(name, {}), **data}
+        return cls(records, sources=paths)
+
+    def __getitem__(self, name):
+        return self._records[name]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the canonical database content, for use in cache keys."""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(
+                json.dumps(self._records, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            ).hexdigest()
+        return self._content_hash
+
+    def element_counts(self, name):
+        """Returns the parsed element counts of an ingredient's formula."""
+        return self._element_counts[name]
+
+    def element_vector(self, name):
+        """Returns an ingredient's element counts ordered like `elements`."""
+        return self._element_vectors[name]
+
+    def with_enthalpies(self, enthalpies):
+        """
+        Returns a copy with some enthalpies of formation changed.
+
+        The formulas stay the same, so the copy shares the element counts and
+        vectors of this database instead of parsing and validating the records
+        again; only the changed records are copied. The content hash is
+        computed on first use.
+
+        Args:
+            enthalpies (dict): Ingredient name -> enthalpy of formation in kJ/mol.
+
+        Returns:
+            ChemDB: The new database; this one is unchanged.
+        """
+        db = copy.copy(self)
+        db._records = {**self._records, **{
+            name: {**self._records[name], 'enthalpy_formation_kJ_mol': enthalpy}
+            for name, enthalpy in enthalpies.items()
+        }}
+        db._content_hash = None
+        return db
+
+    def save(self, filepath):
+        """
+        Saves the database in a compact compiled (binary NumPy .npz) form.
+
+        The compiled form stores the records alongside the precomputed element
+        matrix, so loading it skips formula parsing and validation.
+        """
+        import numpy as np
+
+        names = list(self._records)
+        records_json = json.dumps(self._records, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        with open(filepath, 'wb') as f:
+            np.savez_compressed(
+                f,
+                version=np.array(COMPILED_FORMAT_VERSION),
+                content_hash=np.array(self.content_hash),
+                records=np.frombuffer(records_json, dtype=np.uint8),
+                names=np.array(names),
+                elements=np.array(self.elements),
+                element_matrix=np.array([self._element_vectors[name] for name in names]).reshape(len(names), len(self.elements)),
+                sources=np.array(self.sources)
+            )
+
+    @classmethod
+    def load_compiled(cls, filepath):
+        """
+        Loads a database written by `save`.
+
+        Raises:
+            ValueError: If the file has an unknown format version or its
+                content does not match the stored hash.
+        """
+        import numpy as np
+
+        with np.load(filepath, allow_pickle=False) as archive:
+            if int(archive['version']) != COMPILED_FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled database version {int(archive['version'])} in {filepath}.")
+            records = json.loads(archive['records'].tobytes().decode('utf-8'))
+            names = [str(name) for name in archive['names']]
+            elements = [str(element) for element in archive['elements']]
+            matrix = archive['element_matrix']
+            content_hash = str(archive['content_hash'])
+            sources = tuple(str(source) for source in archive['sources'])
+
+        db = cls.__new__(cls)
+        db.sources = sources
+        db._records = {name: records[name] for name in names}
+        db._element_counts = {
+            name: {element: _count(matrix[i, j]) for j, element in enumerate(elements) if matrix[i, j]}
+            for i, name in enumerate(names)
+        }
+        db._finalize()
+        if db.content_hash != content_hash:
+            raise ValueError(f"The compiled database {filepath} is corrupt (content hash mismatch).")
+        return db
+
+
+def _count(value):
+    """Returns an element count as int when it is integral, like parse_formula does."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def load_chemdb(*overlay_paths, filepath=None):
+    """
+    Loads the ingredient database as a ChemDB, logging errors like `load_ingredients`.
+
+    Args:
+        *overlay_paths (str): Overlay files applied on top of the base database.
+        filepath (str): The base database. Defaults to the shipped one plus
+            any overlays from the ANCP_SIM_INGREDIENTS environment variable.
+
+    Returns:
+        ChemDB: The database, or None if it could not be loaded.
+    """
+    paths = (filepath,) if filepath else default_ingredient_paths()
+    paths = (*paths, *overlay_paths)
+    try:
+        return ChemDB.load(*paths)
+    except FileNotFoundError as e:
+        logger.error(f"The file {e.filename} was not found.")
+    except json.JSONDecodeError as e:
+        logger.error(f"An ingredient file is not a valid JSON file: {e}")
+    except ValueError as e:
+        logger.error(f"Invalid ingredient database: {e}")
+    return None
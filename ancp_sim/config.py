@@ -1,4 +1,87 @@
 import json
+import logging
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+
+
+class Config(Mapping):
+    """
+    Immutable simulation configuration.
+
+    Behaves like a read-only nested dictionary: sections such as
+    config['efficiencies'] are Config objects themselves. Variants are made
+    with `replace` instead of being modified in place, so one instance can be
+    shared by threads and worker processes without copying.
+    """
+
+    def __init__(self, data=None):
+        """
+        Args:
+            data (Mapping): The configuration values, e.g. as read from
+                config.json. Nested mappings become nested Config objects.
+        """
+        self._data = {key: Config(value) if isinstance(value, Mapping) else value
+                      for key, value in (data or {}).items()}
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"Config({self.to_dict()!r})"
+
+    def __hash__(self):
+        return hash(json.dumps(self.to_dict(), sort_keys=True))
+
+    def to_dict(self):
+        """Returns the configuration as plain, mutable nested dictionaries."""
+        return {key: value.to_dict() if isinstance(value, Config) else value for key, value in self._data.items()}
+
+    def replace(self, updates):
+        """
+        Returns a copy with some values changed.
+
+        Args:
+            updates (dict): Dotted parameter paths mapped to their new values,
+                e.g. {'efficiencies.nozzle_efficiency': 0.9}. Missing sections
+                are created.
+
+        Returns:
+            Config: The new configuration; this one is unchanged.
+        """
+        data = self.to_dict()
+        for path, value in updates.items():
+            section = data
+            *parents, name = path.split('.')
+            for parent in parents:
+                section = section.setdefault(parent, {})
+                if not isinstance(section, dict):
+                    raise ValueError(f"'{parent}' in '{path}' is not a configuration section.")
+            section[name] = value
+        return Config(data)
+
+
+DEFAULT_CONFIG = Config({
+    "burn_rate": {
+        "a": 3.5,
+        "n": 0.5
+    },
+    "catalyst": {
+        "ferric_oxide_multiplier": 1.7
+    },
+    "efficiencies": {
+        "combustion_efficiency": 0.90,
+        "nozzle_efficiency": 0.92,
+        "two_phase_efficiency": 0.95
+    }
+})
+
 
 def load_config(filepath="config.json"):
     """
@@ -8,28 +91,15 @@ def load_config(filepath="config.json"):
         filepath (str): The path to the configuration file.
 
     Returns:
-        dict: The loaded configuration object.
+        Config: The loaded (immutable) configuration object.
     """
     try:
         with open(filepath, 'r') as f:
-            return json.load(f)
+            return Config(json.load(f))
     except FileNotFoundError:
-        print(f"Warning: Configuration file '{filepath}' not found. Using default values.")
-        # Populate with default values as a fallback
-        return {
-            "burn_rate": {
-                "a": 3.5,
-                "n": 0.5
-            },
-            "catalyst": {
-                "ferric_oxide_multiplier": 1.7
-            },
-            "efficiencies": {
-                "combustion_efficiency": 0.90,
-                "nozzle_efficiency": 0.92,
-                "two_phase_efficiency": 0.95
-            }
-        }
+        logger.warning(f"Configuration file '{filepath}' not found. Using default values.")
+        # Fall back to the default values
+        return DEFAULT_CONFIG
     except json.JSONDecodeError:
-        print(f"Error: The file {filepath} is not a valid JSON file.")
+        logger.error(f"The file {filepath} is not a valid JSON file.")
         return None
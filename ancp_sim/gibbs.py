@@ -0,0 +1,394 @@
+"""
+This module solves chamber equilibria for many compositions at once with NumPy.
+
+It is an in-house alternative to Cantera's scalar `equilibrate` for large
+screening runs. The model is the single-phase one of `ThermoEngine`: the
+gaseous product species form one ideal-gas mixture, with the same NASA7
+data and the same element filter (`product_species_for`).
+The element abundances and the reactant enthalpy of each composition come
+from `StoichiometryMatrix`, i.e. the element vectors of
+`calculate_stoichiometry`.
+
+The adiabatic (HP) equilibrium is found by Gibbs-energy minimization with
+the element-potential Newton method of Gordon & McBride (NASA RP-1311):
+each iteration solves one (elements + 2) x (elements + 2) linear system per
+problem for the element potentials, the change in total moles and the
+change in temperature. All problems sharing an element set iterate together
+as arrays, with a batched linear solve.
+"""
+import logging
+import math
+import time
+
+import numpy as np
+
+from ancp_sim.performance import GAS_CONSTANT, ChamberState
+from ancp_sim.stoichiometry import StoichiometryMatrix
+
+logger = logging.getLogger(__name__)
+
+# Molar gas constant in J/(mol K)
+R = GAS_CONSTANT / 1000
+
+# Initial temperature and total moles per 100 g (the NASA CEA starting point)
+T_START = 2200.0
+MOLES_START = 0.1
+
+# Species below this mole fraction are trace species, whose steps are
+# limited so they cannot jump above TRACE_TARGET in one iteration
+TRACE_FRACTION = 1e-8
+TRACE_TARGET = math.log(1e-4)
+
+MAX_ITERATIONS = 200
+TOLERANCE = 1e-9
+
+
+class GibbsSolver:
+    """
+    Vectorized HP equilibrium over a fixed set of product species.
+
+    All species form one ideal-gas mixture; their thermo data are NASA7
+    polynomials with two temperature ranges.
+    """
+
+    def __init__(self, species_names, elements, atoms, coefficients, molecular_weights, reference_pressure=101325.0):
+        """
+        Args:
+            species_names (list): The product species.
+            elements (list): The element symbols, in the order of `atoms` rows.
+            atoms (np.ndarray): Elements x species atom-count matrix.
+            coefficients (np.ndarray): Species x 15 NASA7 coefficients as in
+                Cantera's NasaPoly2: T_mid, then the 7 high- and the 7
+                low-temperature coefficients.
+            molecular_weights (array-like): Species molecular weights in g/mol.
+            reference_pressure (float): Standard-state pressure in Pa.
+        """
+        self.species_names = list(species_names)
+        self.elements = list(elements)
+        self.atoms = np.asarray(atoms, dtype=float)
+        coefficients = np.asarray(coefficients, dtype=float)
+        self._t_mid = coefficients[:, 0]
+        self._high = coefficients[:, 1:8]
+        self._low = coefficients[:, 8:15]
+        self.molecular_weights = np.asarray(molecular_weights, dtype=float)
+        self.reference_pressure = reference_pressure
+
+    @classmethod
+    def from_species(cls, species, elements):
+        """
+        Builds a solver from Cantera Species objects (only their data is used).
+
+        Args:
+            species (list): Species with NASA7 (NasaPoly2) thermo.
+            elements (iterable): The elements of the problems to solve. Every
+                species must be made of them, and each must occur in a species.
+
+        Returns:
+            GibbsSolver: The solver.
+        """
+        elements = sorted(elements)
+        unsupported = [sp.name for sp in species if type(sp.thermo).__name__ != 'NasaPoly2']
+        if unsupported:
+            raise ValueError(f"The native solver only supports NASA7 thermo data, not for {unsupported}.")
+        atoms = np.array([[sp.composition.get(element, 0.0) for sp in species] for element in elements])
+        missing = [element for element, row in zip(elements, atoms) if not row.any()]
+        if missing:
+            raise ValueError(f"No product species contain {missing}.")
+        pressures = {sp.thermo.reference_pressure for sp in species}
+        if len(pressures) != 1:
+            raise ValueError("The product species have different reference pressures.")
+        return cls([sp.name for sp in species], elements, atoms, [sp.thermo.coeffs for sp in species],
+                   [sp.molecular_weight for sp in species], pressures.pop())
+
+    def thermo(self, T):
+        """
+        Evaluates the dimensionless standard-state properties.
+
+        Args:
+            T (np.ndarray): Temperatures in K, shape (N,).
+
+        Returns:
+            tuple: (cp/R, h/RT, s/R) arrays shaped (N, species).
+        """
+        T = T[:, None]
+        a = np.where((T >= self._t_mid)[..., None], self._high[None], self._low[None])
+        a0, a1, a2, a3, a4, a5, a6 = (a[..., i] for i in range(7))
+        cp = a0 + T * (a1 + T * (a2 + T * (a3 + T * a4)))
+        h = a0 + T * (a1 / 2 + T * (a2 / 3 + T * (a3 / 4 + T * a4 / 5))) + a5 / T
+        s = a0 * np.log(T) + T * (a1 + T * (a2 / 2 + T * (a3 / 3 + T * a4 / 4))) + a6
+        return cp, h, s
+
+    def equilibrate_hp(self, element_moles, enthalpy_J, pressure_pa, max_iterations=MAX_ITERATIONS,
+                       tolerance=TOLERANCE):
+        """
+        Solves the adiabatic equilibrium of N problems at once.
+
+        Args:
+            element_moles (array-like): N x elements moles of each element, in
+                the order of `elements` (any common mass basis, e.g. per 100 g).
+            enthalpy_J (array-like): The N reactant enthalpies in J, on the same basis.
+            pressure_pa (array-like): The N pressures in Pa.
+            max_iterations (int): Iteration limit.
+            tolerance (float): Convergence threshold on the relative Newton
+                corrections of the species moles, total moles and temperature.
+
+        Returns:
+            dict: 'T' (N,), 'moles' (N x species), 'converged' (N booleans)
+                and 'iterations' (N, the iteration each problem converged at).
+        """
+        b = np.atleast_2d(np.asarray(element_moles, dtype=float))
+        n_problems, n_elements = b.shape
+        if n_elements != len(self.elements):
+            raise ValueError(f"Expected {len(self.elements)} element columns {self.elements}, got {n_elements}.")
+        if np.any(b <= 0):
+            raise ValueError("Every element of the solver must be present in every problem.")
+        h0 = np.broadcast_to(np.asarray(enthalpy_J, dtype=float), (n_problems,)) / R
+        log_p = np.log(np.broadcast_to(np.asarray(pressure_pa, dtype=float), (n_problems,)) / self.reference_pressure)
+        A = self.atoms
+        n_species = A.shape[1]
+        size = n_elements + 2
+
+        ln_n = np.full((n_problems, n_species), math.log(MOLES_START / n_species))
+        ln_total = np.full(n_problems, math.log(MOLES_START))
+        ln_T = np.full(n_problems, math.log(T_START))
+        converged = np.zeros(n_problems, dtype=bool)
+        iterations = np.zeros(n_problems, dtype=int)
+
+        for iteration in range(1, max_iterations + 1):
+            active = ~converged
+            if not active.any():
+                break
+            T = np.exp(ln_T[active])
+            n = np.exp(ln_n[active])
+            total = np.exp(ln_total[active])
+            cp, h, s = self.thermo(T)
+            mu = h - s + ln_n[active] - ln_total[active, None] + log_p[active, None]
+
+            nA = n @ A.T
+            nhA = (n * h) @ A.T
+            n_sum = n.sum(axis=1)
+            nh_sum = (n * h).sum(axis=1)
+            matrix = np.empty((len(T), size, size))
+            matrix[:, :n_elements, :n_elements] = np.einsum('ks,ns,is->nki', A, n, A)
+            matrix[:, :n_elements, -2] = nA
+            matrix[:, :n_elements, -1] = nhA
+            matrix[:, -2, :n_elements] = nA
+            matrix[:, -2, -2] = n_sum - total
+            matrix[:, -2, -1] = nh_sum
+            matrix[:, -1, :n_elements] = nhA
+            matrix[:, -1, -2] = nh_sum
+            matrix[:, -1, -1] = (n * (cp + h**2)).sum(axis=1)
+            rhs = np.empty((len(T), size))
+            rhs[:, :n_elements] = b[active] - nA + (n * mu) @ A.T
+            rhs[:, -2] = total - n_sum + (n * mu).sum(axis=1)
+            rhs[:, -1] = h0[active] / T - nh_sum + (n * h * mu).sum(axis=1)
+            try:
+                solution = np.linalg.solve(matrix, rhs[..., None])[..., 0]
+            except np.linalg.LinAlgError:
+                # Solve one by one so a single singular problem does not stop the others
+                solution = np.array([np.linalg.lstsq(m, r, rcond=None)[0] for m, r in zip(matrix, rhs)])
+            pi, d_ln_total, d_ln_T = solution[:, :n_elements], solution[:, -2], solution[:, -1]
+            d_ln_n = -mu + pi @ A + d_ln_total[:, None] + h * d_ln_T[:, None]
+
+            # Step control (RP-1311, eqs. 3.1-3.3)
+            fraction_ln = ln_n[active] - ln_total[active, None]
+            major = (fraction_ln > math.log(TRACE_FRACTION)) & (d_ln_n > 0)
+            largest = np.maximum(5 * np.maximum(np.abs(d_ln_T), np.abs(d_ln_total)),
+                                 np.where(major, d_ln_n, 0.0).max(axis=1))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lambda1 = np.where(largest > 2, 2 / largest, 1.0)
+                trace = ~major & (fraction_ln <= math.log(TRACE_FRACTION)) & (d_ln_n >= 0)
+                relative = d_ln_n - d_ln_total[:, None]
+                limits = np.abs((fraction_ln - TRACE_TARGET) / relative)
+                lambda2 = np.where(trace & (relative > 0), limits, np.inf).min(axis=1)
+            step = np.minimum(np.minimum(lambda1, lambda2), 1.0)[:, None]
+
+            ln_n[active] += step * d_ln_n
+            ln_total[active] += step[:, 0] * d_ln_total
+            ln_T[active] += step[:, 0] * d_ln_T
+            # Trace species far below any measurable amount only slow the iteration down
+            np.maximum(ln_n, ln_total[:, None] - 700.0, out=ln_n)
+
+            done = ((n * np.abs(d_ln_n)).max(axis=1) <= tolerance * n_sum) \
+                & (np.abs(d_ln_total) <= tolerance) & (np.abs(d_ln_T) <= tolerance) & (step[:, 0] == 1.0)
+            index = np.flatnonzero(active)[done]
+            converged[index] = True
+            iterations[index] = iteration
+
+        moles = np.exp(ln_n)
+        residual = np.abs(moles @ A.T - b).max(axis=1) / b.max(axis=1)
+        converged &= residual < 1e-8
+        iterations[~converged] = max_iterations
+        return {'T': np.exp(ln_T), 'moles': moles, 'converged': converged, 'iterations': iterations}
+
+    def chamber_properties(self, T, moles):
+        """
+        Computes the frozen gamma and mean molecular weight of solved states.
+
+        Args:
+            T (np.ndarray): Temperatures (N,).
+            moles (np.ndarray): Species moles (N x species).
+
+        Returns:
+            tuple: (gamma, mean molecular weight in g/mol, mole fractions).
+        """
+        cp = self.thermo(T)[0]
+        fractions = moles / moles.sum(axis=1, keepdims=True)
+        cp_mix = (fractions * cp).sum(axis=1)
+        return cp_mix / (cp_mix - 1.0), fractions @ self.molecular_weights, fractions
+
+
+class NativeEngine:
+    """
+    Batched chamber equilibria with the in-house Gibbs solver.
+
+    The product species are those a ThermoEngine would use; one GibbsSolver
+    is built per element set and reused.
+    """
+
+    def __init__(self, engine=None):
+        """
+        Args:
+            engine (ThermoEngine): Supplies the product species and their
+                element filter. Defaults to a new ThermoEngine.
+        """
+        if engine is None:
+            from ancp_sim.thermo import ThermoEngine
+            engine = ThermoEngine()
+        self.engine = engine
+        self._solvers = {}
+
+    def solver_for(self, elements):
+        """Returns the solver for a set of elements, built on first use."""
+        key = frozenset(elements)
+        solver = self._solvers.get(key)
+        if solver is None:
+            solver = GibbsSolver.from_species(self.engine.product_species_for(key), key)
+            self._solvers[key] = solver
+        return solver
+
+    def chamber_states(self, recipes, ingredients_db, pressures_bar):
+        """
+        Solves the chamber equilibria of many (recipe, pressure) cases.
+
+        Cases with the same elements are solved together in one vectorized
+        iteration.
+
+        Args:
+            recipes (list): Recipes, ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            pressures_bar (array-like): One chamber pressure per recipe, or a
+                single pressure for all.
+
+        Returns:
+            list: Per case, a (ChamberState or None, error message or None,
+                iterations) tuple. States fail the same sanity checks as the
+                Cantera path (T_flame below 500 K, gamma not above 1).
+        """
+        pressures_bar = np.broadcast_to(np.asarray(pressures_bar, dtype=float), (len(recipes),))
+        results = [None] * len(recipes)
+        valid, names = [], []
+        for i, recipe in enumerate(recipes):
+            used = [name for name, pct in recipe.items() if pct > 0]
+            unknown = [name for name in used if name not in ingredients_db]
+            if unknown:
+                results[i] = (None, f"Ingredient '{unknown[0]}' not found in the database.", 0)
+                continue
+            valid.append(i)
+            names.extend(name for name in used if name not in names)
+        if not valid:
+            return results
+
+        matrix = StoichiometryMatrix(ingredients_db, names)
+        stoichiometry = matrix.calculate(matrix.mass_fractions(
+            [{name: pct for name, pct in recipes[i].items() if pct > 0} for i in valid]))
+        element_moles = np.zeros((len(recipes), len(matrix.elements)))
+        enthalpy_J = np.zeros(len(recipes))
+        element_moles[valid] = stoichiometry['elemental_moles']
+        enthalpy_J[valid] = stoichiometry['reactant_enthalpy_kJ_100g'] * 1000
+
+        groups = {}
+        for i in valid:
+            groups.setdefault(tuple(element_moles[i] > 0), []).append(i)
+
+        for mask, rows in groups.items():
+            elements = [element for element, used in zip(matrix.elements, mask) if used]
+            if not elements:
+                for i in rows:
+                    results[i] = (None, "The recipe is empty.", 0)
+                continue
+            try:
+                solver = self.solver_for(elements)
+            except ValueError as e:
+                for i in rows:
+                    results[i] = (None, str(e), 0)
+                continue
+            columns = [matrix.elements.index(element) for element in solver.elements]
+            solved = solver.equilibrate_hp(element_moles[np.ix_(rows, columns)], enthalpy_J[rows],
+                                           pressures_bar[rows] * 1e5)
+            gamma, molecular_weight, fractions = solver.chamber_properties(solved['T'], solved['moles'])
+            for k, i in enumerate(rows):
+                T = float(solved['T'][k])
+                iterations = int(solved['iterations'][k])
+                if not solved['converged'][k]:
+                    results[i] = (None, f"Native equilibrium did not converge in {iterations} iterations", iterations)
+                elif T < 500:
+                    results[i] = (None, f"Flame temperature too low ({T:.0f}K) - combustion didn't occur", iterations)
+                elif not gamma[k] > 1.0:
+                    results[i] = (None, f"Invalid gamma: {gamma[k]:.4f}", iterations)
+                else:
+                    state = ChamberState(
+                        chamber_pressure_bar=float(pressures_bar[i]),
+                        t_flame_K=T,
+                        gamma=float(gamma[k]),
+                        molecular_weight_g_mol=float(molecular_weight[k]),
+                        product_mole_fractions={name: float(x) for name, x in zip(solver.species_names, fractions[k])
+                                                if x > 0},
+                    )
+                    results[i] = (state, None, iterations)
+        return results
+
+    def calculate(self, recipes, ingredients_db, config, pressures_bar):
+        """
+        Calculates the performance of many (recipe, pressure) cases.
+
+        Args:
+            recipes (list): Recipes, ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            config (Mapping): The simulation configuration.
+            pressures_bar (array-like): One chamber pressure per recipe, or one for all.
+
+        Returns:
+            list: One result dictionary per case, as returned by
+                `calculate_thermo`, or with an 'error' entry. The
+                'diagnostics' report the solver as 'native', the iteration
+                count and each case's share of the batch time.
+        """
+        from ancp_sim.performance import performance
+
+        start = time.perf_counter()
+        try:
+            states = self.chamber_states(recipes, ingredients_db, pressures_bar)
+        except ValueError as e:
+            states = [(None, str(e), 0)] * len(recipes)
+        seconds = (time.perf_counter() - start) / max(len(recipes), 1)
+
+        results = []
+        for recipe, (state, error, iterations) in zip(recipes, states):
+            if state is None:
+                result = {'error': error, 't_flame_K': 0}
+            else:
+                result = performance(state, config, recipe)
+            result['diagnostics'] = {
+                'stages_s': {'native_equilibrate': seconds},
+                'total_s': seconds,
+                'attempts': [{'stage': 'hp_equilibrate', 'solver': 'native', 'converged': state is not None,
+                              'seconds': seconds}],
+                'hp_solver': 'native' if state is not None else None,
+                'fallbacks': 0,
+                'warm_start': None,
+                'cached': False,
+                'iterations': iterations,
+            }
+            results.append(result)
+        return results
@@ -0,0 +1,160 @@
+"""
+This module records where the time goes in equilibrium calculations.
+
+A SolveTrace collects the wall time of each stage of one calculation
+(product species load, Solution setup, TP pre-equilibration, HP solve,
+performance) together with every equilibrium
+solver attempt and whether it converged, so it is visible which fallback
+path succeeded. SolveStatistics aggregates the traces of many cases, e.g.
+over a batch run, to find recipes that keep hitting the slow fallbacks.
+"""
+import time
+from contextlib import contextmanager
+
+# The HP solver chain, from the preferred to the last-resort settings
+HP_SOLVERS = ('vcs', 'vcs_relaxed', 'auto')
+
+# The HP solver chain of the multiphase model (`ThermoEngine(multiphase=True)`)
+MULTIPHASE_HP_SOLVERS = ('vcs', 'gibbs')
+
+
+class SolveTrace:
+    """Per-stage wall times and solver attempts of a single calculation."""
+
+    def __init__(self):
+        # stage name -> seconds, in the order the stages first ran
+        self.stages = {}
+        # dicts with stage, solver, converged and seconds
+        self.attempts = []
+        # where a successful warm start came from: 'given', 'index' or None (cold)
+        self.warm_start = None
+        # whether the chamber state came from the result cache
+        self.cached = False
+
+    @contextmanager
+    def span(self, stage):
+        """Times a block and adds it to a stage (stages may run more than once)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def attempt(self, stage, solver):
+        """
+        Times one equilibrium solver call and records whether it converged.
+
+        Exceptions propagate unchanged, so the caller's fallback logic still
+        decides what happens next.
+        """
+        start = time.perf_counter()
+        converged = False
+        try:
+            yield
+            converged = True
+        finally:
+            self.attempts.append({
+                'stage': stage,
+                'solver': solver,
+                'converged': converged,
+                'seconds': time.perf_counter() - start,
+            })
+
+    def solver_for(self, stage):
+        """Returns the solver that converged in a stage, or None if none did."""
+        for attempt in self.attempts:
+            if attempt['stage'] == stage and attempt['converged']:
+                return attempt['solver']
+        return None
+
+    def as_dict(self, cached=None):
+        """
+        Returns the trace as a plain, JSON-serializable dictionary.
+
+        Args:
+            cached (bool): Whether the result came from the result cache.
+                Defaults to the trace's own `cached` flag.
+
+        Returns:
+            dict: 'stages_s' (stage -> seconds), 'total_s', 'attempts',
+                'hp_solver' (the HP solver path that converged, one of
+                HP_SOLVERS or MULTIPHASE_HP_SOLVERS, or None), 'fallbacks' (failed solver attempts),
+                'warm_start' (the source of the initial guess, 'given' or
+                'index', or None for a cold start) and 'cached'.
+        """
+        return {
+            'stages_s': dict(self.stages),
+            'total_s': sum(self.stages.values()),
+            'attempts': [dict(attempt) for attempt in self.attempts],
+            'hp_solver': self.solver_for('hp_equilibrate'),
+            'fallbacks': sum(1 for attempt in self.attempts if not attempt['converged']),
+            'warm_start': self.warm_start,
+            'cached': self.cached if cached is None else cached,
+        }
+
+
+class SolveStatistics:
+    """Aggregates the diagnostics of many calculations."""
+
+    def __init__(self):
+        self.cases = 0
+        self.cached = 0
+        self.failed = 0
+        self.stage_seconds = {}
+        self.hp_solvers = {}
+        # initial guess source ('cold', 'given' or 'index') -> number of solves
+        self.warm_starts = {}
+        # case label -> number of its solves that needed a fallback
+        self.fallback_cases = {}
+
+    def add(self, results, label=None):
+        """
+        Adds one result dictionary.
+
+        Args:
+            results (dict): A result of `calculate_thermo` or a batch record.
+            label (str): Identifies the case (e.g. the recipe) in the list of
+                cases that hit the fallbacks.
+        """
+        self.cases += 1
+        if 'error' in results:
+            self.failed += 1
+        diagnostics = results.get('diagnostics')
+        if not diagnostics:
+            return
+        if diagnostics['cached']:
+            self.cached += 1
+            return
+        for stage, seconds in diagnostics['stages_s'].items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        solver = diagnostics['hp_solver'] or 'failed'
+        self.hp_solvers[solver] = self.hp_solvers.get(solver, 0) + 1
+        source = diagnostics.get('warm_start') or 'cold'
+        self.warm_starts[source] = self.warm_starts.get(source, 0) + 1
+        if diagnostics['fallbacks']:
+            self.fallback_cases[label] = self.fallback_cases.get(label, 0) + 1
+
+    def summary(self, top=10):
+        """
+        Returns the aggregate as a dictionary.
+
+        Args:
+            top (int): How many of the cases with the most fallbacks to list.
+
+        Returns:
+            dict: Case counts, total seconds per stage, the number of solves
+                per HP solver path and per initial guess source, and the
+                (label, count) pairs of the cases
+                that hit the fallbacks most often.
+        """
+        worst = sorted(self.fallback_cases.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            'cases': self.cases,
+            'cached': self.cached,
+            'failed': self.failed,
+            'stage_seconds': dict(self.stage_seconds),
+            'hp_solvers': dict(self.hp_solvers),
+            'warm_starts': dict(self.warm_starts),
+            'fallback_cases': worst,
+        }
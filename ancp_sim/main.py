@@ -1,101 +1,395 @@
 import argparse
+import contextlib
+import importlib
 import json
-from ancp_sim.chemdb import load_ingredients
+import logging
+import math
+import os
+import sys
+# Only light modules at import time: Cantera, NumPy and the cache are imported
+# by the commands that need them, so `stoich` starts quickly.
+from ancp_sim.chemdb import load_chemdb
 from ancp_sim.stoichiometry import calculate_stoichiometry
-from ancp_sim.thermo import calculate_thermo
 from ancp_sim.config import load_config
+from ancp_sim.performance import burn_rate_law, config_sweep, performance
+from ancp_sim.instrumentation import SolveTrace
+from ancp_sim.writers import FORMATS, open_writer
 import ancp_sim.output as output
 
-def apply_catalyst_logic(recipe_composition, config):
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.main')
+
+COMMANDS = ('stoich', 'thermo', 'batch', 'tables', 'uncertainty', 'optimize', 'serve', 'ballistics', 'sensitivity')
+
+# Commands implemented by their own module, imported only when run
+DELEGATED_COMMANDS = {
+    'batch': 'ancp_sim.batch',
+    'tables': 'ancp_sim.tables',
+    'uncertainty': 'ancp_sim.uncertainty',
+    'optimize': 'ancp_sim.optimize',
+    'serve': 'ancp_sim.server',
+    'ballistics': 'ancp_sim.ballistics',
+    'sensitivity': 'ancp_sim.sensitivity',
+}
+
+def parse_pressure_sweep(spec):
     """
-    Checks for a catalyst in the recipe and applies a burn rate multiplier if found.
+    Parses a 'start:stop:step' chamber-pressure sweep specification.
+
+    The stop value is inclusive, e.g. '20:200:10' gives 20, 30, ..., 200 bar.
     """
-    ferric_oxide_pct = recipe_composition.get("Ferric Oxide", 0.0)
-    if ferric_oxide_pct > 1.0:
-        multiplier = config.get("catalyst", {}).get("ferric_oxide_multiplier", 1.0)
-        original_a = config["burn_rate"]["a"]
-        config["burn_rate"]["a"] *= multiplier
-        print(f"\n--- Catalyst Logic Applied ---")
-        print(f"Ferric Oxide detected at {ferric_oxide_pct}%.")
-        print(f"Burn rate coefficient 'a' modified: {original_a} -> {config['burn_rate']['a']}")
-        print("----------------------------\n")
-    return config
-
-def apply_catalyst_logic(recipe_composition, config):
+    try:
+        start, stop, step = (float(v) for v in spec.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid sweep '{spec}', expected start:stop:step in bar")
+    if step <= 0 or stop < start:
+        raise argparse.ArgumentTypeError(f"Invalid sweep '{spec}', need start <= stop and step > 0")
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return [start + i * step for i in range(count)]
+
+def parse_config_sweep(spec):
     """
-    Checks for a catalyst in the recipe and applies a burn rate multiplier if found.
+    Parses a 'section.parameter=start:stop:step' configuration sweep, stop inclusive.
+
+    E.g. 'efficiencies.nozzle_efficiency=0.85:0.95:0.05' gives 0.85, 0.9, 0.95.
     """
-    ferric_oxide_pct = recipe_composition.get("Ferric Oxide", 0.0)
-    if ferric_oxide_pct > 1.0:
-        multiplier = config.get("catalyst", {}).get("ferric_oxide_multiplier", 1.0)
-        original_a = config["burn_rate"]["a"]
-        config["burn_rate"]["a"] *= multiplier
-        print(f"\n--- Catalyst Logic Applied ---")
-        print(f"Ferric Oxide detected at {ferric_oxide_pct}%.")
-        print(f"Burn rate coefficient 'a' modified: {original_a} -> {config['burn_rate']['a']}")
-        print("----------------------------\n")
-    return config
-
-def main():
-    parser = argparse.ArgumentParser(description="ANCP-Sim: Ammonium Nitrate Chemical Propulsion Simulator")
+    parameter, sep, values = spec.rpartition('=')
+    try:
+        start, stop, step = (float(v) for v in values.split(':'))
+    except ValueError:
+        start = None
+    if not sep or not parameter or start is None:
+        raise argparse.ArgumentTypeError(f"Invalid sweep '{spec}', expected 'section.parameter=start:stop:step'")
+    if step <= 0 or stop < start:
+        raise argparse.ArgumentTypeError(f"Invalid sweep '{spec}', need start <= stop and step > 0")
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return parameter, [start + i * step for i in range(count)]
+
+def add_cache_arguments(parser):
+    """Adds the result-cache and warm-start index options shared by the command-line entry points."""
+    parser.add_argument('--cache', action='store_true',
+                        help="Reuse and store chamber equilibria in the persistent result cache")
+    parser.add_argument('--warm-start', action='store_true',
+                        help="Start each solve from the nearest state in the persistent warm-start index, "
+                             "and add the converged states to it")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="Clear the persistent result cache and warm-start index before running")
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help="Directory of the result cache (default: $ANCP_SIM_CACHE_DIR or ~/.cache/ancp_sim)")
+
+def cache_from_args(args):
+    """Opens the result cache if --cache is given, otherwise returns None."""
+    if not args.cache and not args.clear_cache:
+        return None
+    from ancp_sim.cache import ResultCache
+    cache = ResultCache(os.path.join(args.cache_dir, 'results.sqlite') if args.cache_dir else None)
+    if args.clear_cache:
+        cache.clear()
+        logger.info(f"Cleared result cache: {cache.path}")
+    return cache if args.cache else None
+
+def warm_start_index_from_args(args):
+    """Opens the warm-start index next to the result cache if --warm-start is given, otherwise returns None."""
+    if not args.warm_start and not args.clear_cache:
+        return None
+    from ancp_sim.cache import WarmStartIndex
+    index = WarmStartIndex(os.path.join(args.cache_dir, 'warmstart.sqlite') if args.cache_dir else None)
+    if args.clear_cache:
+        index.clear()
+        logger.info(f"Cleared warm-start index: {index.path}")
+    return index if args.warm_start else None
+
+def add_logging_arguments(parser):
+    """Adds the verbosity options shared by the command-line entry points."""
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('-q', '--quiet', action='store_true',
+                           help="Suppress the reports and diagnostics; only warnings and errors are shown")
+    verbosity.add_argument('-v', '--verbose', action='store_true', help="Show the per-step solver diagnostics")
+
+def add_output_arguments(parser):
+    """Adds the logging options and the machine-readable output options."""
+    add_logging_arguments(parser)
+    parser.add_argument('--output', type=str, default=None, metavar='PATH',
+                        help="Write one record per case to PATH ('-' for stdout; a directory for --format npy)")
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help="Output format (default: csv for a .csv path, jsonl otherwise)")
+
+def writer_from_args(args):
+    """Opens the result writer selected on the command line; quiet mode defaults to JSONL on stdout."""
+    path = args.output or ('-' if args.quiet else None)
+    if path is None:
+        return contextlib.nullcontext()
+    return open_writer(path, args.format)
+
+def load_recipe(path):
+    """Loads a recipe file, logging an error and returning None if it cannot be read."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.error(f"The recipe file {path} was not found.")
+    except json.JSONDecodeError:
+        logger.error(f"The recipe file {path} is not a valid JSON file.")
+    return None
+
+def add_stoich_arguments(parser):
+    """Adds the arguments of the `stoich` command."""
+    parser.add_argument('recipe_files', type=str, nargs='+', metavar='recipe_file', help="Propellant recipe file(s)")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    add_logging_arguments(parser)
+    parser.add_argument('--output', type=str, default=None, metavar='PATH',
+                        help="Write one JSON record per recipe to PATH ('-' for stdout)")
+    parser.set_defaults(format='jsonl')
+
+def add_thermo_arguments(parser):
+    """Adds the arguments of the `thermo` command."""
     parser.add_argument('recipe_file', type=str, help="Path to the propellant recipe file (e.g., recipe.json)")
     parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
-    parser.add_argument('--pc', type=float, default=70.0, help="Chamber pressure in bar")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    pressure_group = parser.add_mutually_exclusive_group()
+    pressure_group.add_argument('--pc', type=float, default=70.0, help="Chamber pressure in bar")
+    pressure_group.add_argument('--pc-sweep', type=parse_pressure_sweep, metavar='START:STOP:STEP',
+                                help="Sweep the chamber pressure in bar (stop inclusive), e.g. 20:200:10")
+    parser.add_argument('--config-sweep', type=parse_config_sweep, metavar='PARAM=START:STOP:STEP',
+                        help="Sweep a configuration value at one chamber pressure without re-solving the "
+                             "equilibrium, e.g. 'efficiencies.nozzle_efficiency=0.85:0.95:0.01'")
+    parser.add_argument('--area-ratio', type=float, nargs='+', default=[], metavar='EPS',
+                        help="Nozzle exit-to-throat area ratio(s) to evaluate")
+    parser.add_argument('--exit-pressure', type=float, nargs='+', default=[], metavar='BAR',
+                        help="Nozzle exit pressure(s) in bar to evaluate")
+    parser.add_argument('--nozzle-mode', choices=['frozen', 'shifting'], default='frozen',
+                        help="Nozzle expansion model (default: frozen)")
+    parser.add_argument('--ambient-pressure', type=float, default=None,
+                        help="Ambient pressure in bar for the nozzle Isp (default: sea level)")
+    parser.add_argument('--multiphase', action='store_true',
+                        help="Solve the chamber equilibrium with the condensed products as separate phases")
+    add_cache_arguments(parser)
+    add_output_arguments(parser)
 
-    args = parser.parse_args()
+def build_parser():
+    """Builds the command-line parser with its subcommands."""
+    parser = argparse.ArgumentParser(
+        prog='python3 -m ancp_sim.main',
+        description="ANCP-Sim: Ammonium Nitrate Chemical Propulsion Simulator",
+        epilog="Without a command, the arguments are run as 'thermo' (e.g. 'recipe.json --pc 70')."
+    )
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    add_stoich_arguments(subparsers.add_parser(
+        'stoich', help="Stoichiometry and oxygen balance only (fast, no Cantera)"))
+    add_thermo_arguments(subparsers.add_parser(
+        'thermo', help="Equilibrium thermochemistry, performance and nozzle expansion"))
+    subparsers.add_parser('batch', add_help=False,
+                          help="Evaluate many recipes across a process pool (see 'batch --help')")
+    subparsers.add_parser('tables', add_help=False,
+                          help="Generate a thermochemistry lookup table over a pressure and composition grid "
+                               "(see 'tables --help')")
+    subparsers.add_parser('uncertainty', add_help=False,
+                          help="Monte Carlo uncertainty of a recipe's performance (see 'uncertainty --help')")
+    subparsers.add_parser('optimize', add_help=False,
+                          help="Optimize a recipe's composition for Isp or C* (see 'optimize --help')")
+    subparsers.add_parser('serve', add_help=False,
+                          help="Serve thermo calculations over HTTP or JSON-RPC (see 'serve --help')")
+    subparsers.add_parser('ballistics', add_help=False,
+                          help="Simulate pressure-time and thrust curves of motor designs (see 'ballistics --help')")
+    subparsers.add_parser('sensitivity', add_help=False,
+                          help="Rank the sensitivity of performance to each ingredient (see 'sensitivity --help')")
+    return parser
 
-    output.print_banner()
+def run_stoich(args):
+    """
+    Runs the `stoich` command.
+
+    Returns:
+        int: The exit status, 1 if any recipe could not be evaluated.
+    """
+    output.configure_logging(args.quiet, args.verbose)
+    report = not args.quiet
+
+    ingredients_db = load_chemdb(*args.ingredients)
+    if not ingredients_db:
+        return 1
+
+    status = 0
+    with writer_from_args(args) as writer:
+        for recipe_file in args.recipe_files:
+            recipe_data = load_recipe(recipe_file)
+            if recipe_data is None:
+                status = 1
+                continue
+            propellant_name = recipe_data.get('propellant_name', 'N/A')
+            try:
+                results = calculate_stoichiometry(recipe_data.get("composition", {}), ingredients_db)
+            except ValueError as e:
+                logger.error(f"{recipe_file}: {e}")
+                status = 1
+                continue
+            if report:
+                output.print_stoichiometry(propellant_name, results)
+            if writer:
+                writer.write({'recipe': recipe_file, 'propellant_name': propellant_name, **results})
+    return status
+
+def run_thermo(args):
+    """Runs the `thermo` command."""
+    from ancp_sim.thermo import (ThermoEngine, calculate_thermo, calculate_thermo_sweep, calculate_nozzle,
+                                 SEA_LEVEL_PRESSURE_BAR)
+
+    output.configure_logging(args.quiet, args.verbose)
+    report = not args.quiet
+    if args.ambient_pressure is None:
+        args.ambient_pressure = SEA_LEVEL_PRESSURE_BAR
+
+    if report:
+        output.print_banner()
 
     # Load configuration
     config = load_config(args.config)
-    print(f"Loaded configuration from: {args.config}")
-    print(json.dumps(config, indent=2))
+    if config is None:
+        return
+    logger.info(f"Loaded configuration from: {args.config}")
+    logger.debug(json.dumps(config.to_dict(), indent=2))
+
+    if report:
+        print(f"Recipe File: {args.recipe_file}")
+        if args.pc_sweep:
+            print(f"Chamber Pressure Sweep: {args.pc_sweep[0]} - {args.pc_sweep[-1]} bar ({len(args.pc_sweep)} points)")
+        else:
+            print(f"Chamber Pressure: {args.pc} bar")
+        print("----------------------------")
 
-    print(f"Recipe File: {args.recipe_file}")
-    print(f"Chamber Pressure: {args.pc} bar")
-    print("----------------------------")
+    engine = ThermoEngine(cache=cache_from_args(args), warm_start_index=warm_start_index_from_args(args),
+                          multiphase=args.multiphase)
 
     # Load the chemical database
-    ingredients_db = load_ingredients()
+    ingredients_db = load_chemdb(*args.ingredients)
     if not ingredients_db:
         return
 
     # Load the recipe
-    try:
-        with open(args.recipe_file, 'r') as f:
-            recipe_data = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: The recipe file {args.recipe_file} was not found.")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: The recipe file {args.recipe_file} is not a valid JSON file.")
+    recipe_data = load_recipe(args.recipe_file)
+    if recipe_data is None:
         return
 
-    # Apply catalyst logic
     composition = recipe_data.get("composition", {})
-    config = apply_catalyst_logic(composition, config)
+    law = burn_rate_law(composition, config)
+    if law is not None and law[0] != config["burn_rate"]["a"]:
+        logger.info(f"Catalyst logic applied: Ferric Oxide detected at {composition['Ferric Oxide']}%, "
+                    f"burn rate coefficient 'a' modified: {config['burn_rate']['a']} -> {law[0]}")
 
     # Calculate stoichiometry
+    propellant_name = recipe_data.get('propellant_name', 'N/A')
+    case = {'recipe': args.recipe_file, 'propellant_name': propellant_name}
     try:
         stoichiometry_results = calculate_stoichiometry(composition, ingredients_db)
-        output.print_stoichiometry(recipe_data.get('propellant_name', 'N/A'), stoichiometry_results)
+        if report:
+            output.print_stoichiometry(propellant_name, stoichiometry_results)
+
+        with writer_from_args(args) as writer:
+            # Thermodynamics
+            if args.pc_sweep:
+                sweep_results = calculate_thermo_sweep(composition, ingredients_db, config, args.pc_sweep, engine=engine)
+                if report:
+                    output.print_sweep(sweep_results)
+                if writer:
+                    for row in sweep_results:
+                        writer.write({**case, **row})
+                return
+
+            if args.config_sweep:
+                parameter, values = args.config_sweep
+                try:
+                    state = engine.chamber_state(composition, ingredients_db, args.pc)
+                except Exception as e:
+                    # CanteraError included; the thermo module is only imported here lazily
+                    logger.error(f"Equilibrium failed: {e}")
+                    return
+                rows = config_sweep(state, config, parameter, values, composition)
+                if report:
+                    output.print_config_sweep(parameter, rows)
+                if writer:
+                    for row in rows:
+                        writer.write({**case, 'chamber_pressure_bar': args.pc, **row})
+                return
 
-        # Thermodynamics
-        thermo_results = calculate_thermo(
-            composition,
-            ingredients_db,
-            config,
-            chamber_pressure_bar=args.pc
-        )
-        output.print_thermo(thermo_results)
+            expand = bool(args.area_ratio or args.exit_pressure)
+            if expand:
+                # The nozzle starts from this chamber state, so it is solved
+                # once and post-processed here instead of by calculate_thermo
+                trace = SolveTrace()
+                try:
+                    state = engine.chamber_state(composition, ingredients_db, args.pc, trace=trace)
+                except Exception as e:
+                    # CanteraError included; the thermo module is only imported here lazily
+                    logger.error(f"Equilibrium failed: {e}")
+                    return
+                thermo_results = performance(state, config, composition)
+                thermo_results['diagnostics'] = trace.as_dict()
+            else:
+                thermo_results = calculate_thermo(
+                    composition,
+                    ingredients_db,
+                    config,
+                    chamber_pressure_bar=args.pc,
+                    engine=engine
+                )
+            if report:
+                output.print_thermo(thermo_results)
+            record = {**case, 'chamber_pressure_bar': args.pc, **thermo_results}
+
+            # Nozzle expansion
+            if expand:
+                nozzle_results = calculate_nozzle(
+                    composition,
+                    ingredients_db,
+                    chamber_pressure_bar=args.pc,
+                    area_ratios=args.area_ratio,
+                    exit_pressures_bar=args.exit_pressure,
+                    mode=args.nozzle_mode,
+                    ambient_pressure_bar=args.ambient_pressure,
+                    engine=engine,
+                    chamber=state
+                )
+                if report:
+                    output.print_nozzle(nozzle_results, args.ambient_pressure)
+                record['nozzle'] = nozzle_results
+
+            if writer:
+                writer.write(record)
 
     except ValueError as e:
-        print(f"Error during calculation: {e}")
+        logger.error(f"Error during calculation: {e}")
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+
+def main(argv=None):
+    """
+    Runs the command-line interface.
+
+    Args:
+        argv (list): The arguments, defaulting to sys.argv[1:].
+
+    Returns:
+        int: The exit status of the command, or None for success.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in DELEGATED_COMMANDS:
+        module = importlib.import_module(DELEGATED_COMMANDS[argv[0]])
+        return module.main(argv[1:], prog=f'python3 -m ancp_sim.main {argv[0]}')
+    if argv and argv[0] not in COMMANDS and argv[0] not in ('-h', '--help'):
+        # Backwards compatible form: `main recipe.json --pc 70` runs thermo
+        argv = ['thermo'] + argv
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'stoich':
+        return run_stoich(args)
+    if args.command == 'thermo':
+        return run_thermo(args)
+    parser.print_help()
+    return 2
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+This module optimizes a recipe's composition for delivered Isp or C*.
+
+The search runs over the mass fractions of a chosen set of ingredients
+(summing to 100%) with SciPy's SLSQP, subject to per-ingredient bounds and
+optional constraints on oxygen balance, flame temperature and density. The
+oxygen balance and the ideal-mixing density are linear in the mass
+fractions and are imposed exactly; the flame temperature comes from the
+same equilibrium solves as the objective.
+
+Every composition is solved at most once: results are memoized for the
+run (the finite-difference gradient steps revisit the same points through
+the objective and the constraints) and go through the engine's result
+cache across runs. Each new solve is warm-started from the nearest
+composition solved so far.
+"""
+import argparse
+import json
+import logging
+import sys
+
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.config import load_config
+from ancp_sim.main import (add_cache_arguments, cache_from_args, warm_start_index_from_args, add_logging_arguments,
+                           load_recipe)
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.optimize')
+
+OBJECTIVES = {
+    'isp': 'isp_vacuum_sec_delivered',
+    'isp_ideal': 'isp_vacuum_sec_ideal',
+    'cstar': 'c_star_m_s',
+}
+
+# Finite-difference step of the gradients, as a mass fraction (0.1 percentage point)
+GRADIENT_STEP = 1e-3
+
+# Compositions closer than this (in mass fraction) share a memoized result
+MEMO_DECIMALS = 10
+
+
+class _Evaluator:
+    """Memoized, warm-started equilibrium evaluations over mass-fraction vectors."""
+
+    def __init__(self, engine, ingredients, ingredients_db, config, chamber_pressure_bar):
+        self.engine = engine
+        self.ingredients = ingredients
+        self.ingredients_db = ingredients_db
+        self.config = config
+        self.chamber_pressure_bar = chamber_pressure_bar
+        # rounded mass fractions -> (fractions, results)
+        self._points = {}
+        self.evaluations = 0
+        self.solves = 0
+        self.cache_hits = 0
+
+    def recipe(self, x):
+        """Converts mass fractions to a recipe in percent, clipping round-off below zero."""
+        return {name: max(float(xi), 0.0) * 100.0 for name, xi in zip(self.ingredients, x)}
+
+    def _nearest_state(self, x):
+        """Returns the (T, X) of the closest successfully solved composition, if any."""
+        import numpy as np
+
+        best, best_distance = None, None
+        for fractions, results in self._points.values():
+            if 'error' in results:
+                continue
+            distance = float(np.sum((fractions - x) ** 2))
+            if best_distance is None or distance < best_distance:
+                best, best_distance = results, distance
+        if best is None:
+            return None
+        return best['t_flame_K'], best['product_mole_fractions']
+
+    def __call__(self, x):
+        """Returns the `calculate_thermo` results at mass fractions x."""
+        import numpy as np
+
+        self.evaluations += 1
+        x = np.asarray(x, dtype=float)
+        key = tuple(np.round(x, MEMO_DECIMALS))
+        point = self._points.get(key)
+        if point is not None:
+            return point[1]
+
+        results = self.engine.calculate(self.recipe(x), self.ingredients_db, self.config,
+                                        chamber_pressure_bar=self.chamber_pressure_bar,
+                                        warm_start=self._nearest_state(x))
+        if results.get('diagnostics', {}).get('cached'):
+            self.cache_hits += 1
+        else:
+            self.solves += 1
+        self._points[key] = (x.copy(), results)
+        return results
+
+
+def parse_bound(spec):
+    """Parses a 'Ingredient Name=MIN:MAX' bound in percent."""
+    name, sep, values = spec.rpartition('=')
+    try:
+        low, high = (float(v) for v in values.split(':'))
+    except ValueError:
+        low = high = None
+    if not sep or not name or low is None or not 0 <= low <= high <= 100:
+        raise argparse.ArgumentTypeError(f"Invalid bound '{spec}', expected 'Ingredient Name=MIN:MAX' in percent")
+    return name, (low, high)
+
+
+def parse_range(spec):
+    """Parses a 'MIN:MAX' range; either end may be left empty."""
+    try:
+        low, high = (float(v) if v else None for v in spec.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid range '{spec}', expected MIN:MAX")
+    return low, high
+
+
+def optimize_composition(ingredients_db, config, ingredients, objective='isp', bounds=None, initial_recipe=None,
+                         chamber_pressure_bar=70, oxygen_balance=None, flame_temperature=None, min_density=None,
+                         engine=None, maxiter=100, tolerance=1e-6):
+    """
+    Finds the composition of an ingredient set that maximizes performance.
+
+    Args:
+        ingredients_db (dict): The ingredient database.
+        config (dict): The simulation configuration.
+        ingredients (list): The ingredients whose mass fractions are optimized.
+        objective (str): 'isp' (delivered vacuum Isp), 'isp_ideal' or 'cstar'.
+        bounds (dict): Ingredient name -> (min, max) in percent. Unlisted
+            ingredients may range from 0 to 100%.
+        initial_recipe (dict): Starting composition in percent, e.g. the
+            current recipe. Defaults to the middle of the bounds, which is
+            also used when it holds none of the optimized ingredients.
+        chamber_pressure_bar (float): Chamber pressure in bar.
+        oxygen_balance (tuple): Optional (min, max) oxygen balance in percent;
+            either end may be None.
+        flame_temperature (tuple): Optional (min, max) flame temperature in K;
+            either end may be None.
+        min_density (float): Optional minimum propellant density in g/cm3,
+            from ideal mixing of the ingredient densities.
+        engine (ThermoEngine): The engine to solve with; give it a
+            ResultCache to reuse results across runs. Defaults to the shared
+            engine.
+        maxiter (int): Maximum SLSQP iterations.
+        tolerance (float): SLSQP convergence tolerance on the scaled objective.
+
+    Returns:
+        dict: 'recipe' (the optimum in percent), 'results' (its
+            `calculate_thermo` results), 'objective', 'oxygen_balance_percent',
+            'density_g_cm3', the SLSQP 'success', 'message' and 'iterations',
+            and the counts of 'evaluations', equilibrium 'solves' and result
+            'cache_hits'.
+    """
+    import numpy as np
+    from scipy.optimize import minimize
+    from ancp_sim.stoichiometry import StoichiometryMatrix
+    from ancp_sim.thermo import get_default_engine
+
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {tuple(OBJECTIVES)}.")
+    quantity = OBJECTIVES[objective]
+    ingredients = list(ingredients)
+    bounds = dict(bounds or {})
+    for name in list(bounds) + ingredients:
+        if name not in ingredients_db:
+            raise ValueError(f"Ingredient '{name}' not found in the database.")
+    unknown = set(bounds) - set(ingredients)
+    if unknown:
+        raise ValueError(f"Bounds given for ingredients outside the optimized set: {sorted(unknown)}.")
+
+    limits = np.array([bounds.get(name, (0.0, 100.0)) for name in ingredients]) / 100.0
+    if limits[:, 0].sum() > 1.0 + 1e-12 or limits[:, 1].sum() < 1.0 - 1e-12:
+        raise ValueError("The bounds do not admit a composition summing to 100%.")
+
+    x0 = np.array([(initial_recipe or {}).get(name, 0.0) for name in ingredients], dtype=float)
+    if x0.sum() > 0:
+        x0 = np.clip(x0 / x0.sum(), limits[:, 0], limits[:, 1])
+    else:
+        # No start given, or none of the optimized ingredients in it: start mid-bounds
+        x0 = limits.mean(axis=1)
+    x0 /= x0.sum()
+
+    # Linear constraint data: oxygen balance per unit mass fraction and specific volume
+    matrix = StoichiometryMatrix(ingredients_db, ingredients)
+    oxygen_balance_vector = matrix.calculate(np.eye(len(ingredients)))['oxygen_balance_percent']
+    constraints = [{'type': 'eq', 'fun': lambda x: np.sum(x) - 1.0, 'jac': lambda x: np.ones_like(x)}]
+    if oxygen_balance is not None:
+        ob_low, ob_high = oxygen_balance
+        if ob_low is not None:
+            constraints.append({'type': 'ineq', 'fun': lambda x: (x @ oxygen_balance_vector - ob_low) / 100.0,
+                                'jac': lambda x: oxygen_balance_vector / 100.0})
+        if ob_high is not None:
+            constraints.append({'type': 'ineq', 'fun': lambda x: (ob_high - x @ oxygen_balance_vector) / 100.0,
+                                'jac': lambda x: -oxygen_balance_vector / 100.0})
+
+    specific_volumes = None
+    missing_density = [name for name in ingredients if 'density_g_cm3' not in ingredients_db[name]]
+    if not missing_density:
+        specific_volumes = np.array([1.0 / ingredients_db[name]['density_g_cm3'] for name in ingredients])
+    if min_density is not None:
+        if specific_volumes is None:
+            raise ValueError(f"A density constraint needs densities for {missing_density}.")
+        constraints.append({'type': 'ineq', 'fun': lambda x: 1.0 / min_density - x @ specific_volumes,
+                            'jac': lambda x: -specific_volumes})
+
+    evaluate = _Evaluator(engine or get_default_engine(), ingredients, ingredients_db, config, chamber_pressure_bar)
+
+    def flame_temperature_at(x):
+        results = evaluate(x)
+        return results['t_flame_K'] if 'error' not in results else 0.0
+
+    if flame_temperature is not None:
+        t_low, t_high = flame_temperature
+        if t_low is not None:
+            constraints.append({'type': 'ineq', 'fun': lambda x: (flame_temperature_at(x) - t_low) / 1000.0})
+        if t_high is not None:
+            constraints.append({'type': 'ineq', 'fun': lambda x: (t_high - flame_temperature_at(x)) / 1000.0})
+
+    start = evaluate(x0)
+    scale = abs(start[quantity]) if 'error' not in start and start[quantity] else 1.0
+
+    def negative_objective(x):
+        results = evaluate(x)
+        # A failed solve counts as zero performance
+        return -(results[quantity] if 'error' not in results else 0.0) / scale
+
+    solution = minimize(negative_objective, x0, method='SLSQP', bounds=[tuple(limit) for limit in limits],
+                        constraints=constraints,
+                        options={'maxiter': maxiter, 'ftol': tolerance, 'eps': GRADIENT_STEP})
+
+    x = np.clip(solution.x, limits[:, 0], limits[:, 1])
+    x /= x.sum()
+    results = evaluate(x)
+    logger.info(f"Optimization finished after {solution.nit} iterations: {evaluate.evaluations} evaluations, "
+                f"{evaluate.solves} equilibrium solves, {evaluate.cache_hits} cache hits")
+    return {
+        'success': bool(solution.success),
+        'message': str(solution.message),
+        'iterations': int(solution.nit),
+        'recipe': evaluate.recipe(x),
+        'objective': quantity,
+        'results': results,
+        'oxygen_balance_percent': float(x @ oxygen_balance_vector),
+        'density_g_cm3': float(1.0 / (x @ specific_volumes)) if specific_volumes is not None else None,
+        'evaluations': evaluate.evaluations,
+        'solves': evaluate.solves,
+        'cache_hits': evaluate.cache_hits,
+    }
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="ANCP-Sim: optimize a recipe's composition for performance")
+    parser.add_argument('recipe_file', type=str,
+                        help="Starting recipe; its ingredients form the optimized set")
+    parser.add_argument('--objective', choices=list(OBJECTIVES), default='isp',
+                        help="Maximize delivered Isp (default), ideal Isp or C*")
+    parser.add_argument('--include', type=str, action='append', default=[], metavar='NAME',
+                        help="Add an ingredient (at 0%%) to the optimized set (repeatable)")
+    parser.add_argument('--bound', type=parse_bound, action='append', default=[], metavar='NAME=MIN:MAX',
+                        help="Percentage bounds of an ingredient (repeatable), e.g. 'Magnesium=5:20'")
+    parser.add_argument('--oxygen-balance', type=parse_range, default=None, metavar='MIN:MAX',
+                        help="Allowed oxygen balance in percent, e.g. '-40:' or '-30:-10'")
+    parser.add_argument('--flame-temperature', type=parse_range, default=None, metavar='MIN:MAX',
+                        help="Allowed flame temperature in K, e.g. ':2000'")
+    parser.add_argument('--min-density', type=float, default=None, metavar='G_CM3',
+                        help="Minimum propellant density in g/cm3")
+    parser.add_argument('--pc', type=float, default=70.0, help="Chamber pressure in bar")
+    parser.add_argument('--maxiter', type=int, default=100, help="Maximum optimizer iterations (default: 100)")
+    parser.add_argument('--output', type=str, default=None, metavar='PATH',
+                        help="Write the optimized recipe as a recipe file ('-' for stdout)")
+    parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    add_cache_arguments(parser)
+    add_logging_arguments(parser)
+
+    args = parser.parse_args(argv)
+    output.configure_logging(args.quiet, args.verbose)
+
+    config = load_config(args.config)
+    ingredients_db = load_chemdb(*args.ingredients)
+    recipe_data = load_recipe(args.recipe_file)
+    if not ingredients_db or config is None or recipe_data is None:
+        return 1
+
+    from ancp_sim.thermo import ThermoEngine
+
+    composition = recipe_data.get('composition', {})
+    ingredients = [name for name, pct in composition.items() if pct > 0]
+    ingredients += [name for name in args.include if name not in ingredients]
+    if not args.quiet:
+        output.print_banner()
+    try:
+        result = optimize_composition(
+            ingredients_db, config, ingredients,
+            objective=args.objective,
+            bounds=dict(args.bound),
+            initial_recipe=composition,
+            chamber_pressure_bar=args.pc,
+            oxygen_balance=args.oxygen_balance,
+            flame_temperature=args.flame_temperature,
+            min_density=args.min_density,
+            engine=ThermoEngine(cache=cache_from_args(args), warm_start_index=warm_start_index_from_args(args)),
+            maxiter=args.maxiter
+        )
+    except ValueError as e:
+        logger.error(f"Error during optimization: {e}")
+        return 1
+
+    if not args.quiet:
+        output.print_optimization(result)
+    if args.output:
+        optimized = {
+            'propellant_name': f"{recipe_data.get('propellant_name', 'Recipe')} (optimized for {result['objective']})",
+            'composition': {name: round(pct, 4) for name, pct in result['recipe'].items()},
+        }
+        text = json.dumps(optimized, indent=2)
+        if args.output == '-':
+            print(text)
+        else:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+    return 0 if result['success'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
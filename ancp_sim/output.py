@@ -1,6 +1,34 @@
 """
 This module provides functions for formatting and printing simulation results.
 """
+import logging
+
+def configure_logging(quiet=False, verbose=False, level=None):
+    """
+    Routes the simulator's diagnostics to stderr.
+
+    Reports are printed to stdout, while progress and diagnostic messages go
+    through the 'ancp_sim' loggers, so they can be silenced without losing
+    the results.
+
+    Args:
+        quiet (bool): Only show warnings and errors.
+        verbose (bool): Also show the per-step solver diagnostics.
+        level (int): An explicit logging level, overriding quiet/verbose.
+
+    Returns:
+        int: The logging level in effect.
+    """
+    if level is None:
+        level = logging.DEBUG if verbose else logging.WARNING if quiet else logging.INFO
+    logger = logging.getLogger('ancp_sim')
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level)
+    return level
 
 def print_banner():
     """Prints the main simulator banner."""
@@ -36,6 +64,8 @@ def print_thermo(results):
     print(f"    Flame Temperature (T_flame): {results['t_flame_K']:.1f} K")
     print(f"    Specific Heat Ratio (gamma): {results['gamma']:.4f}")
     print(f"    Product Mol. Weight: {results['product_molecular_weight_g_mol']:.2f} g/mol")
+    if 'condensed_mass_fraction' in results:
+        print(f"    Condensed Mass Fraction: {results['condensed_mass_fraction'] * 100:.1f}%")
 
     print("\n  Ideal Performance:")
     print(f"    Characteristic Velocity (C*): {results['c_star_m_s']:.1f} m/s")
@@ -43,4 +73,155 @@ def print_thermo(results):
 
     print("\n  Delivered Performance (with efficiencies):")
     print(f"    Vacuum Specific Impulse (Isp): {results['isp_vacuum_sec_delivered']:.1f} s")
+    if 'two_phase_efficiency' in results:
+        print(f"    Two-Phase Efficiency (from condensed fraction): {results['two_phase_efficiency']:.3f}")
+    if 'burn_rate_mm_s' in results:
+        print(f"    Burn Rate at Chamber Pressure: {results['burn_rate_mm_s']:.2f} mm/s")
+    print("---------------------------\n")
+
+def print_sweep(results):
+    """Prints a chamber-pressure sweep as a single table."""
+    print("--- Pressure Sweep Results ---")
+    print(f"  {'Pc [bar]':>9} {'T_flame [K]':>12} {'gamma':>8} {'M [g/mol]':>10} {'C* [m/s]':>9} {'Isp ideal [s]':>14} {'Isp deliv. [s]':>15}")
+    for row in results:
+        if 'error' in row:
+            print(f"  {row['chamber_pressure_bar']:>9.1f}  Calculation Error: {row['error']}")
+            continue
+        print(f"  {row['chamber_pressure_bar']:>9.1f} {row['t_flame_K']:>12.1f} {row['gamma']:>8.4f} "
+              f"{row['product_molecular_weight_g_mol']:>10.2f} {row['c_star_m_s']:>9.1f} "
+              f"{row['isp_vacuum_sec_ideal']:>14.1f} {row['isp_vacuum_sec_delivered']:>15.1f}")
+    print("------------------------------\n")
+
+def print_config_sweep(parameter, results):
+    """Prints the performance of one chamber state over a configuration sweep."""
+    print("--- Configuration Sweep Results ---")
+    print(f"  {parameter:>36} {'C* [m/s]':>9} {'Isp ideal [s]':>14} {'Isp deliv. [s]':>15} {'Burn rate [mm/s]':>17}")
+    for row in results:
+        burn_rate = f"{row['burn_rate_mm_s']:>17.2f}" if 'burn_rate_mm_s' in row else f"{'-':>17}"
+        print(f"  {row[parameter]:>36.4g} {row['c_star_m_s']:>9.1f} {row['isp_vacuum_sec_ideal']:>14.1f} "
+              f"{row['isp_vacuum_sec_delivered']:>15.1f} {burn_rate}")
+    print("-----------------------------------\n")
+
+def print_batch_record(record):
+    """Prints a one-line summary of a batch case as soon as it completes."""
+    label = f"{record['propellant_name']} @ {record['chamber_pressure_bar']:.1f} bar"
+    if 'error' in record:
+        print(f"  [FAILED] {label}: {record['error']}")
+        return
+    print(f"  [OK] {label}: T_flame={record['t_flame_K']:.1f} K, gamma={record['gamma']:.4f}, "
+          f"C*={record['c_star_m_s']:.1f} m/s, Isp={record['isp_vacuum_sec_delivered']:.1f} s")
+
+def print_nozzle(results, ambient_pressure_bar):
+    """Prints nozzle throat conditions and the exit conditions of each expansion point."""
+    print(f"--- Nozzle Expansion ({results['mode']} equilibrium) ---")
+    print(f"  Throat: P={results['throat_pressure_bar']:.2f} bar, T={results['throat_temperature_K']:.1f} K, "
+          f"C*={results['c_star_m_s']:.1f} m/s")
+    print(f"  {'Area ratio':>10} {'P_exit [bar]':>13} {'T_exit [K]':>11} {'Mach':>6} {'Isp vac [s]':>12} "
+          f"{f'Isp @{ambient_pressure_bar:g} bar [s]':>20}")
+    for point in results['points']:
+        print(f"  {point['area_ratio']:>10.2f} {point['exit_pressure_bar']:>13.4f} {point['exit_temperature_K']:>11.1f} "
+              f"{point['exit_mach']:>6.2f} {point['isp_vacuum_sec']:>12.1f} {point['isp_ambient_sec']:>20.1f}")
+    print("-----------------------------------------\n")
+
+def print_benchmark(rows, threshold):
+    """Prints benchmark timings next to the baseline, flagging regressions beyond the threshold."""
+    print(f"--- Benchmarks (regression threshold {threshold:.0%}) ---")
+    print(f"  {'Benchmark':<48} {'Baseline [ms]':>14} {'Current [ms]':>13} {'Ratio':>7}  Status")
+    for name, reference, seconds, ratio, status in rows:
+        baseline = f"{reference * 1e3:>14.3f}" if reference is not None else f"{'-':>14}"
+        change = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+        flag = status.upper() if status == 'regression' else status
+        print(f"  {name:<48} {baseline} {seconds * 1e3:>13.3f} {change}  {flag}")
+    print("------------------------------------------\n")
+
+def print_solve_statistics(summary):
+    """Prints where the solve time went over many cases and which cases needed solver fallbacks."""
+    print("--- Solver Statistics ---")
+    print(f"  Cases: {summary['cases']} ({summary['cached']} cached, {summary['failed']} failed)")
+    total = sum(summary['stage_seconds'].values())
+    if total > 0:
+        print("  Wall time per stage:")
+        for stage, seconds in sorted(summary['stage_seconds'].items(), key=lambda item: item[1], reverse=True):
+            print(f"    {stage:<22}: {seconds:8.3f} s ({seconds / total * 100:5.1f}%)")
+    if summary['hp_solvers']:
+        print("  HP solver path: " + ", ".join(f"{solver}={count}" for solver, count in summary['hp_solvers'].items()))
+    if summary.get('warm_starts'):
+        print("  Initial guess: " + ", ".join(f"{source}={count}" for source, count in summary['warm_starts'].items()))
+    if summary['fallback_cases']:
+        print("  Cases with the most solver fallbacks:")
+        for label, count in summary['fallback_cases']:
+            print(f"    {label}: {count}")
+    print("-------------------------\n")
+
+def print_uncertainty(summary):
+    """Prints the Monte Carlo distribution of each result quantity."""
+    print("--- Uncertainty Results ---")
+    print(f"  Samples: {summary['samples']} ({summary['failed']} failed)")
+    quantities = summary['quantities']
+    percentile_names = list(next(iter(quantities.values()))['percentiles']) if quantities else []
+    header = f"  {'Quantity':<26} {'Mean':>10} {'Std':>9} {'Min':>10}"
+    header += "".join(f" {name:>10}" for name in percentile_names) + f" {'Max':>10}"
+    print(header)
+    for quantity, stats in quantities.items():
+        row = f"  {quantity:<26} {stats['mean']:>10.4g} {stats['std']:>9.3g} {stats['min']:>10.4g}"
+        row += "".join(f" {value:>10.4g}" for value in stats['percentiles'].values()) + f" {stats['max']:>10.4g}"
+        print(row)
     print("---------------------------\n")
+
+
+def print_optimization(result):
+    """Prints the optimized composition and its performance."""
+    print("--- Optimization Results ---")
+    status = "converged" if result['success'] else f"not converged ({result['message']})"
+    print(f"  Status: {status} after {result['iterations']} iterations")
+    print(f"  Equilibrium Solves: {result['solves']} ({result['cache_hits']} cache hits, "
+          f"{result['evaluations']} evaluations)")
+    print("  Composition:")
+    for name, pct in result['recipe'].items():
+        print(f"    {name:<34} {pct:>7.3f} %")
+    print(f"  Oxygen Balance: {result['oxygen_balance_percent']:.2f} %")
+    if result['density_g_cm3'] is not None:
+        print(f"  Density: {result['density_g_cm3']:.4f} g/cm3")
+    results = result['results']
+    if 'error' in results:
+        print(f"  Error: {results['error']}")
+    else:
+        print(f"  Flame Temperature (T_flame): {results['t_flame_K']:.2f} K")
+        print(f"  Characteristic Velocity (C*): {results['c_star_m_s']:.2f} m/s")
+        print(f"  Isp (Vacuum, Delivered): {results['isp_vacuum_sec_delivered']:.2f} s")
+    print("----------------------------\n")
+
+def print_ballistics(summary):
+    """Prints the burn summary of each simulated motor design."""
+    print("--- Ballistics Results ---")
+    print(f"  {'Design':<24} {'Kn init/max':>13} {'Burn [s]':>9} {'Pmax [bar]':>11} {'Pavg [bar]':>11} "
+          f"{'Impulse [Ns]':>13} {'Isp [s]':>8} {'Class':>6}")
+    for row in summary:
+        kn = f"{row['kn_initial']:.0f}/{row['kn_max']:.0f}"
+        print(f"  {row['name']:<24} {kn:>13} {row['burn_time_s']:>9.2f} {row['max_pressure_bar']:>11.1f} "
+              f"{row['average_pressure_bar']:>11.1f} {row['total_impulse_Ns']:>13.1f} {row['delivered_isp_s']:>8.1f} "
+              f"{row['motor_class']:>6}")
+    print("--------------------------\n")
+
+def print_sensitivity(report, quantities):
+    """Prints the ranked sensitivities of one recipe: elasticities and derivatives per parameter."""
+    print(f"--- Sensitivity: {report['propellant_name']} at {report['chamber_pressure_bar']:g} bar ---")
+    if 'error' in report['base']:
+        print(f"  Calculation Error: {report['base']['error']}")
+        return
+    labels = {'isp_vacuum_sec_delivered': 'Isp', 't_flame_K': 'T_flame', 'c_star_m_s': 'C*'}
+    names = [labels.get(quantity, quantity) for quantity in quantities]
+    print(f"  {'Parameter':<44} {'Value':>10}" + "".join(f" {'E(' + name + ')':>11}" for name in names)
+          + "".join(f" {'d' + name + '/dp':>13}" for name in names) + "  Unit of p")
+    for row in report['sensitivities']:
+        parameter = row['parameter'] + (' *' if row['per_step'] else '')
+        line = f"  {parameter:<44} {row['value']:>10.4g}"
+        line += "".join(f" {row['elasticities'][quantity]:>11.4f}" for quantity in quantities)
+        line += "".join(f" {row['derivatives'][quantity]:>13.4g}" for quantity in quantities)
+        print(line + f"  {row['unit']}")
+    if report['failed']:
+        print(f"  {report['failed']} parameter(s) failed to solve (NaN)")
+    print("  E: relative change of the output per relative change of the parameter")
+    if any(row['per_step'] for row in report['sensitivities']):
+        print("  *: zero enthalpy of formation, E is per enthalpy step instead")
+    print()
@@ -0,0 +1,256 @@
+"""
+This module turns a solved chamber state into performance figures.
+
+The equilibrium solve (`ThermoEngine.chamber_state`) is the only expensive,
+Cantera-dependent step; its result is a ChamberState record. Everything
+derived from it here is closed-form and cheap: the ideal C* and vacuum Isp,
+the delivered Isp with the configured efficiencies, and the burn rate at the
+chamber pressure from the Saint-Robert law with the catalyst multiplier.
+For multiphase chamber states, the two-phase efficiency can follow from the
+condensed mass fraction instead of a fixed value (`two_phase_efficiency`).
+A sweep over configuration values therefore reuses one chamber state and
+never touches Cantera.
+"""
+import logging
+import math
+from dataclasses import dataclass, field, asdict, replace
+
+logger = logging.getLogger(__name__)
+
+# Universal gas constant in J/(kmol K), as used by Cantera
+GAS_CONSTANT = 8314.46261815324
+G0 = 9.80665
+
+EFFICIENCIES = ('combustion_efficiency', 'nozzle_efficiency', 'two_phase_efficiency')
+
+# Ferric oxide percentage above which the catalyst burn-rate multiplier applies
+CATALYST_THRESHOLD_PCT = 1.0
+
+
+@dataclass(frozen=True)
+class ChamberState:
+    """The equilibrium chamber conditions of a recipe at one chamber pressure."""
+
+    chamber_pressure_bar: float
+    t_flame_K: float
+    gamma: float
+    # Mean molecular weight of the products in g/mol (kg/kmol)
+    molecular_weight_g_mol: float
+    product_mole_fractions: dict = field(default_factory=dict)
+    # Multiphase states only: the mass fraction of the products in condensed
+    # phases, and gamma of the gas phase alone. With condensed phases, the
+    # molecular weight is the total mass per mole of gas.
+    condensed_mass_fraction: float = None
+    gas_gamma: float = None
+
+    def as_dict(self):
+        """Returns the state as a plain, JSON-serializable dictionary."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a state written by `as_dict`."""
+        return cls(**data)
+
+
+def ideal_performance(state):
+    """
+    Computes the ideal characteristic velocity and vacuum specific impulse.
+
+    Args:
+        state (ChamberState): The chamber conditions.
+
+    Returns:
+        dict: 'c_star_m_s', 'cf_vacuum' (the vacuum thrust coefficient of
+            full expansion) and 'isp_vacuum_sec_ideal'.
+    """
+    gamma = state.gamma
+    vdk_gamma = math.sqrt(gamma) * (2 / (gamma + 1))**((gamma + 1) / (2 * (gamma - 1)))
+    c_star = math.sqrt(GAS_CONSTANT * state.t_flame_K / state.molecular_weight_g_mol) / vdk_gamma
+
+    term1 = 2 * gamma**2 / (gamma - 1)
+    term2 = (2 / (gamma + 1))**((gamma + 1) / (gamma - 1))
+    cf_vacuum = math.sqrt(term1 * term2)
+
+    return {
+        'c_star_m_s': c_star,
+        'cf_vacuum': cf_vacuum,
+        'isp_vacuum_sec_ideal': cf_vacuum * c_star / G0,
+    }
+
+
+def overall_efficiency(config, two_phase_efficiency=None):
+    """
+    Returns the product of the configured efficiencies (each defaults to 1).
+
+    Args:
+        config (Mapping): The simulation configuration.
+        two_phase_efficiency (float): Optional value used in place of the
+            configured 'two_phase_efficiency'.
+    """
+    efficiencies = config.get("efficiencies", {})
+    if two_phase_efficiency is not None:
+        efficiencies = {**efficiencies, 'two_phase_efficiency': two_phase_efficiency}
+    product = 1.0
+    for name in EFFICIENCIES:
+        product *= efficiencies.get(name, 1.0)
+    return product
+
+
+def two_phase_efficiency(state, particle_lag):
+    """
+    Estimates the two-phase efficiency of a multiphase chamber state.
+
+    The ideal performance assumes the condensed particles stay in velocity
+    and thermal equilibrium with the gas. In the opposite limit the
+    particles lag completely: they are neither accelerated nor cooled, so
+    only the gas phase (gamma `gas_gamma`, molecular weight of the gas
+    alone) expands, while the whole mass flow counts against the Isp. The
+    efficiency interpolates between the two limits.
+
+    Args:
+        state (ChamberState): A multiphase chamber state.
+        particle_lag (float): 0 for particles in equilibrium with the gas
+            (efficiency 1), 1 for fully lagging particles.
+
+    Returns:
+        float: The ratio of the delivered to the equilibrium ideal Isp.
+    """
+    xi = state.condensed_mass_fraction
+    if not xi:
+        return 1.0
+    gas_only = replace(state, gamma=state.gas_gamma, molecular_weight_g_mol=state.molecular_weight_g_mol * (1 - xi))
+    lagging = (1 - xi) * ideal_performance(gas_only)['isp_vacuum_sec_ideal']
+    return 1.0 - particle_lag * (1.0 - lagging / ideal_performance(state)['isp_vacuum_sec_ideal'])
+
+
+def burn_rate_law(composition, config):
+    """
+    Returns the Saint-Robert burn-rate law r = a * P^n of a recipe.
+
+    Args:
+        composition (dict): Ingredient names mapped to mass percentages; more
+            than CATALYST_THRESHOLD_PCT of Ferric Oxide applies the catalyst
+            multiplier to 'a'.
+        config (Mapping): The simulation configuration.
+
+    Returns:
+        tuple: (a, n), or None if the configuration has no burn-rate law.
+    """
+    law = config.get("burn_rate")
+    if not law:
+        return None
+    a = law["a"]
+    if composition.get("Ferric Oxide", 0.0) > CATALYST_THRESHOLD_PCT:
+        a *= config.get("catalyst", {}).get("ferric_oxide_multiplier", 1.0)
+    return a, law["n"]
+
+
+def burn_rate_mm_s(pressure_bar, a, n):
+    """
+    Evaluates the burn-rate law.
+
+    Args:
+        pressure_bar (float or array): Chamber pressure in bar.
+        a (float): Coefficient, in mm/s at a pressure of 1 MPa.
+        n (float): Pressure exponent.
+
+    Returns:
+        The burn rate in mm/s (same shape as pressure_bar).
+    """
+    return a * (pressure_bar / 10.0) ** n
+
+
+def performance(state, config, composition=None):
+    """
+    Computes the performance results of a chamber state.
+
+    Args:
+        state (ChamberState): The chamber conditions.
+        config (Mapping): The simulation configuration (efficiencies, burn rate).
+        composition (dict): The recipe, for the catalyst check of the burn
+            rate. Without it no catalyst is assumed.
+
+    Returns:
+        dict: The results documented in `calculate_thermo`: 't_flame_K',
+            'gamma', 'product_molecular_weight_g_mol', 'c_star_m_s',
+            'isp_vacuum_sec_ideal', 'isp_vacuum_sec_delivered',
+            'product_mole_fractions' and, if the configuration has a burn-rate
+            law, 'burn_rate_mm_s' at the chamber pressure. Multiphase states
+            add 'condensed_mass_fraction'; if the configuration also has a
+            'two_phase.particle_lag', the 'two_phase_efficiency' estimated
+            from it replaces the configured one and is reported as well.
+    """
+    ideal = ideal_performance(state)
+    particle_lag = config.get("two_phase", {}).get("particle_lag")
+    efficiency = None
+    if state.condensed_mass_fraction is not None and particle_lag is not None:
+        efficiency = two_phase_efficiency(state, particle_lag)
+    isp_sec_delivered = ideal['isp_vacuum_sec_ideal'] * overall_efficiency(config, efficiency)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=== Equilibrium Products ===\n"
+                     f"Flame Temperature: {state.t_flame_K:.1f} K\n"
+                     f"Molecular Weight: {state.molecular_weight_g_mol:.2f} g/mol\n"
+                     f"Gamma: {state.gamma:.4f}\n"
+                     f"C*: {ideal['c_star_m_s']:.1f} m/s\n"
+                     f"Isp (ideal): {ideal['isp_vacuum_sec_ideal']:.1f} s\n"
+                     f"Isp (delivered): {isp_sec_delivered:.1f} s")
+
+        lines = ["Major Products (>2%):"]
+        products = []
+        for name, frac in state.product_mole_fractions.items():
+            if frac > 0.02:
+                phase = "condensed" if any(tag in name for tag in ("(s)", "(l)", "(L)", "(cr)", "(gr)")) else "gas"
+                products.append((name, frac, phase))
+
+        for name, frac, phase in sorted(products, key=lambda x: x[1], reverse=True):
+            lines.append(f"  {name:15s}: {frac*100:5.2f}% ({phase})")
+        logger.debug("\n".join(lines))
+
+    results = {
+        't_flame_K': state.t_flame_K,
+        'gamma': state.gamma,
+        'product_molecular_weight_g_mol': state.molecular_weight_g_mol,
+        'c_star_m_s': ideal['c_star_m_s'],
+        'isp_vacuum_sec_ideal': ideal['isp_vacuum_sec_ideal'],
+        'isp_vacuum_sec_delivered': isp_sec_delivered,
+        'product_mole_fractions': dict(state.product_mole_fractions)
+    }
+    if state.condensed_mass_fraction is not None:
+        results['condensed_mass_fraction'] = state.condensed_mass_fraction
+    if efficiency is not None:
+        results['two_phase_efficiency'] = efficiency
+    law = burn_rate_law(composition or {}, config)
+    if law is not None:
+        results['burn_rate_mm_s'] = burn_rate_mm_s(state.chamber_pressure_bar, *law)
+    return results
+
+
+def config_sweep(state, config, parameter, values, composition=None):
+    """
+    Evaluates one chamber state over a range of configuration values.
+
+    No equilibrium is solved, so this runs without Cantera.
+
+    Args:
+        state (ChamberState): The chamber conditions.
+        config (Config): The base configuration.
+        parameter (str): Dotted path of the swept value, e.g.
+            'efficiencies.nozzle_efficiency' or 'burn_rate.n'.
+        values (iterable): The values to evaluate.
+        composition (dict): The recipe, for the catalyst check.
+
+    Returns:
+        list: One `performance` result per value, with the value added under
+            the parameter name.
+    """
+    from ancp_sim.config import Config
+
+    base = config if isinstance(config, Config) else Config(config)
+    rows = []
+    for value in values:
+        results = performance(state, base.replace({parameter: value}), composition)
+        results[parameter] = value
+        rows.append(results)
+    return rows
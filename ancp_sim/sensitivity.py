@@ -0,0 +1,310 @@
+"""
+This module ranks how strongly a recipe's performance depends on each input.
+
+For every recipe the derivatives of T_flame, C* and delivered Isp are taken
+by central differences with respect to
+
+-   each ingredient's mass percentage, moved along the simplex: the other
+    ingredients are scaled proportionally so the recipe stays at 100%;
+-   each ingredient's enthalpy of formation;
+-   the chamber pressure.
+
+The base point of every recipe is solved first; all perturbed solves of all
+recipes then run together over a process pool, each warm-started from the
+equilibrium of its base point. Parameters are ranked by their elasticity
+(the relative change of the output per relative change of the parameter),
+which compares percentages, enthalpies and pressures on one scale. The
+relative change of an enthalpy of formation is taken against its magnitude.
+Elements such as Magnesium have a zero enthalpy, where a relative change is
+meaningless: their elasticity is taken per enthalpy step instead, and the
+row is marked 'per_step'.
+"""
+import argparse
+import json
+import logging
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from ancp_sim.batch import load_recipes
+from ancp_sim.chemdb import ChemDB, load_chemdb
+from ancp_sim.config import load_config
+from ancp_sim.main import add_logging_arguments
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.sensitivity')
+
+# Result keys differentiated
+QUANTITIES = (
+    'isp_vacuum_sec_delivered',
+    't_flame_K',
+    'c_star_m_s',
+)
+
+# Default central-difference steps
+COMPOSITION_STEP_PCT = 0.5
+ENTHALPY_STEP_KJ_MOL = 5.0
+PRESSURE_STEP_FRACTION = 0.05
+
+# Perturbed solves per job sent to a worker
+CHUNK_SIZE = 8
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def shift_ingredient(recipe, name, percentage):
+    """
+    Sets one ingredient's percentage and rescales the others to fill 100%.
+
+    Args:
+        recipe (dict): Ingredient names mapped to mass percentages (summing to 100).
+        name (str): The ingredient to move.
+        percentage (float): Its new percentage.
+
+    Returns:
+        dict: The new recipe.
+    """
+    total = sum(recipe.values())
+    others = total - recipe.get(name, 0.0)
+    if others <= 0:
+        raise ValueError(f"'{name}' is the only ingredient; its percentage cannot change.")
+    scale = (total - percentage) / others
+    shifted = {other: pct * scale for other, pct in recipe.items()}
+    shifted[name] = percentage
+    return shifted
+
+
+def perturbations(recipe, ingredients_db, chamber_pressure_bar, composition_step_pct=COMPOSITION_STEP_PCT,
+                  enthalpy_step_kJ_mol=ENTHALPY_STEP_KJ_MOL, pressure_step_fraction=PRESSURE_STEP_FRACTION):
+    """
+    Lists the parameters of a recipe with their low and high perturbed inputs.
+
+    Percentages are clipped to [0, 100], so an ingredient near zero gets a
+    one-sided difference.
+
+    Args:
+        recipe (dict): Ingredient names mapped to mass percentages.
+        ingredients_db (ChemDB): The ingredient database; a plain dictionary
+            is converted to a ChemDB first.
+        chamber_pressure_bar (float): The base chamber pressure in bar.
+        composition_step_pct (float): Step of the percentages, in percentage points.
+        enthalpy_step_kJ_mol (float): Step of the enthalpies of formation.
+        pressure_step_fraction (float): Relative step of the chamber pressure.
+
+    Returns:
+        list: One dict per parameter with 'parameter' (e.g. 'composition:Magnesium'),
+            'kind', 'name', 'value' (the base value), 'unit', 'scale' (the
+            change of the parameter the elasticity is taken per: the magnitude
+            of the value, or the step for a zero enthalpy), 'per_step'
+            (whether the scale is that step) and 'low'/'high':
+            (parameter value, recipe, enthalpy overrides, chamber pressure) tuples.
+    """
+    names = [name for name, pct in recipe.items() if pct > 0]
+    parameters = []
+    if len(names) > 1:
+        for name in names:
+            value = recipe[name]
+            low, high = max(value - composition_step_pct, 0.0), min(value + composition_step_pct, 100.0)
+            parameters.append({
+                'parameter': f'composition:{name}', 'kind': 'composition', 'name': name, 'value': value, 'unit': '%',
+                'scale': value, 'per_step': False,
+                'low': (low, shift_ingredient(recipe, name, low), {}, chamber_pressure_bar),
+                'high': (high, shift_ingredient(recipe, name, high), {}, chamber_pressure_bar),
+            })
+    for name in names:
+        value = ingredients_db[name]['enthalpy_formation_kJ_mol']
+        low, high = value - enthalpy_step_kJ_mol, value + enthalpy_step_kJ_mol
+        parameters.append({
+            'parameter': f'enthalpy:{name}', 'kind': 'enthalpy', 'name': name, 'value': value, 'unit': 'kJ/mol',
+            'scale': abs(value) or enthalpy_step_kJ_mol, 'per_step': value == 0,
+            'low': (low, recipe, {name: low}, chamber_pressure_bar),
+            'high': (high, recipe, {name: high}, chamber_pressure_bar),
+        })
+    low, high = chamber_pressure_bar * (1 - pressure_step_fraction), chamber_pressure_bar * (1 + pressure_step_fraction)
+    parameters.append({
+        'parameter': 'chamber_pressure', 'kind': 'pressure', 'name': 'chamber_pressure_bar',
+        'value': chamber_pressure_bar, 'unit': 'bar', 'scale': chamber_pressure_bar, 'per_step': False,
+        'low': (low, recipe, {}, low),
+        'high': (high, recipe, {}, high),
+    })
+    return parameters
+
+
+def _init_worker(ingredients_db, config, log_level=None):
+    """Creates the warm engine held by a worker process."""
+    from ancp_sim.thermo import ThermoEngine
+    if log_level is not None:
+        output.configure_logging(level=log_level)
+    _worker['engine'] = ThermoEngine()
+    _worker['ingredients_db'] = ingredients_db
+    _worker['config'] = config
+
+
+def _solve(recipe, enthalpies, chamber_pressure_bar, warm_start=None):
+    """Solves one case with enthalpy overrides. Never raises; failures are reported in the result."""
+    ingredients_db = _worker['ingredients_db']
+    if enthalpies:
+        ingredients_db = ingredients_db.with_enthalpies(enthalpies)
+    try:
+        return _worker['engine'].calculate(recipe, ingredients_db, _worker['config'],
+                                           chamber_pressure_bar=chamber_pressure_bar, warm_start=warm_start)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+
+
+def _run_chunk(chunk):
+    """Solves a chunk of (key, recipe, enthalpies, Pc, warm start) jobs."""
+    return [(key, _solve(recipe, enthalpies, pc, warm_start)) for key, recipe, enthalpies, pc, warm_start in chunk]
+
+
+def _map(jobs, pool):
+    """Runs jobs in chunks over the pool, or in this process without one."""
+    chunks = [jobs[start:start + CHUNK_SIZE] for start in range(0, len(jobs), CHUNK_SIZE)]
+    results = {}
+    for chunk_results in (pool.map(_run_chunk, chunks) if pool else map(_run_chunk, chunks)):
+        results.update(chunk_results)
+    return results
+
+
+def analyze(recipes, ingredients_db, config, chamber_pressure_bar=70, workers=None,
+            worker_log_level=logging.WARNING, **steps):
+    """
+    Computes the ranked sensitivities of several recipes.
+
+    Args:
+        recipes (list): (recipe_id, recipe_data) tuples, as from `batch.load_recipes`.
+        ingredients_db (ChemDB): The ingredient database; a plain dictionary
+            is converted to a ChemDB first.
+        config (dict): The simulation configuration.
+        chamber_pressure_bar (float): The base chamber pressure in bar.
+        workers (int): Number of worker processes. Defaults to the CPU count;
+            1 runs everything in the current process.
+        worker_log_level (int): Logging level of the worker processes.
+        **steps: Step sizes passed on to `perturbations`.
+
+    Returns:
+        list: One report per recipe with 'recipe', 'propellant_name', 'base'
+            (the base-point results or an 'error'), 'failed' (the number of
+            failed perturbed solves) and 'sensitivities': one dict per
+            parameter with 'parameter', 'kind', 'name', 'value', 'unit',
+            'scale', 'per_step', 'derivatives' and 'elasticities' (quantity -> value, NaN
+            where a solve failed), in descending order of the largest
+            elasticity. An elasticity is derivative * scale / base value.
+    """
+    if not isinstance(ingredients_db, ChemDB):
+        ingredients_db = ChemDB(ingredients_db)
+    if workers == 1:
+        _init_worker(ingredients_db, config)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(ingredients_db, config, worker_log_level))
+    try:
+        compositions = [recipe_data.get('composition', {}) for _, recipe_data in recipes]
+        bases = _map([(i, composition, {}, chamber_pressure_bar, None) for i, composition in enumerate(compositions)],
+                     pool)
+
+        parameters, jobs = {}, []
+        for i, composition in enumerate(compositions):
+            if 'error' in bases[i]:
+                continue
+            warm_start = (bases[i]['t_flame_K'], bases[i]['product_mole_fractions'])
+            parameters[i] = perturbations(composition, ingredients_db, chamber_pressure_bar, **steps)
+            for j, parameter in enumerate(parameters[i]):
+                for side in ('low', 'high'):
+                    _, recipe, enthalpies, pc = parameter[side]
+                    jobs.append(((i, j, side), recipe, enthalpies, pc, warm_start))
+        logger.info(f"Solving {len(jobs)} perturbed cases of {len(recipes)} recipe(s)")
+        solved = _map(jobs, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    reports = []
+    for i, (recipe_id, recipe_data) in enumerate(recipes):
+        report = {'recipe': recipe_id, 'propellant_name': recipe_data.get('propellant_name', 'N/A'),
+                  'chamber_pressure_bar': chamber_pressure_bar, 'base': bases[i], 'failed': 0, 'sensitivities': []}
+        for j, parameter in enumerate(parameters.get(i, [])):
+            low, high = solved[(i, j, 'low')], solved[(i, j, 'high')]
+            failed = 'error' in low or 'error' in high
+            report['failed'] += failed
+            derivatives, elasticities = {}, {}
+            for quantity in QUANTITIES:
+                derivative = math.nan
+                if not failed:
+                    derivative = (high[quantity] - low[quantity]) / (parameter['high'][0] - parameter['low'][0])
+                derivatives[quantity] = derivative
+                elasticities[quantity] = derivative * parameter['scale'] / bases[i][quantity]
+            report['sensitivities'].append({
+                key: parameter[key] for key in ('parameter', 'kind', 'name', 'value', 'unit', 'scale', 'per_step')
+            } | {'derivatives': derivatives, 'elasticities': elasticities})
+        report['sensitivities'].sort(key=lambda row: max((abs(e) for e in row['elasticities'].values() if not math.isnan(e)),
+                                                         default=-1.0), reverse=True)
+        reports.append(report)
+    return reports
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="ANCP-Sim: rank the sensitivity of performance to each input")
+    parser.add_argument('recipes', type=str, nargs='+',
+                        help="Recipe files, directories, glob patterns or .jsonl files")
+    parser.add_argument('--pc', type=float, default=70.0, help="Chamber pressure in bar")
+    parser.add_argument('--composition-step', type=float, default=COMPOSITION_STEP_PCT, metavar='PCT',
+                        help=f"Step of each percentage in percentage points (default: {COMPOSITION_STEP_PCT})")
+    parser.add_argument('--enthalpy-step', type=float, default=ENTHALPY_STEP_KJ_MOL, metavar='KJ_MOL',
+                        help=f"Step of each enthalpy of formation in kJ/mol (default: {ENTHALPY_STEP_KJ_MOL})")
+    parser.add_argument('--pressure-step', type=float, default=PRESSURE_STEP_FRACTION, metavar='FRACTION',
+                        help=f"Relative step of the chamber pressure (default: {PRESSURE_STEP_FRACTION})")
+    parser.add_argument('--report', type=str, default=None, metavar='PATH',
+                        help="Also write the reports as JSON ('-' for stdout)")
+    parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    add_logging_arguments(parser)
+
+    args = parser.parse_args(argv)
+    output.configure_logging(args.quiet, args.verbose)
+
+    config = load_config(args.config)
+    ingredients_db = load_chemdb(*args.ingredients)
+    if not ingredients_db or config is None:
+        return 1
+    try:
+        recipes = [recipe for source in args.recipes for recipe in load_recipes(source)]
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load the recipes: {e}")
+        return 1
+    if not recipes:
+        logger.error("No recipes found.")
+        return 1
+
+    if not args.quiet:
+        output.print_banner()
+    try:
+        reports = analyze(recipes, ingredients_db, config, args.pc, workers=args.workers,
+                          worker_log_level=logging.DEBUG if args.verbose else logging.WARNING,
+                          composition_step_pct=args.composition_step, enthalpy_step_kJ_mol=args.enthalpy_step,
+                          pressure_step_fraction=args.pressure_step)
+    except (KeyError, ValueError) as e:
+        logger.error(f"Error during the sensitivity analysis: {e}")
+        return 1
+
+    if not args.quiet:
+        for report in reports:
+            output.print_sensitivity(report, QUANTITIES)
+    if args.report:
+        text = json.dumps(reports, indent=2)
+        if args.report == '-':
+            print(text)
+        else:
+            with open(args.report, 'w') as f:
+                f.write(text + '\n')
+    return 0 if all('error' not in report['base'] and not report['failed'] for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
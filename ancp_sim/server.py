@@ -0,0 +1,435 @@
+"""
+This module runs the simulator as a long-lived service with warm engines.
+
+A pool of worker processes each holds a warm ThermoEngine, so a request
+pays only for its equilibrium solves, not for interpreter start, the
+Cantera import, YAML parsing or Solution construction. Two front ends share
+one dispatcher:
+
+- HTTP (asyncio): POST /calculate with a JSON case or batch, GET /stats for
+  the throughput and latency counters, GET /health.
+- JSON-RPC 2.0 over stdin/stdout, one message per line (--stdio), for tools
+  that keep the simulator as a subprocess. Methods: 'calculate', 'stats'.
+
+A case is {"recipe": {ingredient: percent}, "chamber_pressure_bar": 70}
+(the pressure is optional); a batch is {"cases": [case, ...]}. The cases of
+a batch, and of concurrent requests, are spread over the whole pool. Each
+case is answered with the dictionary `calculate_thermo` returns.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.config import load_config
+from ancp_sim.main import add_cache_arguments, cache_from_args, warm_start_index_from_args, add_logging_arguments
+from ancp_sim.uncertainty import RunningStatistics
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.server')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_CHAMBER_PRESSURE_BAR = 70.0
+
+# Largest accepted request body, in bytes
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+LATENCY_PERCENTILES = (50.0, 95.0, 99.0)
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large'}
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def _init_worker(ingredients_db, config, cache=None, log_level=None, warm_start_index=None):
+    """Creates the warm engine held by a worker process."""
+    from ancp_sim.thermo import ThermoEngine
+    if log_level is not None:
+        output.configure_logging(level=log_level)
+    _worker['engine'] = ThermoEngine(cache=cache, warm_start_index=warm_start_index)
+    # Parse the product species files now rather than in the first request
+    _worker['engine'].product_species
+    _worker['ingredients_db'] = ingredients_db
+    _worker['config'] = config
+
+
+def _solve(case):
+    """Solves one (recipe, Pc) case. Never raises; failures are reported in the result."""
+    recipe, chamber_pressure_bar = case
+    try:
+        return _worker['engine'].calculate(recipe, _worker['ingredients_db'], _worker['config'],
+                                           chamber_pressure_bar=chamber_pressure_bar)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}", 't_flame_K': 0}
+
+
+def parse_case(case):
+    """
+    Validates one case of a request.
+
+    Args:
+        case (dict): {"recipe": {ingredient: percent}, "chamber_pressure_bar": float}.
+
+    Returns:
+        tuple: (recipe, chamber_pressure_bar).
+
+    Raises:
+        ValueError: If the case is malformed.
+    """
+    if not isinstance(case, dict) or not isinstance(case.get('recipe'), dict) or not case['recipe']:
+        raise ValueError("Each case needs a non-empty 'recipe' object of ingredient percentages.")
+    recipe = case['recipe']
+    if not all(isinstance(pct, (int, float)) and not isinstance(pct, bool) for pct in recipe.values()):
+        raise ValueError("Recipe percentages must be numbers.")
+    pc = case.get('chamber_pressure_bar', DEFAULT_CHAMBER_PRESSURE_BAR)
+    if isinstance(pc, bool) or not isinstance(pc, (int, float)) or not math.isfinite(pc) or pc <= 0:
+        raise ValueError("'chamber_pressure_bar' must be a positive number.")
+    return recipe, float(pc)
+
+
+class ServiceStatistics:
+    """Throughput and latency counters of a running service."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.cases = 0
+        self.failed = 0
+        self.cached = 0
+        self.in_flight = 0
+        self.case_latency = RunningStatistics(percentiles=LATENCY_PERCENTILES)
+        self.request_latency = RunningStatistics(percentiles=LATENCY_PERCENTILES)
+
+    def as_dict(self):
+        """
+        Returns the counters as a JSON-serializable dictionary.
+
+        Returns:
+            dict: 'uptime_s', the totals of 'requests', 'cases', 'failed' and
+                'cached' cases, the cases 'in_flight', 'throughput_cases_per_s'
+                since start, and 'case_latency_ms' / 'request_latency_ms'
+                (count, mean, std, min, max and percentiles; a case's latency
+                includes its time queued for a worker).
+        """
+        uptime = time.monotonic() - self.started
+
+        def milliseconds(statistics):
+            summary = statistics.as_dict()
+            for key in ('mean', 'std', 'min', 'max'):
+                summary[key] = summary[key] * 1e3 if math.isfinite(summary[key]) else None
+            summary['percentiles'] = {name: value * 1e3 if math.isfinite(value) else None
+                                      for name, value in summary['percentiles'].items()}
+            return summary
+
+        return {
+            'uptime_s': uptime,
+            'requests': self.requests,
+            'cases': self.cases,
+            'failed': self.failed,
+            'cached': self.cached,
+            'in_flight': self.in_flight,
+            'throughput_cases_per_s': self.cases / uptime if uptime > 0 else 0.0,
+            'case_latency_ms': milliseconds(self.case_latency),
+            'request_latency_ms': milliseconds(self.request_latency),
+        }
+
+
+class SimulationService:
+    """
+    Solves requests on a pool of warm engines; use it as a context manager.
+
+    With workers=1 the single engine runs in a background thread of this
+    process, so the event loop stays responsive.
+    """
+
+    def __init__(self, ingredients_db, config, workers=None, cache=None, warm_start_index=None,
+                 worker_log_level=logging.WARNING):
+        """
+        Args:
+            ingredients_db (dict): The ingredient database.
+            config (dict): The simulation configuration.
+            workers (int): Number of worker processes. Defaults to the CPU count.
+            cache (ResultCache): Optional result cache shared by all workers.
+            warm_start_index (WarmStartIndex): Optional warm-start index
+                shared by all workers.
+            worker_log_level (int): Logging level of the worker processes.
+        """
+        self.ingredients_db = ingredients_db
+        self.config = config
+        self.workers = workers
+        self.cache = cache
+        self.warm_start_index = warm_start_index
+        self.worker_log_level = worker_log_level
+        self.statistics = ServiceStatistics()
+        self._pool = None
+
+    def __enter__(self):
+        if self.workers == 1:
+            # Same process: keep its logging configuration
+            initargs = (self.ingredients_db, self.config, self.cache, None, self.warm_start_index)
+            self._pool = ThreadPoolExecutor(max_workers=1, initializer=_init_worker, initargs=initargs)
+        else:
+            initargs = (self.ingredients_db, self.config, self.cache, self.worker_log_level, self.warm_start_index)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=initargs)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    async def _solve(self, case):
+        """Solves one validated case on the pool and updates the counters."""
+        statistics = self.statistics
+        statistics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._pool, _solve, case)
+        finally:
+            statistics.in_flight -= 1
+        statistics.case_latency.add(time.perf_counter() - start)
+        statistics.cases += 1
+        if 'error' in results:
+            statistics.failed += 1
+        elif results.get('diagnostics', {}).get('cached'):
+            statistics.cached += 1
+        return results
+
+    async def calculate(self, params):
+        """
+        Solves a single case or a batch.
+
+        Args:
+            params (dict): A case, or {"cases": [case, ...]}; see `parse_case`.
+
+        Returns:
+            dict or list: The `calculate_thermo` results of a single case, or
+                the list of results of a batch in request order.
+
+        Raises:
+            ValueError: If the request is malformed; nothing is solved then.
+        """
+        start = time.perf_counter()
+        batch = isinstance(params, dict) and 'cases' in params
+        if batch:
+            if not isinstance(params['cases'], list):
+                raise ValueError("'cases' must be a list.")
+            cases = [parse_case(case) for case in params['cases']]
+        else:
+            cases = [parse_case(params)]
+        self.statistics.requests += 1
+        results = await asyncio.gather(*(self._solve(case) for case in cases))
+        self.statistics.request_latency.add(time.perf_counter() - start)
+        return list(results) if batch else results[0]
+
+    async def handle_jsonrpc(self, message):
+        """
+        Answers one JSON-RPC 2.0 message.
+
+        Args:
+            message (str): The request text.
+
+        Returns:
+            dict: The response, or None for a notification (no 'id').
+        """
+        try:
+            request = json.loads(message)
+        except json.JSONDecodeError as e:
+            return _jsonrpc_error(None, PARSE_ERROR, f"Parse error: {e}")
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return _jsonrpc_error(None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get('id')
+        method = request['method']
+        try:
+            if method == 'calculate':
+                result = await self.calculate(request.get('params'))
+            elif method == 'stats':
+                result = self.statistics.as_dict()
+            else:
+                return _jsonrpc_error(request_id, METHOD_NOT_FOUND, f"Unknown method '{method}'")
+        except ValueError as e:
+            return _jsonrpc_error(request_id, INVALID_PARAMS, str(e))
+        if 'id' not in request:
+            return None
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    async def handle_http(self, method, path, body):
+        """
+        Answers one HTTP request.
+
+        Args:
+            method (str): The request method.
+            path (str): The request path.
+            body (bytes): The request body.
+
+        Returns:
+            tuple: (status code, JSON-serializable response body).
+        """
+        routes = {'/calculate': 'POST', '/stats': 'GET', '/health': 'GET'}
+        path = path.split('?', 1)[0]
+        if path not in routes:
+            return 404, {'error': f"Unknown path '{path}'"}
+        if method != routes[path]:
+            return 405, {'error': f"{path} expects {routes[path]}"}
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.statistics.as_dict()
+        try:
+            return 200, await self.calculate(json.loads(body))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            return 400, {'error': f"Invalid JSON: {e}"}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+
+def _jsonrpc_error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+async def _http_connection(service, reader, writer):
+    """Serves the HTTP/1.1 requests of one connection (keep-alive unless the client closes)."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            try:
+                method, path, version = request_line.decode('latin-1').split()
+            except ValueError:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0) or 0)
+            if length > MAX_BODY_BYTES:
+                status, payload = 413, {'error': f"Request body larger than {MAX_BODY_BYTES} bytes"}
+                keep_alive = False
+            else:
+                body = await reader.readexactly(length)
+                status, payload = await service.handle_http(method, path, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            data = json.dumps(payload).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_http(service, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """
+    Serves HTTP requests until cancelled.
+
+    Args:
+        service (SimulationService): The entered service.
+        host (str): The interface to listen on.
+        port (int): The port to listen on; 0 picks a free one.
+        ready (callable): Optional callback receiving the bound (host, port).
+    """
+    server = await asyncio.start_server(lambda r, w: _http_connection(service, r, w), host, port)
+    address = server.sockets[0].getsockname()[:2]
+    logger.info(f"Serving on http://{address[0]}:{address[1]}")
+    if ready is not None:
+        ready(address)
+    async with server:
+        await server.serve_forever()
+
+
+async def serve_stdio(service, stdin=None, stdout=None):
+    """
+    Serves JSON-RPC messages, one per line, until stdin is closed.
+
+    Requests are handled concurrently; each response is written as one
+    line as soon as it is ready, so responses may arrive out of order and
+    are matched by their 'id'.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    async def respond(line):
+        response = await service.handle_jsonrpc(line)
+        if response is not None:
+            stdout.write(json.dumps(response) + '\n')
+            stdout.flush()
+
+    while True:
+        line = await loop.run_in_executor(None, stdin.readline)
+        if not line:
+            break
+        if not line.strip():
+            continue
+        task = asyncio.ensure_future(respond(line))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="ANCP-Sim: serve thermo calculations from warm engines")
+    parser.add_argument('--stdio', action='store_true',
+                        help="Serve JSON-RPC over stdin/stdout (one message per line) instead of HTTP")
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help=f"HTTP interface (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"HTTP port (default: {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    add_cache_arguments(parser)
+    add_logging_arguments(parser)
+
+    args = parser.parse_args(argv)
+    # Logging goes to stderr, so stdout stays free for JSON-RPC responses
+    output.configure_logging(args.quiet, args.verbose)
+
+    config = load_config(args.config)
+    ingredients_db = load_chemdb(*args.ingredients)
+    if not ingredients_db or config is None:
+        return 1
+
+    worker_log_level = logging.DEBUG if args.verbose else logging.WARNING
+    with SimulationService(ingredients_db, config, workers=args.workers, cache=cache_from_args(args),
+                           warm_start_index=warm_start_index_from_args(args),
+                           worker_log_level=worker_log_level) as service:
+        try:
+            if args.stdio:
+                asyncio.run(serve_stdio(service))
+            else:
+                asyncio.run(serve_http(service, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        logger.info(f"Served {service.statistics.requests} requests ({service.statistics.cases} cases).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
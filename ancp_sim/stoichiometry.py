@@ -1,6 +1,14 @@
 import re
 import json
-from .chemdb import load_ingredients
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Molar mass of oxygen used for the oxygen balance
+O_MOLAR_MASS = 15.999
+
+# Moles of oxygen needed to fully oxidise one mole of each element
+OXYGEN_DEMAND = {'C': 2, 'H': 0.5, 'Mg': 2}
 
 def parse_formula(formula):
     """
@@ -26,6 +34,12 @@ def parse_formula(formula):
 
     return stack[0]
 
+def _element_counts(ingredients_db, name):
+    """Returns an ingredient's element counts, precomputed when the database is a ChemDB."""
+    if hasattr(ingredients_db, 'element_counts'):
+        return ingredients_db.element_counts(name)
+    return parse_formula(ingredients_db[name]['formula'])
+
 def calculate_stoichiometry(recipe, ingredients_db):
     """
     Calculates the stoichiometry for a given propellant recipe.
@@ -39,7 +53,6 @@ def calculate_stoichiometry(recipe, ingredients_db):
             raise ValueError(f"Ingredient '{ingredient_name}' not found in the database.")
 
         ingredient_data = ingredients_db[ingredient_name]
-        formula = ingredient_data['formula']
         molecular_weight = ingredient_data['molecular_weight_g_mol']
         enthalpy_formation = ingredient_data['enthalpy_formation_kJ_mol']
 
@@ -49,12 +62,12 @@ def calculate_stoichiometry(recipe, ingredients_db):
         moles_ingredient = mass / molecular_weight
         total_enthalpy += moles_ingredient * enthalpy_formation
 
-        element_counts = parse_formula(formula)
+        element_counts = _element_counts(ingredients_db, ingredient_name)
         for element, count in element_counts.items():
             total_moles_elements[element] = total_moles_elements.get(element, 0) + (moles_ingredient * count)
 
     if abs(total_mass - 100.0) > 1e-6:
-        print(f"Warning: The sum of recipe percentages is {total_mass}%, not 100%.")
+        logger.warning(f"The sum of recipe percentages is {total_mass}%, not 100%.")
 
     element_moles = total_moles_elements
     o_moles = element_moles.get('O', 0)
@@ -62,10 +75,10 @@ def calculate_stoichiometry(recipe, ingredients_db):
     h_moles = element_moles.get('H', 0)
     mg_moles = element_moles.get('Mg', 0)
 
-    oxygen_needed = (2 * c_moles) + (h_moles / 2) + (2 * mg_moles)
+    oxygen_needed = (OXYGEN_DEMAND['C'] * c_moles) + (OXYGEN_DEMAND['H'] * h_moles) + (OXYGEN_DEMAND['Mg'] * mg_moles)
     oxygen_balance_moles = o_moles - oxygen_needed
 
-    oxygen_balance_grams = oxygen_balance_moles * 15.999
+    oxygen_balance_grams = oxygen_balance_moles * O_MOLAR_MASS
     oxygen_balance_percent = (oxygen_balance_grams / 100.0) * 100.0
 
     return {
@@ -73,3 +86,110 @@ def calculate_stoichiometry(recipe, ingredients_db):
         'reactant_enthalpy_kJ_100g': total_enthalpy,
         'oxygen_balance_percent': oxygen_balance_percent
     }
+
+
+class StoichiometryMatrix:
+    """
+    Vectorized stoichiometry for batches of formulations.
+
+    The ingredient x element matrix is built once from the ingredient
+    database, after which any number of candidate mixes can be evaluated
+    with a few array operations instead of one dict walk per recipe.
+    """
+
+    def __init__(self, ingredients_db, ingredient_names=None):
+        """
+        Args:
+            ingredients_db (dict): The ingredient database.
+            ingredient_names (list): The ingredients forming the columns of the
+                mass-fraction arrays. Defaults to every ingredient in the database.
+        """
+        # NumPy is only needed for batch screening, so plain stoichiometry stays light
+        import numpy as np
+
+        self.ingredients = list(ingredient_names if ingredient_names is not None else ingredients_db)
+
+        element_counts = []
+        for name in self.ingredients:
+            if name not in ingredients_db:
+                raise ValueError(f"Ingredient '{name}' not found in the database.")
+            element_counts.append(_element_counts(ingredients_db, name))
+
+        elements = []
+        for counts in element_counts:
+            elements.extend(element for element in counts if element not in elements)
+        self.elements = tuple(elements)
+
+        molecular_weights = np.array([ingredients_db[name]['molecular_weight_g_mol'] for name in self.ingredients])
+        enthalpies = np.array([ingredients_db[name]['enthalpy_formation_kJ_mol'] for name in self.ingredients])
+
+        # Moles of each element per gram of each ingredient
+        counts = np.array([[c.get(element, 0) for element in self.elements] for c in element_counts], dtype=float)
+        self.element_matrix = counts / molecular_weights[:, None]
+        # Enthalpy of formation per gram of each ingredient (kJ/g)
+        self.enthalpy_vector = enthalpies / molecular_weights
+        # Oxygen surplus per mole of each element
+        self.oxygen_vector = np.array([
+            1.0 if element == 'O' else -OXYGEN_DEMAND.get(element, 0) for element in self.elements
+        ])
+
+    def mass_fractions(self, recipes):
+        """
+        Converts recipe dictionaries (mass percentages) into a mass-fraction array.
+
+        Args:
+            recipes (list): Recipe compositions, ingredient name -> percentage.
+
+        Returns:
+            np.ndarray: An N x ingredients array of mass fractions.
+        """
+        import numpy as np
+
+        columns = {name: i for i, name in enumerate(self.ingredients)}
+        fractions = np.zeros((len(recipes), len(self.ingredients)))
+        for row, recipe in enumerate(recipes):
+            for name, percentage in recipe.items():
+                if name not in columns:
+                    raise ValueError(f"Ingredient '{name}' is not a column of this matrix.")
+                fractions[row, columns[name]] = percentage / 100.0
+        return fractions
+
+    def calculate(self, mass_fractions):
+        """
+        Calculates the stoichiometry of many formulations at once.
+
+        Args:
+            mass_fractions (array-like): An N x ingredients array of mass
+                fractions (a single row may be given as a 1-D array).
+
+        Returns:
+            dict: 'elements' (the element order), and N-length arrays
+                'elemental_moles' (N x elements, per 100 g),
+                'reactant_enthalpy_kJ_100g' and 'oxygen_balance_percent',
+                matching `calculate_stoichiometry` row by row.
+        """
+        import numpy as np
+
+        grams = np.atleast_2d(np.asarray(mass_fractions, dtype=float)) * 100.0
+        if grams.shape[1] != len(self.ingredients):
+            raise ValueError(f"Expected {len(self.ingredients)} ingredient columns, got {grams.shape[1]}.")
+
+        elemental_moles = grams @ self.element_matrix
+        oxygen_balance_grams = (elemental_moles @ self.oxygen_vector) * O_MOLAR_MASS
+
+        return {
+            'elements': self.elements,
+            'elemental_moles': elemental_moles,
+            'reactant_enthalpy_kJ_100g': grams @ self.enthalpy_vector,
+            'oxygen_balance_percent': (oxygen_balance_grams / 100.0) * 100.0
+        }
+
+
+def calculate_stoichiometry_batch(mass_fractions, ingredients_db, ingredient_names=None):
+    """
+    Calculates the stoichiometry for a batch of formulations.
+
+    Convenience wrapper that builds a `StoichiometryMatrix`; keep the matrix
+    around instead when screening repeatedly against the same ingredients.
+    """
+    return StoichiometryMatrix(ingredients_db, ingredient_names).calculate(mass_fractions)
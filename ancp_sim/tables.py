@@ -0,0 +1,294 @@
+"""
+This module precomputes thermochemistry lookup tables and interpolates them.
+
+A table holds T_flame, M, gamma, C* and Isp over a rectilinear grid of
+chamber pressure and one or two composition axes. Each composition axis
+varies the percentage of one ingredient, with the other ingredients of the
+base recipe scaled proportionally so the total stays at 100%. Tables are
+written as one .npy array per quantity plus a meta.json, and are loaded
+memory-mapped so queries only touch the pages they need.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.config import load_config
+from ancp_sim.main import parse_pressure_sweep, add_logging_arguments, load_recipe
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.tables')
+
+TABLE_FORMAT_VERSION = 2
+
+# Result keys stored in a table
+QUANTITIES = (
+    't_flame_K',
+    'gamma',
+    'product_molecular_weight_g_mol',
+    'c_star_m_s',
+    'isp_vacuum_sec_ideal',
+    'isp_vacuum_sec_delivered',
+)
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def axis_recipe(base_recipe, axis_values):
+    """
+    Builds the recipe at one point of the composition axes.
+
+    Args:
+        base_recipe (dict): Ingredient names mapped to mass percentages.
+        axis_values (dict): Percentages imposed on the axis ingredients.
+
+    Returns:
+        dict: The recipe, with the non-axis ingredients scaled to fill 100%.
+    """
+    others = {name: pct for name, pct in base_recipe.items() if name not in axis_values}
+    remaining = 100.0 - sum(axis_values.values())
+    if remaining < 0:
+        raise ValueError(f"Axis percentages {axis_values} exceed 100%.")
+    total_others = sum(others.values())
+    if total_others <= 0:
+        raise ValueError("The base recipe needs at least one ingredient outside the composition axes.")
+    recipe = {name: pct * remaining / total_others for name, pct in others.items()}
+    recipe.update(axis_values)
+    return recipe
+
+
+def _init_worker(ingredients_db, config):
+    """Creates the warm engine held by a worker process."""
+    from ancp_sim.thermo import ThermoEngine
+    _worker['engine'] = ThermoEngine()
+    _worker['ingredients_db'] = ingredients_db
+    _worker['config'] = config
+
+
+def _fill_column(job):
+    """Solves one composition over all pressures as a warm-started sweep."""
+    index, recipe, pressures = job
+    column = np.full((len(QUANTITIES), len(pressures)), np.nan)
+    rows = _worker['engine'].sweep(recipe, _worker['ingredients_db'], _worker['config'], pressures)
+    for j, row in enumerate(rows):
+        if 'error' not in row:
+            column[:, j] = [row[quantity] for quantity in QUANTITIES]
+    return index, column
+
+
+def generate_table(path, base_recipe, ingredients_db, config, pressures_bar, composition_axes, workers=None):
+    """
+    Fills a lookup table and writes it to a directory.
+
+    Every composition is solved as a warm-started pressure sweep, and the
+    compositions are spread over a process pool. Failed points are stored
+    as NaN, so queries touching them return NaN.
+
+    Args:
+        path (str): Output directory (created if needed).
+        base_recipe (dict): Ingredient names mapped to mass percentages.
+        ingredients_db (dict): The ingredient database.
+        config (dict): The simulation configuration.
+        pressures_bar (list): Chamber pressure grid in bar, ascending.
+        composition_axes (list): One or two (ingredient name, percentages)
+            pairs, each with an ascending list of percentages.
+        workers (int): Number of worker processes. Defaults to the CPU count;
+            1 fills the table in the current process.
+
+    Returns:
+        ThermoTable: The freshly written table, memory-mapped.
+    """
+    if not 1 <= len(composition_axes) <= 2:
+        raise ValueError("A table needs one or two composition axes.")
+    pressures = [float(p) for p in pressures_bar]
+    axes = [(name, [float(v) for v in values]) for name, values in composition_axes]
+    for name, values in [('pressure', pressures)] + axes:
+        if len(values) < 2 or np.any(np.diff(values) <= 0):
+            raise ValueError(f"The '{name}' axis needs at least two strictly ascending values.")
+
+    shape = tuple(len(values) for _, values in axes)
+    jobs = []
+    for index in np.ndindex(*shape):
+        axis_values = {name: values[i] for (name, values), i in zip(axes, index)}
+        jobs.append((index, axis_recipe(base_recipe, axis_values), pressures))
+
+    data = np.full((len(QUANTITIES), len(pressures)) + shape, np.nan)
+    if workers == 1:
+        _init_worker(ingredients_db, config)
+        results = map(_fill_column, jobs)
+        for index, column in results:
+            data[(slice(None), slice(None)) + index] = column
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(ingredients_db, config)) as pool:
+            for index, column in pool.map(_fill_column, jobs):
+                data[(slice(None), slice(None)) + index] = column
+
+    os.makedirs(path, exist_ok=True)
+    for k, quantity in enumerate(QUANTITIES):
+        np.save(os.path.join(path, f'{quantity}.npy'), data[k])
+    meta = {
+        'version': TABLE_FORMAT_VERSION,
+        'base_recipe': base_recipe,
+        'axes': [{'name': 'chamber_pressure_bar', 'values': pressures}] +
+                [{'name': name, 'values': values} for name, values in axes],
+        'quantities': list(QUANTITIES),
+        'failed_points': int(np.isnan(data[0]).sum()),
+    }
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return ThermoTable.load(path)
+
+
+class ThermoTable:
+    """
+    A memory-mapped lookup table with vectorized multilinear interpolation.
+
+    The pressure axis is interpolated linearly in log(p), the composition
+    axes linearly in percent.
+    """
+
+    def __init__(self, meta, arrays):
+        """
+        Args:
+            meta (dict): The table metadata (axes, quantities, base recipe).
+            arrays (dict): Quantity name -> array shaped like the grid.
+        """
+        self.meta = meta
+        self.axis_names = tuple(axis['name'] for axis in meta['axes'])
+        self.axes = tuple(np.asarray(axis['values'], dtype=float) for axis in meta['axes'])
+        # Interpolation coordinates: log(p) for pressure, percent otherwise
+        self._grid = (np.log(self.axes[0]),) + self.axes[1:]
+        self.arrays = arrays
+
+    @classmethod
+    def load(cls, path):
+        """Loads a table written by `generate_table`, memory-mapping the arrays."""
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != TABLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported table version {meta.get('version')} in {path}.")
+        arrays = {
+            quantity: np.load(os.path.join(path, f'{quantity}.npy'), mmap_mode='r')
+            for quantity in meta['quantities']
+        }
+        return cls(meta, arrays)
+
+    @property
+    def quantities(self):
+        return tuple(self.arrays)
+
+    def _coordinates(self, pressure_bar, composition):
+        if len(composition) != len(self.axes) - 1:
+            raise ValueError(f"Expected {len(self.axes) - 1} composition value(s) for axes {self.axis_names[1:]}.")
+        points = np.broadcast_arrays(np.asarray(pressure_bar, dtype=float),
+                                     *(np.asarray(value, dtype=float) for value in composition))
+        return (np.log(points[0]),) + tuple(points[1:])
+
+    def out_of_range(self, pressure_bar, *composition):
+        """Returns a boolean array marking query points outside the tabulated range."""
+        coordinates = self._coordinates(pressure_bar, composition)
+        outside = np.zeros(coordinates[0].shape, dtype=bool)
+        for x, grid in zip(coordinates, self._grid):
+            # Small tolerance so the grid end points themselves count as inside
+            tolerance = 1e-12 * max(abs(grid[0]), abs(grid[-1]), 1.0)
+            outside |= (x < grid[0] - tolerance) | (x > grid[-1] + tolerance) | np.isnan(x)
+        return outside
+
+    def interpolate(self, quantity, pressure_bar, *composition, bounds='raise'):
+        """
+        Interpolates a quantity at arrays of query points.
+
+        Args:
+            quantity (str): One of `quantities`, e.g. 'c_star_m_s'.
+            pressure_bar (array-like): Chamber pressures in bar.
+            *composition (array-like): Percentages along each composition axis.
+                All inputs are broadcast against each other.
+            bounds (str): What to do with points outside the table: 'raise'
+                a ValueError, return 'nan' for them, or 'clip' to the edge.
+
+        Returns:
+            np.ndarray: The interpolated values, shaped like the broadcast inputs.
+        """
+        if bounds not in ('raise', 'nan', 'clip'):
+            raise ValueError(f"Unknown bounds mode '{bounds}', expected 'raise', 'nan' or 'clip'.")
+        if quantity not in self.arrays:
+            raise ValueError(f"Unknown quantity '{quantity}', expected one of {self.quantities}.")
+
+        coordinates = self._coordinates(pressure_bar, composition)
+        outside = None
+        if bounds != 'clip':
+            outside = self.out_of_range(pressure_bar, *composition)
+            if bounds == 'raise' and outside.any():
+                raise ValueError(f"{int(outside.sum())} query point(s) outside the tabulated range "
+                                 f"of {self.axis_names}.")
+
+        indices, weights = [], []
+        for x, grid in zip(coordinates, self._grid):
+            x = np.clip(x, grid[0], grid[-1])
+            i = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+            indices.append(i)
+            weights.append((x - grid[i]) / (grid[i + 1] - grid[i]))
+
+        data = self.arrays[quantity]
+        result = np.zeros(coordinates[0].shape)
+        for corner in np.ndindex(*(2,) * len(indices)):
+            weight = np.ones(coordinates[0].shape)
+            for w, c in zip(weights, corner):
+                weight = weight * (w if c else 1.0 - w)
+            result += weight * data[tuple(i + c for i, c in zip(indices, corner))]
+
+        if outside is not None and outside.any():
+            result = np.where(outside, np.nan, result)
+        return result
+
+
+def parse_composition_axis(spec):
+    """Parses a 'Ingredient Name=start:stop:step' composition axis (percent, stop inclusive)."""
+    name, sep, values = spec.rpartition('=')
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"Invalid axis '{spec}', expected 'Ingredient Name=start:stop:step'")
+    return name, parse_pressure_sweep(values)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="ANCP-Sim: generate a thermochemistry lookup table")
+    parser.add_argument('recipe_file', type=str, help="Base propellant recipe file")
+    parser.add_argument('output', type=str, help="Output directory of the table")
+    parser.add_argument('--pc', type=parse_pressure_sweep, required=True, metavar='START:STOP:STEP',
+                        help="Chamber pressure grid in bar (stop inclusive), e.g. 20:200:10")
+    parser.add_argument('--axis', type=parse_composition_axis, action='append', required=True,
+                        metavar='NAME=START:STOP:STEP',
+                        help="Composition axis in percent, e.g. 'Magnesium=0:20:1' (give once or twice)")
+    parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    add_logging_arguments(parser)
+
+    args = parser.parse_args(argv)
+    output.configure_logging(args.quiet, args.verbose)
+
+    config = load_config(args.config)
+    ingredients_db = load_chemdb(*args.ingredients)
+    recipe_data = load_recipe(args.recipe_file)
+    if not ingredients_db or config is None or recipe_data is None:
+        return 1
+    base_recipe = recipe_data.get('composition', {})
+
+    table = generate_table(args.output, base_recipe, ingredients_db, config, args.pc, args.axis,
+                           workers=args.workers)
+    points = int(np.prod([len(axis) for axis in table.axes]))
+    logger.info(f"Wrote {points} points ({table.meta['failed_points']} failed) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
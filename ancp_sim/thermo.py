@@ -1,216 +1,1011 @@
 import cantera as ct
 import numpy as np
+import hashlib
+import logging
 import math
-from .stoichiometry import parse_formula
+import os
+from .cache import hash_ingredients_db, result_key
+from .instrumentation import SolveTrace
+from .performance import ChamberState, performance
+from .stoichiometry import _element_counts, calculate_stoichiometry
 
-def calculate_thermo(recipe, ingredients_db, config, chamber_pressure_bar=70):
+logger = logging.getLogger(__name__)
+
+# Initial temperature guess used before the adiabatic (HP) solve
+T_GUESS = 2200  # Good guess for AN propellants
+
+# Condensed species are only used as products if their thermo data covers this
+# representative chamber temperature. Phases fitted elsewhere (ices, low-temperature
+# solids, high-temperature melts such as MgO(L)) would be extrapolated far outside
+# their range and destabilise the solve.
+CONDENSED_REFERENCE_T = 2000.0
+
+# Nominal density of the condensed phases in the multiphase model. Cantera's
+# fixed-stoichiometry phases need a molar volume; at chamber pressures its
+# P*V term is negligible next to RT, so one value serves every species.
+CONDENSED_DENSITY_KG_M3 = 3000.0
+
+G0 = 9.80665
+SEA_LEVEL_PRESSURE_BAR = 1.01325
+
+# Relative tolerance on pressure for the area-ratio search. The mass flux is flat
+# around the throat, so locating it to THROAT_RTOL is ample for the flux itself.
+NOZZLE_RTOL = 1e-6
+THROAT_RTOL = 1e-4
+
+
+def _recipe_elements(recipe, ingredients_db):
+    """Returns the set of elements in the ingredients a recipe actually uses."""
+    elements = set()
+    for name, pct in recipe.items():
+        if pct > 0:
+            elements.update(element for element, count in _element_counts(ingredients_db, name).items() if count)
+    return frozenset(elements)
+
+
+class ThermoEngine:
     """
-    Calculates thermodynamic properties using single-phase approach.
-    Simpler and more reliable than Mixture class for this application.
+    Stateful thermodynamics engine.
+
+    Product species are loaded from the NASA databases once, and a Cantera
+    Solution of the product species is cached for each set of elements.
+    Between calls only the thermodynamic state is updated, so evaluating
+    many formulations avoids re-parsing the YAML files and rebuilding the
+    phase every time. The reactants enter the equilibrium only through
+    their element abundances and enthalpy of formation.
     """
-    try:
-        print("\n=== Thermodynamic Calculation ===")
-        
-        # 1. Create all species in a single phase
-        print("Setting up species...")
-        
-        # Create reactant species
-        reactant_species = []
-        for name, data in ingredients_db.items():
-            if recipe.get(name, 0) > 0:
-                composition_dict = parse_formula(data['formula'])
-                h0_j_kmol = data['enthalpy_formation_kJ_mol'] * 1_000_000
-                
-                # Use NASA7 format with proper coefficients
-                # a1=cp/R, a5=h/RT, a6=s/R at 298K
-                h_reduced = h0_j_kmol / 8314.46  # Divide by R
-                
-                reactant_species.append(ct.Species.from_dict({
-                    'name': name.replace(" ", "_"), 
-                    'composition': composition_dict,
-                    'thermo': {
-                        'model': 'NASA7',
-                        'temperature-ranges': [200.0, 1000.0, 6000.0],
-                        'data': [
-                            # Low temp: [a1, a2, a3, a4, a5, a6, a7]
-                            [5.0, 0.0, 0.0, 0.0, 0.0, h_reduced, 0.0],
-                            # High temp
-                            [5.0, 0.0, 0.0, 0.0, 0.0, h_reduced, 0.0]
-                        ]
-                    }
-                }))
-        
-        print(f"  Created {len(reactant_species)} reactant species")
-        
-        # 2. Load product species
-        print("Loading product databases...")
-        gas_species = ct.Species.list_from_file('nasa_gas.yaml')
-        
-        # Load condensed species (only relevant ones)
-        condensed_species = []
+
+    def __init__(self, gas_file='nasa_gas.yaml', condensed_file='nasa_condensed.yaml',
+                 condensed_species=None, cache=None, warm_start_index=None, multiphase=False):
+        """
+        Args:
+            gas_file (str): Cantera YAML file with the gas-phase product species.
+            condensed_file (str): Cantera YAML file with the condensed species.
+            condensed_species (tuple): Optional whitelist of condensed species
+                names for the multiphase model. By default every condensed
+                species passing the element filter is a candidate.
+            cache (ResultCache): Optional persistent result cache; cache hits
+                skip the equilibrium solve entirely.
+            warm_start_index (WarmStartIndex): Optional persistent index of
+                converged states. Solves without an explicit warm start begin
+                from the nearest stored state, and every converged state is
+                added to it.
+            multiphase (bool): Solve the chamber equilibrium with the
+                condensed products as separate pure phases next to a
+                product-only gas phase (see `equilibrate_multiphase`).
+                The default single-phase model equilibrates the gaseous
+                products only. The warm-start index and warm starts are not used
+                in this mode, and `nozzle` is not available.
+        """
+        self.gas_file = gas_file
+        self.condensed_file = condensed_file
+        self.condensed_species = tuple(condensed_species) if condensed_species is not None else None
+        self.cache = cache
+        self.warm_start_index = warm_start_index
+        self.multiphase = multiphase
+        self._product_species = None
+        # frozenset of elements -> (gas, condensed) filtered product species
+        self._species_by_elements = {}
+        self._species_hash = None
+        # frozenset of elements -> product Solution
+        self._solutions = {}
+        # id(Solution) -> elements x species atom-count matrix
+        self._element_matrices = {}
+        # frozenset of elements -> ct.Mixture of the product phases
+        self._mixtures = {}
+
+    @property
+    def product_species(self):
+        """The (gas, condensed) product species lists, loaded on first use."""
+        if self._product_species is None:
+            logger.debug("Loading product databases...")
+            gas_species = ct.Species.list_from_file(self.gas_file)
+
+            condensed_species = []
+            try:
+                condensed_species = ct.Species.list_from_file(self.condensed_file)
+            except Exception as e:
+                logger.warning(f"Could not load condensed species: {e}")
+
+            self._product_species = (gas_species, condensed_species)
+        return self._product_species
+
+    def _species_for(self, elements):
+        """
+        Returns the (gas, condensed) product species that can form from a set of elements.
+
+        Only species whose elements are a subset of the recipe's elements are
+        kept; the others can never appear but would still be carried by the
+        solver. Condensed species go through the same filter, restricted to
+        those whose thermo data covers chamber temperatures (and to the
+        explicit `condensed_species` whitelist, if one was given). The result
+        is cached per element set.
+        """
+        key = frozenset(elements)
+        species = self._species_by_elements.get(key)
+        if species is None:
+            gas_species, condensed_species = self.product_species
+            gas = [sp for sp in gas_species if key.issuperset(sp.composition)]
+            condensed = [
+                sp for sp in condensed_species
+                if key.issuperset(sp.composition)
+                and sp.thermo.min_temp <= CONDENSED_REFERENCE_T <= sp.thermo.max_temp
+                and (self.condensed_species is None or sp.name in self.condensed_species)
+            ]
+            logger.debug(f"  Selected {len(gas)} gas and {len(condensed)} condensed species for {{{', '.join(sorted(key))}}}")
+            species = (gas, condensed)
+            self._species_by_elements[key] = species
+        return species
+
+    def product_species_for(self, elements):
+        """
+        Returns the gaseous product species that can form from a set of elements.
+
+        These make up the single-phase Solution. Condensed species are left
+        out: as members of an ideal-gas mixture each of their moles would
+        count as gas, which lowers the flame temperature as the pressure
+        rises. They only enter the multiphase model (see
+        `condensed_species_for`).
+
+        Args:
+            elements (iterable): The element symbols present in the reactants.
+
+        Returns:
+            list: The gas species.
+        """
+        return self._species_for(elements)[0]
+
+    def condensed_species_for(self, elements):
+        """
+        Returns the condensed product species that can form from a set of elements.
+
+        Args:
+            elements (iterable): The element symbols present in the reactants.
+
+        Returns:
+            list: The condensed species, each to become a pure phase of the
+                multiphase Mixture.
+        """
+        return self._species_for(elements)[1]
+
+    def get_mixture(self, elements, trace=None):
+        """
+        Returns the cached multiphase product Mixture for a set of elements.
+
+        The Mixture holds one ideal-gas phase with the gaseous product species
+        and one fixed-stoichiometry phase per condensed product species,
+        selected by `product_species_for` and `condensed_species_for`. It is
+        built the first time an element set is seen and reused afterwards.
+
+        Args:
+            elements (iterable): The element symbols present in the reactants.
+            trace (SolveTrace): Optional trace receiving the stage timings.
+
+        Returns:
+            ct.Mixture: The gas phase first, then the condensed phases.
+        """
+        trace = trace if trace is not None else SolveTrace()
+        key = frozenset(elements)
+        mixture = self._mixtures.get(key)
+        if mixture is None:
+            if self._product_species is None:
+                with trace.span('product_species_load'):
+                    self.product_species
+            with trace.span('solution_setup'):
+                gas = ct.Solution(thermo='ideal-gas', species=self.product_species_for(key))
+                condensed = [_condensed_phase(sp) for sp in self.condensed_species_for(key)]
+                mixture = ct.Mixture([(gas, 1.0)] + [(phase, 0.0) for phase in condensed])
+            self._mixtures[key] = mixture
+        return mixture
+
+    def equilibrate_multiphase(self, recipe, ingredients_db, chamber_pressure_bar=70, trace=None):
+        """
+        Solves the adiabatic (HP) chamber equilibrium with separate condensed phases.
+
+        The element abundances and reactant enthalpy come from
+        `calculate_stoichiometry`. The gas phase is first equilibrated on
+        its own at T_GUESS and brought to the reactant enthalpy, then the
+        whole Mixture is equilibrated at constant enthalpy and pressure, so
+        each condensed species appears as a pure phase only if that lowers
+        the Gibbs energy.
+
+        Args:
+            recipe (dict): Ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            chamber_pressure_bar (float): Chamber pressure in bar.
+            trace (SolveTrace): Optional trace receiving the stage timings and
+                solver attempts.
+
+        Returns:
+            ct.Mixture: The cached Mixture, left at the equilibrium state,
+                holding the products of 100 g of propellant.
+        """
+        trace = trace if trace is not None else SolveTrace()
+        mixture = self.get_mixture(_recipe_elements(recipe, ingredients_db), trace)
+        gas = mixture.phase(0)
+        pressure_pa = chamber_pressure_bar * 1e5
+
+        A = self._element_matrix(gas)
+        b, mass_kg, h_reactants = self._reactants(recipe, ingredients_db, gas)
+
+        logger.debug("Step 1: Initial gas-phase equilibration at fixed T...")
+        X_guess = _project_to_elements(A, np.ones(gas.n_species), b)
+        if X_guess is None:
+            raise ValueError("The product species cannot hold the recipe's elements.")
+        gas.TPX = T_GUESS, pressure_pa, X_guess
         try:
-            all_condensed = ct.Species.list_from_file('nasa_condensed.yaml')
-            relevant = ['MgO(s)', 'MgO(l)']  # Start with just MgO
-            for species in all_condensed:
-                if species.name in relevant:
-                    condensed_species.append(species)
-            print(f"  Loaded {len(condensed_species)} condensed species")
-        except Exception as e:
-            print(f"  Warning: {e}")
-        
-        # 3. Create single Solution with all species
-        all_species = reactant_species + gas_species + condensed_species
-        gas = ct.Solution(thermo='ideal-gas', species=all_species)
-        
-        # 4. Set initial state
-        reactant_mass_fractions = {
-            name.replace(" ", "_"): pct/100.0 
-            for name, pct in recipe.items()
-        }
-        
+            with trace.span('tp_pre_equilibrate'), trace.attempt('tp_pre_equilibrate', 'vcs'):
+                gas.equilibrate('TP', solver='vcs', max_steps=500, max_iter=200)
+        except ct.CanteraError as e:
+            logger.warning(f"Initial TP equilibration had issues: {e}")
+            gas.TPX = T_GUESS, pressure_pa, X_guess
+        gas.HP = h_reactants, pressure_pa
+
+        # Setting the Mixture state pushes its stored composition into the
+        # phases, so the gas state is copied out first
+        T, moles = gas.T, gas.X * mass_kg / gas.mean_molecular_weight
+        mixture.species_moles = np.concatenate([moles, np.zeros(mixture.n_species - gas.n_species)])
+        mixture.T = T
+        mixture.P = pressure_pa
+
+        logger.debug("Step 2: Multiphase adiabatic equilibration (HP)...")
+        with trace.span('hp_equilibrate'):
+            _equilibrate_multiphase_hp(mixture, trace)
+        return mixture
+
+    @property
+    def species_hash(self):
+        """
+        Hash of the product species files, condensed-species selection and model.
+
+        Computed from the file contents without loading the species, so a
+        cache lookup does not need to touch Cantera's YAML parser.
+        """
+        if self._species_hash is None:
+            digest = hashlib.sha256()
+            for filename in (self.gas_file, self.condensed_file):
+                path = _find_data_file(filename)
+                digest.update(filename.encode('utf-8'))
+                if path is not None:
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+            digest.update(repr(self.condensed_species).encode('utf-8'))
+            if self.multiphase:
+                digest.update(b'multiphase')
+            self._species_hash = digest.hexdigest()
+        return self._species_hash
+
+    def get_solution(self, recipe, ingredients_db, trace=None):
+        """
+        Returns the cached product Solution for the elements of a recipe.
+
+        The Solution holds the product species that can form from the
+        recipe's elements (see `product_species_for`) and nothing else: the
+        reactants only enter through their element abundances and enthalpy.
+        It is built the first time an element set is seen and shared by every
+        recipe with the same elements. The elements are taken from the
+        current ingredient formulas on every call, so a database or overlay
+        that changes a formula gets the Solution of its own elements.
+
+        Args:
+            recipe (dict): Ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            trace (SolveTrace): Optional trace receiving the stage timings.
+
+        Returns:
+            ct.Solution: The ideal-gas phase holding the product species.
+        """
+        trace = trace if trace is not None else SolveTrace()
+        key = _recipe_elements(recipe, ingredients_db)
+        gas = self._solutions.get(key)
+
+        if gas is None:
+            if self._product_species is None:
+                with trace.span('product_species_load'):
+                    self.product_species
+
+            logger.debug("Setting up species...")
+            with trace.span('solution_setup'):
+                gas = ct.Solution(thermo='ideal-gas', species=self.product_species_for(key))
+            self._solutions[key] = gas
+        return gas
+
+    def _reactants(self, recipe, ingredients_db, phase):
+        """
+        Returns the element abundances and enthalpy of a recipe for a product phase.
+
+        Returns:
+            tuple: (element moles per 100 g ordered like the phase's elements,
+                mass of those elements in kg, reactant enthalpy in J/kg).
+        """
+        stoichiometry = calculate_stoichiometry(recipe, ingredients_db)
+        element_moles = stoichiometry['elemental_moles']
+        b = np.array([element_moles.get(element, 0.0) for element in phase.element_names])
+        mass_kg = b @ phase.atomic_weights / 1000
+        if mass_kg <= 0:
+            raise ValueError("The recipe is empty.")
+        return b, mass_kg, stoichiometry['reactant_enthalpy_kJ_100g'] * 1000 / mass_kg
+
+    def equilibrate(self, recipe, ingredients_db, chamber_pressure_bar=70, warm_start=None, trace=None):
+        """
+        Solves the adiabatic (HP) chamber equilibrium for a recipe.
+
+        The element abundances and reactant enthalpy come from
+        `calculate_stoichiometry`; only product species take part in the
+        equilibrium.
+
+        Args:
+            recipe (dict): Ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            chamber_pressure_bar (float): Chamber pressure in bar.
+            warm_start (tuple): Optional (T, X) of a converged product state,
+                X being a mole-fraction array over the Solution's species or a
+                {species name: mole fraction} dict. It may come from a nearby
+                recipe with the same elements: X is first rescaled to this
+                recipe's element abundances (see `_project_to_elements`). The
+                HP solve then starts from that state instead of the cold TP
+                pre-equilibration at 2200 K, and falls back to the cold path
+                if the warm solve fails. Without one, the engine's
+                warm-start index is asked for the nearest converged state.
+            trace (SolveTrace): Optional trace receiving the stage timings and
+                solver attempts.
+
+        Returns:
+            ct.Solution: The cached Solution, left at the equilibrium state.
+        """
+        trace = trace if trace is not None else SolveTrace()
+        gas = self.get_solution(recipe, ingredients_db, trace)
         pressure_pa = chamber_pressure_bar * 1e5
-        T_initial = 298.15
-        
-        gas.TPY = T_initial, pressure_pa, reactant_mass_fractions
-        
-        print(f"  Initial T: {T_initial:.1f} K")
-        print(f"  Pressure: {chamber_pressure_bar:.1f} bar")
-        print(f"  Initial H: {gas.enthalpy_mass/1e6:.2f} MJ/kg")
-        
-        # 5. CRITICAL FIX: Use gibbs minimization, not HP directly
+        element_moles, _, h_reactants = self._reactants(recipe, ingredients_db, gas)
+
+        logger.debug(f"  Pressure: {chamber_pressure_bar:.1f} bar")
+        logger.debug(f"  Reactant H: {h_reactants/1e6:.2f} MJ/kg")
+
+        A = self._element_matrix(gas)
+        if warm_start is not None:
+            trace.warm_start = 'given'
+        elif self.warm_start_index is not None:
+            with trace.span('warm_start_lookup'):
+                warm_start = self.warm_start_index.nearest(gas.element_names, element_moles, pressure_pa)
+            trace.warm_start = 'index' if warm_start is not None else None
+
+        if warm_start is not None:
+            # Continue from the neighbouring converged state, rescaled to the
+            # element abundances of this recipe
+            logger.debug("Adiabatic equilibration (HP) from previous state...")
+            T_previous, X_previous = warm_start
+            if isinstance(X_previous, dict):
+                X_previous = np.array([X_previous.get(name, 0.0) for name in gas.species_names])
+            X_guess = _project_to_elements(A, np.asarray(X_previous, dtype=float), element_moles)
+            if X_guess is not None:
+                try:
+                    gas.TPX = T_previous, pressure_pa, X_guess
+                    gas.HP = h_reactants, pressure_pa
+                    with trace.span('hp_equilibrate'):
+                        _equilibrate_hp(gas, trace)
+                    self._remember(gas, element_moles, pressure_pa, trace)
+                    return gas
+                except ct.CanteraError as e:
+                    logger.info(f"  Warm start failed ({str(e)[:100]}), starting cold...")
+            trace.warm_start = None
+
+        # CRITICAL FIX: Use gibbs minimization, not HP directly
         # First equilibrate at high T to get good initial guess
-        print("\nStep 1: Initial equilibration at fixed T...")
-        gas.TP = 2200, pressure_pa  # Good guess for AN propellants
-        
+        logger.debug("Step 1: Initial equilibration at fixed T...")
+        X_guess = _project_to_elements(A, np.ones(gas.n_species), element_moles)
+        if X_guess is None:
+            raise ValueError("The product species cannot hold the recipe's elements.")
+        gas.TPX = T_GUESS, pressure_pa, X_guess
+
+        try:
+            with trace.span('tp_pre_equilibrate'), trace.attempt('tp_pre_equilibrate', 'vcs'):
+                gas.equilibrate('TP', solver='vcs', max_steps=500, max_iter=200)
+            logger.debug(f"  ✓ Initial state: T={gas.T:.0f}K")
+        except Exception as e:
+            logger.warning(f"Initial TP equilibration had issues: {e}")
+            # Start the HP solve from the element-balanced guess instead
+            gas.TPX = T_GUESS, pressure_pa, X_guess
+
+        # Now do HP equilibration from this better starting point: the TP
+        # products (which conserve the reactant elements) at the reactant enthalpy
+        logger.debug("Step 2: Adiabatic equilibration (HP)...")
+        gas.HP = h_reactants, pressure_pa
+
+        with trace.span('hp_equilibrate'):
+            _equilibrate_hp(gas, trace)
+        self._remember(gas, element_moles, pressure_pa, trace)
+        return gas
+
+    def _remember(self, gas, element_moles, pressure_pa, trace):
+        """Adds a converged chamber state to the warm-start index, if the engine has one."""
+        if self.warm_start_index is None:
+            return
+        with trace.span('warm_start_store'):
+            X = {name: float(x) for name, x in zip(gas.species_names, gas.X) if x > 0}
+            self.warm_start_index.add(gas.element_names, element_moles, pressure_pa, gas.T, X)
+
+    def _element_matrix(self, gas):
+        """Returns the elements x species atom-count matrix of a Solution, built once per Solution."""
+        A = self._element_matrices.get(id(gas))
+        if A is None:
+            A = np.array([[gas.n_atoms(k, m) for k in range(gas.n_species)] for m in range(gas.n_elements)])
+            self._element_matrices[id(gas)] = A
+        return A
+
+    def chamber_state(self, recipe, ingredients_db, chamber_pressure_bar=70, warm_start=None, trace=None):
+        """
+        Solves the chamber equilibrium of a recipe, or looks it up in the cache.
+
+        This is the only stage of a calculation that needs Cantera. The
+        performance under any configuration follows from the returned state
+        with `performance.performance` or `performance.config_sweep`, so the
+        cache stores chamber states and is independent of the configuration.
+
+        Args:
+            recipe (dict): Ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            chamber_pressure_bar (float): Chamber pressure in bar.
+            warm_start (tuple): Passed on to `equilibrate`; the (t_flame_K,
+                product_mole_fractions) of a nearby solved recipe makes a
+                good one. Ignored by a multiphase engine.
+            trace (SolveTrace): Optional trace receiving the stage timings,
+                solver attempts and whether the cache was hit.
+
+        Returns:
+            ChamberState: The equilibrium chamber conditions.
+
+        Raises:
+            ct.CanteraError: If the equilibrium solve fails.
+            ValueError: If the equilibrium state is unphysical.
+        """
+        trace = trace if trace is not None else SolveTrace()
+        key = None
+        if self.cache is not None:
+            with trace.span('cache_lookup'):
+                key = result_key(recipe, chamber_pressure_bar, hash_ingredients_db(ingredients_db), self.species_hash)
+                cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                logger.debug("  Chamber state from cache")
+                trace.cached = True
+                return ChamberState.from_dict(cached)
+
+        if self.multiphase:
+            mixture = self.equilibrate_multiphase(recipe, ingredients_db, chamber_pressure_bar, trace=trace)
+            state = _mixture_state(mixture, chamber_pressure_bar)
+        else:
+            gas = self.equilibrate(recipe, ingredients_db, chamber_pressure_bar, warm_start=warm_start, trace=trace)
+            state = _chamber_state(gas, chamber_pressure_bar)
+        if key is not None:
+            self.cache.put(key, state.as_dict())
+        return state
+
+    def calculate(self, recipe, ingredients_db, config, chamber_pressure_bar=70, warm_start=None):
+        """
+        Calculates thermodynamic properties and rocket performance for a recipe.
+
+        See `calculate_thermo` for the arguments and the returned dictionary.
+        The chamber state comes from `chamber_state` (so from the cache when
+        the engine has one) and the performance is evaluated for `config`.
+        Errors are reported in the result instead of raised. The
+        'diagnostics' entry always describes the current call, never the
+        cached solve.
+
+        `warm_start` is passed on to `equilibrate`; the (t_flame_K,
+        product_mole_fractions) of an earlier result of a nearby recipe
+        with the same ingredients makes a good one.
+        """
+        trace = SolveTrace()
         try:
-            gas.equilibrate('TP', solver='vcs', max_steps=500, max_iter=200)
-            print(f"  ✓ Initial state: T={gas.T:.0f}K")
+            logger.debug("=== Thermodynamic Calculation ===")
+            state = self.chamber_state(recipe, ingredients_db, chamber_pressure_bar, warm_start=warm_start, trace=trace)
+            with trace.span('performance'):
+                results = performance(state, config, recipe)
+
+        except ct.CanteraError as e:
+            error_msg = str(e)
+            logger.error(f"✗ Cantera Error:\n  {error_msg[:400]}")
+            logger.info("Troubleshooting:\n"
+                        "  - Try different pressure: --pc 50 or --pc 100\n"
+                        "  - Check recipe sums to 100%\n"
+                        "  - Verify ingredients.json has valid data")
+            results = {'error': 'Equilibration failed', 't_flame_K': 0}
+
         except Exception as e:
-            print(f"  Warning: Initial TP equilibration had issues: {e}")
-        
-        # Now do HP equilibration from this better starting point
-        print("Step 2: Adiabatic equilibration (HP)...")
-        
-        # Reset to initial enthalpy
-        gas.TPY = T_initial, pressure_pa, reactant_mass_fractions
-        h_reactants = gas.enthalpy_mass
-        p_chamber = pressure_pa
-        
-        # Set to high temp state then impose HP constraint
-        gas.TP = 2200, p_chamber
-        gas.HP = h_reactants, p_chamber
-        
+            logger.error(f"✗ Error: {str(e)}", exc_info=True)
+            results = {'error': str(e), 't_flame_K': 0}
+
+        results['diagnostics'] = trace.as_dict()
+        if not trace.cached:
+            logger.debug(f"  Solved in {results['diagnostics']['total_s'] * 1e3:.1f} ms "
+                         f"(HP solver: {results['diagnostics']['hp_solver']})")
+        return results
+
+    def sweep(self, recipe, ingredients_db, config, pressures_bar):
+        """
+        Calculates performance over a series of chamber pressures.
+
+        Each pressure is solved starting from the converged product state of
+        the previous one (continuation), so only the first point pays for the
+        cold start. If a point fails, the next one starts cold again. A
+        multiphase engine solves every point with `chamber_state`.
+
+        Args:
+            recipe (dict): Ingredient names mapped to mass percentages.
+            ingredients_db (dict): The ingredient database.
+            config (dict): The simulation configuration.
+            pressures_bar (iterable): Chamber pressures in bar, in solve order.
+
+        Returns:
+            list: One result dictionary per pressure, as returned by
+                `calculate_thermo`, with an added 'chamber_pressure_bar' key.
+        """
+        table = []
+        state = None
+        for pc in pressures_bar:
+            trace = SolveTrace()
+            try:
+                logger.debug(f"=== Thermodynamic Calculation (Pc = {pc:.1f} bar) ===")
+                if self.multiphase:
+                    chamber = self.chamber_state(recipe, ingredients_db, pc, trace=trace)
+                    with trace.span('performance'):
+                        results = performance(chamber, config, recipe)
+                else:
+                    gas = self.equilibrate(recipe, ingredients_db, pc, warm_start=state, trace=trace)
+                    with trace.span('performance'):
+                        results = performance(_chamber_state(gas, pc), config, recipe)
+                    state = (gas.T, gas.X.copy())
+            except (ct.CanteraError, ValueError) as e:
+                logger.error(f"✗ Error at {pc:.1f} bar: {str(e)[:400]}")
+                results = {'error': str(e), 't_flame_K': 0}
+                state = None
+            results['chamber_pressure_bar'] = pc
+            results['diagnostics'] = trace.as_dict()
+            table.append(results)
+        return table
+
+    def nozzle(self, recipe, ingredients_db, chamber_pressure_bar=70, area_ratios=(),
+               exit_pressures_bar=(), mode='frozen', ambient_pressure_bar=SEA_LEVEL_PRESSURE_BAR, chamber=None):
+        """
+        Expands the chamber equilibrium of a recipe through a nozzle.
+
+        The chamber Solution is reused for the expansion; see `expand_nozzle`
+        for the arguments and the returned dictionary. If `chamber` is given,
+        it is a `ChamberState` already solved for this recipe and pressure
+        (e.g. by `chamber_state`): the Solution is set to its temperature and
+        composition instead of equilibrating again. The expansion is
+        single-phase only, so a multiphase engine or state raises a ValueError.
+        """
+        if self.multiphase or (chamber is not None and chamber.condensed_mass_fraction is not None):
+            raise ValueError("Nozzle expansion is not available for the multiphase model.")
+        if chamber is None:
+            gas = self.equilibrate(recipe, ingredients_db, chamber_pressure_bar)
+        else:
+            gas = self.get_solution(recipe, ingredients_db)
+            gas.TPX = chamber.t_flame_K, chamber.chamber_pressure_bar * 1e5, chamber.product_mole_fractions
+        return expand_nozzle(gas, area_ratios, exit_pressures_bar, mode, ambient_pressure_bar)
+
+
+def _find_data_file(filename):
+    """Resolves a Cantera data file the way Cantera does: as given, then on the data path."""
+    if os.path.isfile(filename):
+        return filename
+    for directory in ct.get_data_directories():
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _project_to_elements(A, X_guess, element_moles, max_iter=50):
+    """
+    Rescales a product composition guess to given element abundances.
+
+    Finds n = n0 * exp(A^T lambda) with A n = b, i.e. the composition closest
+    to the guess (in relative entropy) that holds exactly the required
+    elements, by Newton's method on the element multipliers lambda. The
+    equilibrium composition of a nearby recipe has this same exponential
+    form, so the result stays a close starting point for the solver, while
+    a guess of the same recipe is returned practically unchanged.
+
+    Args:
+        A (np.ndarray): Elements x species atom-count matrix.
+        X_guess (np.ndarray): Mole fractions of the guess.
+        element_moles (np.ndarray): Required moles of each element (any scale).
+
+    Returns:
+        np.ndarray: Species moles with A n = b, or None if the guess cannot
+            be rescaled (e.g. an element is missing from the recipe).
+    """
+    b = element_moles
+    if np.any(b <= 0) or X_guess.shape != (A.shape[1],):
+        return None
+    # Floor so every element keeps at least a trace of each of its carriers
+    n0 = np.maximum(X_guess, 1e-20)
+    n0 = n0 * (b.sum() / (A @ n0).sum())
+    lam = np.zeros(A.shape[0])
+    for _ in range(max_iter):
+        n = n0 * np.exp(A.T @ lam)
+        residual = A @ n - b
+        if np.all(np.abs(residual) <= 1e-10 * b):
+            return n
+        jacobian = (A * n) @ A.T
         try:
-            # Use Gibbs minimization with VCS
-            gas.equilibrate('HP', solver='vcs', 
+            step = np.linalg.solve(jacobian, residual)
+        except np.linalg.LinAlgError:
+            return None
+        lam -= np.clip(step, -2.0, 2.0)
+    return None
+
+
+def _equilibrate_hp(gas, trace=None):
+    """
+    Runs the HP equilibrium with VCS, falling back to looser settings on failure.
+
+    Each solver attempt is recorded in the trace under the names of
+    `HP_SOLVERS`: 'vcs', then 'vcs_relaxed', then 'auto'.
+    """
+    trace = trace if trace is not None else SolveTrace()
+    try:
+        # Use Gibbs minimization with VCS
+        with trace.attempt('hp_equilibrate', 'vcs'):
+            gas.equilibrate('HP', solver='vcs',
                           rtol=1e-6,
-                          max_steps=2000, 
+                          max_steps=2000,
                           max_iter=500,
                           estimate_equil=0)  # Don't use fast estimate
-            
-            print(f"  ✓ Converged! T_flame = {gas.T:.1f} K")
-            
-        except ct.CanteraError as e:
-            print(f"  First attempt failed, trying with looser tolerance...")
-            try:
-                gas.equilibrate('HP', solver='vcs', 
+
+        logger.debug(f"  ✓ Converged! T_flame = {gas.T:.1f} K")
+
+    except ct.CanteraError as e:
+        logger.info("  First attempt failed, trying with looser tolerance...")
+        try:
+            with trace.attempt('hp_equilibrate', 'vcs_relaxed'):
+                gas.equilibrate('HP', solver='vcs',
                               rtol=1e-5,
                               max_steps=3000)
-                print(f"  ✓ Converged with relaxed tolerance")
-            except:
-                # Last resort: use auto solver
-                print(f"  Trying auto solver...")
+            logger.info("  ✓ Converged with relaxed tolerance")
+        except:
+            # Last resort: use auto solver
+            logger.info("  Trying auto solver...")
+            with trace.attempt('hp_equilibrate', 'auto'):
                 gas.equilibrate('HP', solver='auto', max_steps=2000)
-        
-        # 6. Extract and validate results
-        T_flame = gas.T
-        M_products = gas.mean_molecular_weight
-        
-        # Sanity checks
-        if T_flame < 500:
-            raise ValueError(f"Flame temperature too low ({T_flame:.0f}K) - combustion didn't occur")
-        
-        if M_products > 50:
-            print(f"  Warning: High molecular weight ({M_products:.1f} g/mol)")
-        
-        if gas.cv_mass <= 0:
-            raise ValueError(f"Invalid cv_mass: {gas.cv_mass}")
-        
+
+
+def _chamber_state(gas, chamber_pressure_bar):
+    """Extracts and checks the chamber conditions of an equilibrated Solution."""
+    T_flame = gas.T
+    M_products = gas.mean_molecular_weight
+
+    # Sanity checks
+    if T_flame < 500:
+        raise ValueError(f"Flame temperature too low ({T_flame:.0f}K) - combustion didn't occur")
+
+    if M_products > 50:
+        logger.warning(f"High molecular weight ({M_products:.1f} g/mol)")
+
+    if gas.cv_mass <= 0:
+        raise ValueError(f"Invalid cv_mass: {gas.cv_mass}")
+
+    gamma = gas.cp_mass / gas.cv_mass
+
+    if gamma <= 1.0:
+        raise ValueError(f"Invalid gamma: {gamma:.4f}")
+
+    if gamma < 1.15 or gamma > 1.35:
+        logger.warning(f"Gamma ({gamma:.4f}) outside typical range 1.15-1.35")
+
+    return ChamberState(
+        chamber_pressure_bar=chamber_pressure_bar,
+        t_flame_K=T_flame,
+        gamma=gamma,
+        molecular_weight_g_mol=M_products,
+        product_mole_fractions={name: float(x) for name, x in zip(gas.species_names, gas.X) if x > 0},
+    )
+
+
+def _condensed_phase(species):
+    """Builds the pure fixed-stoichiometry phase of a condensed product species."""
+    definition = dict(species.input_data)
+    definition['equation-of-state'] = {
+        'model': 'constant-volume',
+        'molar-volume': species.molecular_weight / CONDENSED_DENSITY_KG_M3,
+    }
+    return ct.Solution(thermo='fixed-stoichiometry', species=[ct.Species.from_dict(definition)])
+
+
+def _equilibrate_multiphase_hp(mixture, trace=None):
+    """
+    Runs the multiphase HP equilibrium with VCS, falling back to Cantera's 'gibbs' solver.
+
+    Each solver attempt is recorded in the trace under the names of
+    `MULTIPHASE_HP_SOLVERS`.
+    """
+    trace = trace if trace is not None else SolveTrace()
+    state = (mixture.species_moles, mixture.T)
+    try:
+        with trace.attempt('hp_equilibrate', 'vcs'):
+            mixture.equilibrate('HP', solver='vcs', rtol=1e-9, max_steps=2000, max_iter=200)
+        logger.debug(f"  ✓ Converged! T_flame = {mixture.T:.1f} K")
+    except ct.CanteraError:
+        logger.info("  VCS failed, trying the gibbs solver...")
+        mixture.species_moles, mixture.T = state
+        with trace.attempt('hp_equilibrate', 'gibbs'):
+            mixture.equilibrate('HP', solver='gibbs', rtol=1e-9, max_steps=2000, max_iter=200)
+
+
+def _mixture_state(mixture, chamber_pressure_bar):
+    """
+    Extracts and checks the chamber conditions of an equilibrated multiphase Mixture.
+
+    The condensed phases carry mass and heat but no gas moles: the molecular
+    weight is the total mass per mole of gas and gamma the frozen ratio of
+    the total heat capacity to it less R per mole of gas. The mole fractions
+    are taken over all phases.
+    """
+    gas = mixture.phase(0)
+    phases = [mixture.phase(i) for i in range(mixture.n_phases)]
+    phase_moles = np.array([mixture.phase_moles(i) for i in range(mixture.n_phases)])
+    masses = phase_moles * [phase.mean_molecular_weight for phase in phases]
+    cp = phase_moles @ [phase.cp_mole for phase in phases]
+
+    T_flame = mixture.T
+    gas_moles = phase_moles[0]
+    M_products = masses.sum() / gas_moles
+    condensed_mass_fraction = 1.0 - masses[0] / masses.sum()
+
+    if T_flame < 500:
+        raise ValueError(f"Flame temperature too low ({T_flame:.0f}K) - combustion didn't occur")
+
+    if M_products > 50:
+        logger.warning(f"High molecular weight ({M_products:.1f} g/mol)")
+
+    gamma = cp / (cp - gas_moles * ct.gas_constant)
+
+    if gamma <= 1.0:
+        raise ValueError(f"Invalid gamma: {gamma:.4f}")
+
+    if gamma < 1.15 or gamma > 1.35:
+        logger.warning(f"Gamma ({gamma:.4f}) outside typical range 1.15-1.35")
+
+    species_moles = mixture.species_moles
+    total_moles = species_moles.sum()
+    return ChamberState(
+        chamber_pressure_bar=chamber_pressure_bar,
+        t_flame_K=T_flame,
+        gamma=gamma,
+        molecular_weight_g_mol=M_products,
+        product_mole_fractions={mixture.species_name(k): float(n / total_moles)
+                                for k, n in enumerate(species_moles) if n > 0},
+        condensed_mass_fraction=condensed_mass_fraction,
+        gas_gamma=gas.cp_mole / gas.cv_mole,
+    )
+
+
+def _expand_to(gas, s_chamber, h_chamber, X_chamber, pressure_pa, shifting):
+    """
+    Sets the gas to the isentropic expansion state at a pressure.
+
+    Frozen expansion keeps the chamber composition. Shifting expansion
+    re-equilibrates at constant entropy, starting from whatever composition
+    the gas currently holds (i.e. the previous expansion point).
+
+    Returns:
+        tuple: (velocity in m/s, mass flux in kg/m^2/s).
+    """
+    if shifting:
+        gas.SP = s_chamber, pressure_pa
+        gas.equilibrate('SP')
+    else:
+        gas.SPX = s_chamber, pressure_pa, X_chamber
+    velocity = math.sqrt(max(2.0 * (h_chamber - gas.enthalpy_mass), 0.0))
+    return velocity, gas.density * velocity
+
+
+def _sound_speed(gas, shifting):
+    """Frozen sound speed, or the equilibrium one (finite difference at constant s) when shifting."""
+    if not shifting:
+        return math.sqrt(gas.cp_mass / gas.cv_mass * gas.P / gas.density)
+    state = gas.state
+    s, p, rho = gas.entropy_mass, gas.P, gas.density
+    dp = p * 1e-4
+    gas.SP = s, p + dp
+    gas.equilibrate('SP')
+    drho = gas.density - rho
+    gas.state = state
+    return math.sqrt(dp / drho)
+
+
+def expand_nozzle(gas, area_ratios=(), exit_pressures_bar=(), mode='frozen',
+                  ambient_pressure_bar=SEA_LEVEL_PRESSURE_BAR):
+    """
+    Isentropic nozzle expansion from an equilibrated chamber state.
+
+    The throat is located by maximizing the mass flux, then the supersonic
+    branch is marched from the throat outwards: area ratios are solved in
+    ascending order and exit pressures in descending order, each starting
+    from the previous point, so many points cost little more than one.
+
+    Args:
+        gas (ct.Solution): The Solution at the chamber equilibrium state. It
+            is returned to that state afterwards.
+        area_ratios (iterable): Exit-to-throat area ratios (>= 1).
+        exit_pressures_bar (iterable): Exit pressures in bar.
+        mode (str): 'frozen' (chamber composition held fixed) or 'shifting'
+            (composition re-equilibrated along the expansion).
+        ambient_pressure_bar (float): Ambient pressure for 'isp_ambient_sec';
+            defaults to sea level.
+
+    Returns:
+        dict: The throat conditions, the C* from the throat mass flux and a
+            'points' list with one dictionary per requested area ratio or
+            exit pressure, in the order given.
+    """
+    if mode not in ('frozen', 'shifting'):
+        raise ValueError(f"Unknown nozzle expansion mode '{mode}', expected 'frozen' or 'shifting'.")
+    area_ratios = [float(eps) for eps in area_ratios]
+    exit_pressures_bar = [float(p) for p in exit_pressures_bar]
+    if any(eps < 1.0 for eps in area_ratios):
+        raise ValueError("Area ratios must be at least 1.")
+
+    shifting = mode == 'shifting'
+    chamber_state = gas.state
+    p_chamber = gas.P
+    s_chamber, h_chamber, X_chamber = gas.entropy_mass, gas.enthalpy_mass, gas.X.copy()
+
+    def flux(log_p):
+        return _expand_to(gas, s_chamber, h_chamber, X_chamber, math.exp(log_p), shifting)[1]
+
+    try:
+        # Throat: maximum mass flux, golden-section search on log(p) around the
+        # ideal-gas critical pressure ratio
         gamma = gas.cp_mass / gas.cv_mass
-        
-        if gamma <= 1.0:
-            raise ValueError(f"Invalid gamma: {gamma:.4f}")
-        
-        if gamma < 1.15 or gamma > 1.35:
-            print(f"  Warning: Gamma ({gamma:.4f}) outside typical range 1.15-1.35")
-        
-        # 7. Calculate performance
-        R_u = ct.gas_constant
-        g0 = 9.80665
-        
-        # Characteristic velocity
-        vdk_gamma = math.sqrt(gamma) * (2 / (gamma + 1))**((gamma + 1) / (2 * (gamma - 1)))
-        c_star = math.sqrt(R_u * T_flame / M_products) / vdk_gamma
-        
-        # Vacuum thrust coefficient
-        term1 = 2 * gamma**2 / (gamma - 1)
-        term2 = (2 / (gamma + 1))**((gamma + 1) / (gamma - 1))
-        cf_vacuum = math.sqrt(term1 * term2)
-        
-        # Ideal specific impulse
-        isp_sec_ideal = cf_vacuum * c_star / g0
-        
-        # 8. Apply efficiencies
-        efficiencies = config.get("efficiencies", {})
-        combustion_eff = efficiencies.get("combustion_efficiency", 1.0)
-        nozzle_eff = efficiencies.get("nozzle_efficiency", 1.0)
-        two_phase_eff = efficiencies.get("two_phase_efficiency", 1.0)
-        
-        isp_sec_delivered = isp_sec_ideal * combustion_eff * nozzle_eff * two_phase_eff
-        
-        # 9. Display results
-        print(f"\n=== Equilibrium Products ===")
-        print(f"Flame Temperature: {T_flame:.1f} K")
-        print(f"Molecular Weight: {M_products:.2f} g/mol")
-        print(f"Gamma: {gamma:.4f}")
-        print(f"C*: {c_star:.1f} m/s")
-        print(f"Isp (ideal): {isp_sec_ideal:.1f} s")
-        print(f"Isp (delivered): {isp_sec_delivered:.1f} s")
-        
-        # Show major products
-        print(f"\nMajor Products (>2%):")
-        products = []
-        for i, name in enumerate(gas.species_names):
-            if gas.X[i] > 0.02:
-                phase = "condensed" if "(s)" in name or "(l)" in name else "gas"
-                products.append((name, gas.X[i], phase))
-        
-        for name, frac, phase in sorted(products, key=lambda x: x[1], reverse=True):
-            print(f"  {name:15s}: {frac*100:5.2f}% ({phase})")
-        
-        print("=" * 50)
-        
-        return {
-            't_flame_K': T_flame,
-            'gamma': gamma,
-            'product_molecular_weight_g_mol': M_products * 1000,
-            'c_star_m_s': c_star,
-            'isp_vacuum_sec_ideal': isp_sec_ideal,
-            'isp_vacuum_sec_delivered': isp_sec_delivered
+        log_p_critical = math.log(p_chamber) + gamma / (gamma - 1) * math.log(2 / (gamma + 1))
+        lo, hi = log_p_critical - 0.15, min(log_p_critical + 0.15, math.log(p_chamber))
+        ratio = (math.sqrt(5.0) - 1.0) / 2.0
+        a, b = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+        fa, fb = flux(a), flux(b)
+        while hi - lo > THROAT_RTOL:
+            if fa > fb:
+                hi, b, fb = b, a, fa
+                a = hi - ratio * (hi - lo)
+                fa = flux(a)
+            else:
+                lo, a, fa = a, b, fb
+                b = lo + ratio * (hi - lo)
+                fb = flux(b)
+        log_p_throat = (lo + hi) / 2.0
+        u_throat, g_throat = _expand_to(gas, s_chamber, h_chamber, X_chamber, math.exp(log_p_throat), shifting)
+        throat = {
+            'throat_pressure_bar': gas.P / 1e5,
+            'throat_temperature_K': gas.T,
+            'throat_velocity_m_s': u_throat,
+            'c_star_m_s': p_chamber / g_throat,
         }
-        
-    except ct.CanteraError as e:
-        error_msg = str(e)
-        print(f"\n✗ Cantera Error:")
-        print(f"  {error_msg[:400]}")
-        print(f"\nTroubleshooting:")
-        print(f"  - Try different pressure: --pc 50 or --pc 100")
-        print(f"  - Check recipe sums to 100%")
-        print(f"  - Verify ingredients.json has valid data")
-        return {'error': 'Equilibration failed', 't_flame_K': 0}
-        
-    except Exception as e:
-        print(f"\n✗ Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return {'error': str(e), 't_flame_K': 0}
+
+        def point(pressure_pa, area_ratio=None):
+            velocity, mass_flux = _expand_to(gas, s_chamber, h_chamber, X_chamber, pressure_pa, shifting)
+            if area_ratio is None:
+                area_ratio = g_throat / mass_flux
+            # Thrust per unit mass flow: momentum plus pressure term over the exit area
+            pressure_term = pressure_pa * area_ratio / g_throat
+            ambient_term = ambient_pressure_bar * 1e5 * area_ratio / g_throat
+            return {
+                'area_ratio': area_ratio,
+                'exit_pressure_bar': pressure_pa / 1e5,
+                'exit_temperature_K': gas.T,
+                'exit_velocity_m_s': velocity,
+                'exit_mach': velocity / _sound_speed(gas, shifting),
+                'exit_molecular_weight_g_mol': gas.mean_molecular_weight,
+                'thrust_coefficient_vacuum': (velocity + pressure_term) * g_throat / p_chamber,
+                'isp_vacuum_sec': (velocity + pressure_term) / G0,
+                'isp_ambient_sec': (velocity + pressure_term - ambient_term) / G0,
+            }
+
+        points = {}
+        # March the area ratios outwards from the throat
+        log_p = log_p_throat
+        for eps in sorted(set(area_ratios)):
+            target = math.log(eps)
+            # Bracket: upper end at the previous point, lower end stepped down
+            # (eps ~ p^(-1/gamma)) until past the target
+            upper = log_p
+            f_upper = math.log(g_throat / flux(upper)) - target
+            lower = upper + min(1.5 * f_upper, -0.05)
+            f_lower = math.log(g_throat / flux(lower)) - target
+            while f_lower < 0:
+                upper, f_upper = lower, f_lower
+                lower -= 1.0
+                f_lower = math.log(g_throat / flux(lower)) - target
+            # Illinois (modified regula falsi) on log(eps) versus log(p)
+            side = 0
+            log_p = upper
+            while upper - lower > NOZZLE_RTOL:
+                log_p = (lower * f_upper - upper * f_lower) / (f_upper - f_lower)
+                f_mid = math.log(g_throat / flux(log_p)) - target
+                if abs(f_mid) < NOZZLE_RTOL:
+                    break
+                if f_mid > 0:
+                    lower, f_lower = log_p, f_mid
+                    if side == -1:
+                        f_upper /= 2.0
+                    side = -1
+                else:
+                    upper, f_upper = log_p, f_mid
+                    if side == 1:
+                        f_lower /= 2.0
+                    side = 1
+            points[('area_ratio', eps)] = point(math.exp(log_p), eps)
+
+        # Restart at the throat and march the exit pressures downwards
+        _expand_to(gas, s_chamber, h_chamber, X_chamber, math.exp(log_p_throat), shifting)
+        for p_exit in sorted(set(exit_pressures_bar), reverse=True):
+            points[('exit_pressure', p_exit)] = point(p_exit * 1e5)
+
+        throat['points'] = [points[('area_ratio', eps)] for eps in area_ratios] + \
+            [points[('exit_pressure', p)] for p in exit_pressures_bar]
+        throat['mode'] = mode
+        throat['chamber_pressure_bar'] = p_chamber / 1e5
+        return throat
+    finally:
+        gas.state = chamber_state
+
+
+_default_engine = None
+
+
+def get_default_engine():
+    """Returns the process-wide ThermoEngine used by `calculate_thermo`."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = ThermoEngine()
+    return _default_engine
+
+
+def calculate_thermo(recipe, ingredients_db, config, chamber_pressure_bar=70, engine=None):
+    """
+    Calculates thermodynamic properties using single-phase approach.
+    Simpler and more reliable than Mixture class for this application.
+    An engine created with `multiphase=True` uses a Mixture instead, with
+    the condensed products as separate phases.
+
+    This is a thin wrapper around `ThermoEngine.calculate`. Unless an engine
+    is given, a shared process-wide engine is used so repeated calls reuse
+    the loaded product species and cached Solution objects.
+
+    Besides the performance figures, the result holds 'product_mole_fractions',
+    the 'burn_rate_mm_s' at the chamber pressure (if the config has a burn-rate
+    law) and a 'diagnostics' dictionary (see `SolveTrace.as_dict`) with
+    per-stage wall times, the solver attempts and the HP solver path that
+    converged. The figures are computed from the chamber state by
+    `performance.performance`; to evaluate several configurations, solve the
+    state once with `ThermoEngine.chamber_state` and post-process it.
+    """
+    if engine is None:
+        engine = get_default_engine()
+    return engine.calculate(recipe, ingredients_db, config, chamber_pressure_bar)
+
+
+def calculate_thermo_sweep(recipe, ingredients_db, config, pressures_bar, engine=None):
+    """
+    Calculates performance over a chamber-pressure sweep.
+
+    Thin wrapper around `ThermoEngine.sweep`; see there for details.
+    """
+    if engine is None:
+        engine = get_default_engine()
+    return engine.sweep(recipe, ingredients_db, config, pressures_bar)
+
+
+def calculate_nozzle(recipe, ingredients_db, chamber_pressure_bar=70, area_ratios=(), exit_pressures_bar=(),
+                     mode='frozen', ambient_pressure_bar=SEA_LEVEL_PRESSURE_BAR, engine=None, chamber=None):
+    """
+    Calculates nozzle exit conditions and Isp at given area ratios or exit pressures.
+
+    Thin wrapper around `ThermoEngine.nozzle`; see `expand_nozzle` for details.
+    Pass the `ChamberState` of an earlier solve as `chamber` to skip the
+    chamber equilibrium.
+    """
+    if engine is None:
+        engine = get_default_engine()
+    return engine.nozzle(recipe, ingredients_db, chamber_pressure_bar, area_ratios,
+                         exit_pressures_bar, mode, ambient_pressure_bar, chamber=chamber)
@@ -0,0 +1,400 @@
+"""
+This module propagates input uncertainties through the thermo engine (Monte Carlo).
+
+Each sample perturbs the recipe percentages (mixing tolerance) and the
+enthalpies of formation of selected ingredients with normal noise, and is
+solved by a warm ThermoEngine in a worker process. The distributions of
+T_flame, C* and Isp are summarized with streaming statistics (running mean
+and variance, P-square percentile estimates), so memory stays bounded no
+matter how many samples are run; individual samples can be streamed to a
+result writer if they are needed.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import math
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ancp_sim.chemdb import ChemDB, load_chemdb
+from ancp_sim.config import load_config
+from ancp_sim.main import add_output_arguments, load_recipe
+from ancp_sim.writers import open_writer
+import ancp_sim.output as output
+
+# Named explicitly, since __name__ is '__main__' when run with python -m
+logger = logging.getLogger('ancp_sim.uncertainty')
+
+# Result keys summarized by default
+QUANTITIES = (
+    't_flame_K',
+    'gamma',
+    'c_star_m_s',
+    'isp_vacuum_sec_ideal',
+    'isp_vacuum_sec_delivered',
+)
+
+DEFAULT_PERCENTILES = (5.0, 50.0, 95.0)
+
+# Default mixing tolerance: standard deviation of each percentage, in percentage points
+DEFAULT_COMPOSITION_SIGMA_PCT = 0.5
+
+# Samples per job sent to a worker
+CHUNK_SIZE = 16
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile with the P-square algorithm.
+
+    Keeps five markers whose heights are adjusted with piecewise-parabolic
+    interpolation as samples arrive (Jain & Chlamtac, 1985), so the memory
+    used is constant regardless of the number of samples.
+    """
+
+    def __init__(self, percentile):
+        """
+        Args:
+            percentile (float): The percentile to estimate, between 0 and 100.
+        """
+        self.percentile = percentile
+        p = percentile / 100.0
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = [1.0, 1.0 + 2 * p, 1.0 + 4 * p, 3.0 + 2 * p, 5.0]
+        self._increments = [0.0, p / 2, p, (1.0 + p) / 2, 1.0]
+
+    def add(self, x):
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+                self._positions = [1, 2, 3, 4, 5]
+            return
+
+        q, n = self._heights, self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < height < q[i + 1]:
+                    # Parabolic step would break monotonicity; use a linear one
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    @property
+    def value(self):
+        """The current estimate (exact while fewer than five samples were seen)."""
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return math.nan
+        values = sorted(self._initial)
+        position = (len(values) - 1) * self.percentile / 100.0
+        lower = int(math.floor(position))
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class RunningStatistics:
+    """Count, mean, variance (Welford), extremes and percentiles of a stream of values."""
+
+    def __init__(self, percentiles=DEFAULT_PERCENTILES):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = [P2Quantile(p) for p in percentiles]
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        for quantile in self.quantiles:
+            quantile.add(x)
+
+    @property
+    def std(self):
+        """The sample standard deviation."""
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else math.nan,
+            'std': self.std,
+            'min': self.min if self.count else math.nan,
+            'max': self.max if self.count else math.nan,
+            'percentiles': {f'p{quantile.percentile:g}': quantile.value for quantile in self.quantiles},
+        }
+
+
+class UncertaintyStatistics:
+    """Streaming statistics of the result quantities over Monte Carlo samples."""
+
+    def __init__(self, quantities=QUANTITIES, percentiles=DEFAULT_PERCENTILES):
+        self.samples = 0
+        self.failed = 0
+        self.statistics = {quantity: RunningStatistics(percentiles) for quantity in quantities}
+
+    def add(self, record):
+        """Adds one sample record; failed samples are counted but not summarized."""
+        self.samples += 1
+        if 'error' in record:
+            self.failed += 1
+            return
+        for quantity, statistics in self.statistics.items():
+            statistics.add(record[quantity])
+
+    def summary(self):
+        """Returns the sample counts and per-quantity statistics as a dictionary."""
+        return {
+            'samples': self.samples,
+            'failed': self.failed,
+            'quantities': {quantity: statistics.as_dict() for quantity, statistics in self.statistics.items()},
+        }
+
+
+def sample_chunks(recipe, ingredients_db, samples, composition_sigma_pct=DEFAULT_COMPOSITION_SIGMA_PCT,
+                  enthalpy_sigma=None, seed=None, chunk_size=CHUNK_SIZE):
+    """
+    Draws the perturbed inputs, a chunk at a time.
+
+    Every ingredient present in the recipe gets normal noise of
+    `composition_sigma_pct` percentage points; negative percentages are
+    clipped to zero and the recipe is renormalized to 100%. Enthalpies of
+    formation get normal noise of the given standard deviations. Chunk i is
+    drawn from its own generator seeded with (seed, i), so a run is
+    reproducible for a given seed and chunk size.
+
+    Args:
+        recipe (dict): Ingredient names mapped to mass percentages.
+        ingredients_db (dict): The ingredient database.
+        samples (int): Total number of samples.
+        composition_sigma_pct (float): Standard deviation of each percentage.
+        enthalpy_sigma (dict): Ingredient name -> standard deviation of its
+            enthalpy of formation in kJ/mol.
+        seed (int): Seed of the random generators.
+        chunk_size (int): Samples per chunk.
+
+    Yields:
+        list: (sample index, recipe, {ingredient: enthalpy kJ/mol}) tuples.
+    """
+    import numpy as np
+
+    names = [name for name, pct in recipe.items() if pct > 0]
+    enthalpy_sigma = dict(enthalpy_sigma or {})
+    for name in enthalpy_sigma:
+        if name not in ingredients_db:
+            raise ValueError(f"Ingredient '{name}' not found in the database.")
+    perturbed = [name for name in names if enthalpy_sigma.get(name, 0) > 0]
+
+    base = np.array([recipe[name] for name in names], dtype=float)
+    base_enthalpies = np.array([ingredients_db[name]['enthalpy_formation_kJ_mol'] for name in perturbed])
+    sigmas = np.array([enthalpy_sigma[name] for name in perturbed])
+    seed = 0 if seed is None else seed
+
+    for chunk_index, start in enumerate(range(0, samples, chunk_size)):
+        rng = np.random.default_rng([seed, chunk_index])
+        count = min(chunk_size, samples - start)
+        percentages = np.clip(base + rng.normal(0.0, composition_sigma_pct, (count, len(names))), 0.0, None)
+        percentages *= 100.0 / percentages.sum(axis=1, keepdims=True)
+        enthalpies = base_enthalpies + rng.normal(0.0, 1.0, (count, len(perturbed))) * sigmas
+        yield [
+            (start + i,
+             dict(zip(names, percentages[i].tolist())),
+             dict(zip(perturbed, enthalpies[i].tolist())))
+            for i in range(count)
+        ]
+
+
+def _init_worker(ingredients_db, config, log_level=None):
+    """Creates the warm engine held by a worker process."""
+    from ancp_sim.thermo import ThermoEngine
+    if log_level is not None:
+        output.configure_logging(level=log_level)
+    _worker['engine'] = ThermoEngine()
+    _worker['ingredients_db'] = ingredients_db
+    _worker['config'] = config
+
+
+def _run_chunk(job):
+    """Solves one chunk of samples. Never raises; failures are reported in the records."""
+    chunk, chamber_pressure_bar = job
+    base = _worker['ingredients_db']
+    records = []
+    for index, recipe, enthalpies in chunk:
+        # The enthalpies only change the reactant enthalpy, so every sample
+        # reuses the element data of the database and the warm Solution
+        ingredients_db = base.with_enthalpies(enthalpies)
+        record = {'sample': index, 'chamber_pressure_bar': chamber_pressure_bar,
+                  'composition': recipe, 'enthalpies_kJ_mol': enthalpies}
+        try:
+            record.update(_worker['engine'].calculate(recipe, ingredients_db, _worker['config'],
+                                                      chamber_pressure_bar=chamber_pressure_bar))
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+        records.append(record)
+    return records
+
+
+def run_samples(recipe, ingredients_db, config, samples, chamber_pressure_bar=70,
+                composition_sigma_pct=DEFAULT_COMPOSITION_SIGMA_PCT, enthalpy_sigma=None, seed=None,
+                workers=None, worker_log_level=logging.WARNING):
+    """
+    Solves Monte Carlo samples over a process pool and yields them in sample order.
+
+    Only a bounded number of chunks is in flight at any time, so memory use
+    does not grow with the number of samples. Records come out in sample
+    order regardless of which worker finishes first, so the streamed samples
+    and the P-square percentiles fed from them are reproducible for a seed.
+
+    Args:
+        recipe (dict): The nominal recipe, ingredient names mapped to mass percentages.
+        ingredients_db (ChemDB): The ingredient database; a plain dictionary
+            is converted to a ChemDB first.
+        config (dict): The simulation configuration.
+        samples (int): Number of samples.
+        chamber_pressure_bar (float): Chamber pressure in bar.
+        composition_sigma_pct (float): See `sample_chunks`.
+        enthalpy_sigma (dict): See `sample_chunks`.
+        seed (int): See `sample_chunks`.
+        workers (int): Number of worker processes. Defaults to the CPU count;
+            1 runs everything in the current process.
+        worker_log_level (int): Logging level of the worker processes.
+
+    Yields:
+        dict: One record per sample in sample order, holding the sample
+            index, its perturbed inputs and the `calculate_thermo` results
+            or an 'error' message.
+    """
+    if not isinstance(ingredients_db, ChemDB):
+        ingredients_db = ChemDB(ingredients_db)
+    chunks = sample_chunks(recipe, ingredients_db, samples, composition_sigma_pct, enthalpy_sigma, seed)
+    if workers == 1:
+        _init_worker(ingredients_db, config)
+        for chunk in chunks:
+            yield from _run_chunk((chunk, chamber_pressure_bar))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(ingredients_db, config, worker_log_level)) as pool:
+        max_pending = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_run_chunk, (chunk, chamber_pressure_bar)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def parse_enthalpy_sigma(spec):
+    """Parses a 'Ingredient Name=SIGMA' enthalpy uncertainty (kJ/mol)."""
+    name, sep, value = spec.rpartition('=')
+    try:
+        sigma = float(value)
+    except ValueError:
+        sigma = None
+    if not sep or not name or sigma is None or sigma < 0:
+        raise argparse.ArgumentTypeError(f"Invalid enthalpy uncertainty '{spec}', expected 'Ingredient Name=SIGMA'")
+    return name, sigma
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="ANCP-Sim: Monte Carlo uncertainty of a recipe's performance")
+    parser.add_argument('recipe_file', type=str, help="Nominal propellant recipe file")
+    parser.add_argument('--samples', type=int, default=1000, help="Number of Monte Carlo samples (default: 1000)")
+    parser.add_argument('--pc', type=float, default=70.0, help="Chamber pressure in bar")
+    parser.add_argument('--composition-sigma', type=float, default=DEFAULT_COMPOSITION_SIGMA_PCT, metavar='PCT',
+                        help=f"Standard deviation of each recipe percentage in percentage points "
+                             f"(default: {DEFAULT_COMPOSITION_SIGMA_PCT})")
+    parser.add_argument('--enthalpy-sigma', type=parse_enthalpy_sigma, action='append', default=[],
+                        metavar='NAME=SIGMA',
+                        help="Standard deviation of an ingredient's enthalpy of formation in kJ/mol (repeatable), "
+                             "e.g. 'Methylene Diphenyl Diisocyanate=20'")
+    parser.add_argument('--percentiles', type=float, nargs='+', default=list(DEFAULT_PERCENTILES),
+                        help="Percentiles to estimate (default: 5 50 95)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument('--summary', type=str, default=None, metavar='PATH', help="Also write the summary as JSON")
+    parser.add_argument('--config', type=str, default='config.json', help="Path to the configuration file")
+    parser.add_argument('--ingredients', type=str, action='append', default=[], metavar='PATH',
+                        help="Ingredient overlay file applied on top of the shipped database (repeatable)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    add_output_arguments(parser)
+
+    args = parser.parse_args(argv)
+    output.configure_logging(args.quiet, args.verbose)
+    report = not args.quiet
+
+    config = load_config(args.config)
+    ingredients_db = load_chemdb(*args.ingredients)
+    recipe_data = load_recipe(args.recipe_file)
+    if not ingredients_db or config is None or recipe_data is None:
+        return 1
+    recipe = recipe_data.get('composition', {})
+
+    if report:
+        output.print_banner()
+    logger.info(f"Running {args.samples} samples of {recipe_data.get('propellant_name', 'N/A')} at {args.pc:g} bar")
+
+    statistics = UncertaintyStatistics(percentiles=args.percentiles)
+    worker_log_level = logging.DEBUG if args.verbose else logging.WARNING
+    # Individual samples are written only on request; the summary is the result
+    write_samples = args.output is not None or args.format is not None
+    try:
+        with (open_writer(args.output or '-', args.format) if write_samples else contextlib.nullcontext()) as writer:
+            for record in run_samples(recipe, ingredients_db, config, args.samples, args.pc,
+                                      composition_sigma_pct=args.composition_sigma,
+                                      enthalpy_sigma=dict(args.enthalpy_sigma), seed=args.seed,
+                                      workers=args.workers, worker_log_level=worker_log_level):
+                statistics.add(record)
+                if writer:
+                    writer.write(record)
+    except ValueError as e:
+        logger.error(f"Error during sampling: {e}")
+        return 1
+
+    summary = statistics.summary()
+    if report:
+        output.print_uncertainty(summary)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    elif not report:
+        # Quiet mode: the summary goes to stdout as one line of JSON
+        print(json.dumps(summary))
+    logger.info(f"Completed {summary['samples']} samples, {summary['failed']} failed.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
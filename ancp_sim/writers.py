@@ -0,0 +1,225 @@
+"""
+This module writes simulation results in machine-readable, streaming formats.
+
+Every writer takes one result record at a time and writes it out at once,
+so sweeps and batch runs of any size never hold all results in memory:
+
+- JSONL: one JSON object per line, with the product mole fractions as a
+  nested object.
+- CSV: one row per case with fixed columns; the product mole fractions are
+  stored as a JSON object in a single column.
+- Columnar arrays: a directory holding one raw float64 file per column, the
+  product mole fractions spread over X_<species> columns. `load_columns`
+  reads it back as memory-mapped NumPy arrays.
+"""
+import csv
+import json
+import os
+import sys
+
+FORMATS = ('jsonl', 'csv', 'npy')
+
+# Fields identifying a case, written ahead of the results
+ID_FIELDS = ('recipe', 'propellant_name', 'chamber_pressure_bar')
+
+# Scalar results written as CSV and array columns
+RESULT_FIELDS = (
+    't_flame_K',
+    'gamma',
+    'product_molecular_weight_g_mol',
+    'c_star_m_s',
+    'isp_vacuum_sec_ideal',
+    'isp_vacuum_sec_delivered',
+    'burn_rate_mm_s',
+    'condensed_mass_fraction',
+)
+
+COLUMNS_FORMAT_VERSION = 1
+
+
+def _open_text(path):
+    """Opens a text output file, or returns stdout for '-'. The flag says whether to close it."""
+    if path == '-':
+        return sys.stdout, False
+    return open(path, 'w', newline=''), True
+
+
+class _Writer:
+    """Context-manager plumbing shared by the writers."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonlWriter(_Writer):
+    """Writes each record as one line of JSON."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The output file, or '-' for stdout.
+        """
+        self._file, self._owned = _open_text(path)
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+class CsvWriter(_Writer):
+    """Writes each record as one CSV row with a fixed set of columns."""
+
+    FIELDS = ID_FIELDS + RESULT_FIELDS + ('product_mole_fractions', 'error')
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The output file, or '-' for stdout.
+        """
+        self._file, self._owned = _open_text(path)
+        self._writer = csv.DictWriter(self._file, fieldnames=self.FIELDS, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, record):
+        row = dict(record)
+        if 'error' in row:
+            # A failed case has no meaningful results
+            row.update({field: '' for field in RESULT_FIELDS})
+        row['product_mole_fractions'] = json.dumps(record.get('product_mole_fractions', {}))
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+class ColumnWriter(_Writer):
+    """
+    Writes records as a directory of float64 columns.
+
+    Each numeric column is appended to its own raw file as records arrive.
+    A product species first seen part-way through gets a new column that is
+    backfilled with zeros for the earlier rows. The text fields of each row
+    (recipe, propellant name, error) go to labels.jsonl, and meta.json lists
+    the columns once the writer is closed.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The output directory (created if needed).
+        """
+        import numpy as np
+
+        self._np = np
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rows = 0
+        self._columns = {}
+        self._labels = open(os.path.join(path, 'labels.jsonl'), 'w')
+        for name in ('chamber_pressure_bar',) + RESULT_FIELDS:
+            self._add_column(name)
+
+    def _add_column(self, name):
+        f = open(os.path.join(self.path, f'column{len(self._columns)}.f64'), 'wb')
+        if self.rows:
+            # Species that did not appear before had a mole fraction of zero
+            f.write(self._np.zeros(self.rows).tobytes())
+        self._columns[name] = f
+
+    def write(self, record):
+        np = self._np
+        failed = 'error' in record
+        values = {name: np.nan if failed and name in RESULT_FIELDS else record.get(name, np.nan)
+                  for name in ('chamber_pressure_bar',) + RESULT_FIELDS}
+        for species, fraction in record.get('product_mole_fractions', {}).items():
+            values[f'X_{species}'] = fraction
+        for name in values:
+            if name not in self._columns:
+                self._add_column(name)
+        for name, f in self._columns.items():
+            f.write(np.float64(values.get(name, 0.0)).tobytes())
+        self._labels.write(json.dumps({
+            'recipe': record.get('recipe'),
+            'propellant_name': record.get('propellant_name'),
+            'error': record.get('error'),
+        }) + '\n')
+        self.rows += 1
+
+    def close(self):
+        for f in self._columns.values():
+            f.close()
+        self._labels.close()
+        meta = {
+            'version': COLUMNS_FORMAT_VERSION,
+            'rows': self.rows,
+            'columns': {name: os.path.basename(f.name) for name, f in self._columns.items()},
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+
+def load_columns(path):
+    """
+    Loads a directory written by `ColumnWriter`.
+
+    Args:
+        path (str): The directory.
+
+    Returns:
+        tuple: (columns, labels), where columns maps each column name to a
+            read-only memory-mapped float64 array and labels is the list of
+            per-row text fields.
+    """
+    import numpy as np
+
+    with open(os.path.join(path, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    if meta.get('version') != COLUMNS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported column format version {meta.get('version')} in {path}.")
+    columns = {}
+    for name, filename in meta['columns'].items():
+        if meta['rows']:
+            columns[name] = np.memmap(os.path.join(path, filename), dtype=np.float64, mode='r', shape=(meta['rows'],))
+        else:
+            columns[name] = np.zeros(0)
+    with open(os.path.join(path, 'labels.jsonl'), 'r') as f:
+        labels = [json.loads(line) for line in f]
+    return columns, labels
+
+
+def open_writer(path, format=None):
+    """
+    Opens a streaming result writer.
+
+    Args:
+        path (str): Output file ('-' for stdout) or, for 'npy', a directory.
+        format (str): One of FORMATS. Defaults to 'csv' for a .csv path and
+            'jsonl' otherwise.
+
+    Returns:
+        A writer with `write(record)` and `close()`, usable as a context manager.
+    """
+    if format is None:
+        format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    if format == 'jsonl':
+        return JsonlWriter(path)
+    if format == 'csv':
+        return CsvWriter(path)
+    if format == 'npy':
+        if path == '-':
+            raise ValueError("The 'npy' format writes a directory and cannot go to stdout.")
+        return ColumnWriter(path)
+    raise ValueError(f"Unknown output format '{format}', expected one of {FORMATS}.")
@@ -0,0 +1,132 @@
+import json
+import math
+import os
+import tempfile
+import unittest
+import numpy as np
+from ancp_sim.ballistics import (ChamberLookup, DEFAULT_STEPS, TAIL_STEPS, parse_design, exit_pressure_ratio,
+                                 motor_class, simulate_motors, main)
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.config import DEFAULT_CONFIG
+from ancp_sim.performance import performance
+from ancp_sim.tables import ThermoTable
+from ancp_sim.thermo import ThermoEngine
+
+RECIPE = {"Ammonium Nitrate": 80.0, "Potassium Nitrate": 10.0, "Castor Oil": 10.0}
+# Pressure-independent properties, so the quasi-steady pressure has a closed form
+LOOKUP = ChamberLookup([1.0, 300.0], [1200.0, 1200.0], [1.2, 1.2], [8e5, 8e5])
+CONFIG = {"burn_rate": {"a": 5.0, "n": 0.4}}
+BATES = {"name": "bates", "grain": {"type": "bates", "outer_diameter_mm": 33, "core_diameter_mm": 12,
+                                    "length_mm": 60, "segments": 2}, "throat_diameter_mm": 8, "expansion_ratio": 6}
+TUBULAR = {"grain": {"type": "tubular", "outer_diameter_mm": 33, "core_diameter_mm": 12, "length_mm": 120},
+           "throat_diameter_mm": 9}
+END_BURNER = {"grain": {"type": "end_burner", "outer_diameter_mm": 33, "length_mm": 100}, "throat_diameter_mm": 3}
+
+
+class TestBallistics(unittest.TestCase):
+
+    def test_exit_pressure_ratio(self):
+        """Test the area-Mach solution against Mach 2 at gamma 1.4 (area ratio 1.6875)."""
+        ratio = exit_pressure_ratio([1.0, 1.6875], 1.4)
+        np.testing.assert_allclose(ratio, [(2 / 2.4)**3.5, 1.8**-3.5], rtol=1e-6)
+
+    def test_end_burner_is_neutral(self):
+        """Test an end-burner against the closed-form pressure, burn time and propellant mass."""
+        result = simulate_motors([END_BURNER], LOOKUP, CONFIG, {}, 1.6, steps=50)
+        summary = result['summary'][0]
+        kn = 33.0**2 / 3.0**2
+        pressure = (1600 * kn * 1200 * 5e-3 * 1e-6**0.4)**(1 / 0.6)
+        rate = 5e-3 * (pressure / 1e6)**0.4
+        self.assertAlmostEqual(summary['kn_initial'], kn)
+        self.assertAlmostEqual(summary['max_pressure_bar'], pressure / 1e5, places=6)
+        self.assertAlmostEqual(summary['average_pressure_bar'], pressure / 1e5, places=6)
+        self.assertAlmostEqual(summary['burn_time_s'], 0.1 / rate, places=6)
+        mass = 1600 * math.pi / 4 * 0.033**2 * 0.1
+        self.assertAlmostEqual(summary['propellant_mass_kg'], mass)
+        burned = (result['mass_flow_kg_s'][:50, 0] * np.diff(np.linspace(0, summary['burn_time_s'], 51))).sum()
+        self.assertAlmostEqual(burned, mass)
+        # The blowdown decays towards ambient after burnout
+        tail = result['pressure_bar'][50:, 0]
+        self.assertTrue(np.all(np.diff(tail) < 0) and tail[-1] < 0.01 * tail[0])
+        self.assertTrue(np.all(np.diff(result['time_s'][:, 0]) > 0))
+
+    def test_grain_shapes(self):
+        """Test that tubular grains burn progressively and BATES ends limit the web."""
+        result = simulate_motors([BATES, TUBULAR], LOOKUP, CONFIG, {}, 1.6)
+        bates, tubular = result['summary']
+        area = 2 * (math.pi * 12 * 60 + 2 * math.pi / 4 * (33**2 - 12**2))
+        self.assertAlmostEqual(bates['kn_initial'], area / 8**2 * 4 / math.pi)
+        self.assertGreater(tubular['kn_max'], 2.5 * tubular['kn_initial'])
+        self.assertGreater(tubular['max_pressure_bar'], tubular['average_pressure_bar'])
+        self.assertEqual(result['pressure_bar'].shape, (DEFAULT_STEPS + TAIL_STEPS, 2))
+
+    def test_vectorized_matches_single(self):
+        """Test that designs simulated together give the same curves as alone."""
+        together = simulate_motors([BATES, TUBULAR, END_BURNER], LOOKUP, DEFAULT_CONFIG, RECIPE, 1.6)
+        alone = simulate_motors([TUBULAR], LOOKUP, DEFAULT_CONFIG, RECIPE, 1.6)
+        np.testing.assert_allclose(together['thrust_N'][:, 1], alone['thrust_N'][:, 0])
+        for key, value in alone['summary'][0].items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(together['summary'][1][key], value, delta=1e-9 * abs(value), msg=key)
+            else:
+                self.assertEqual(together['summary'][1][key], value)
+        for row in together['summary']:
+            self.assertGreater(row['total_impulse_Ns'], 0.0)
+        self.assertEqual(together['summary'][0]['motor_class'], motor_class(together['summary'][0]['total_impulse_Ns']))
+
+    def test_catalyst_raises_pressure(self):
+        """Test that ferric oxide above the threshold speeds up the burn."""
+        plain = simulate_motors([BATES], LOOKUP, DEFAULT_CONFIG, {}, 1.6)['summary'][0]
+        catalyzed = simulate_motors([BATES], LOOKUP, DEFAULT_CONFIG, {"Ferric Oxide": 2.0}, 1.6)['summary'][0]
+        self.assertGreater(catalyzed['max_pressure_bar'], plain['max_pressure_bar'])
+        self.assertLess(catalyzed['burn_time_s'], plain['burn_time_s'])
+
+    def test_invalid_input(self):
+        """Test that invalid designs and unstable burn-rate laws are rejected."""
+        for design in ({}, {"grain": {"type": "star"}, "throat_diameter_mm": 5},
+                       {"grain": {"type": "bates", "outer_diameter_mm": 30, "core_diameter_mm": 40, "length_mm": 50},
+                        "throat_diameter_mm": 5},
+                       dict(END_BURNER, expansion_ratio=0.5)):
+            with self.assertRaises(ValueError):
+                parse_design(design)
+        with self.assertRaises(ValueError):
+            simulate_motors([BATES], LOOKUP, {"burn_rate": {"a": 5.0, "n": 1.0}}, {}, 1.6)
+
+    def test_lookup_from_engine_and_table(self):
+        """Test that the engine lookup reproduces the chamber C* and the table lookup its grid values."""
+        db = load_chemdb()
+        engine = ThermoEngine()
+        lookup = ChamberLookup.from_engine(engine, RECIPE, db, [50.0, 70.0])
+        expected = performance(engine.chamber_state(RECIPE, db, 70.0), DEFAULT_CONFIG)
+        c_star, gamma, _ = lookup(np.array([70.0]))
+        self.assertAlmostEqual(c_star[0], expected['c_star_m_s'], delta=1e-3)
+        self.assertAlmostEqual(gamma[0], expected['gamma'], places=6)
+
+        pressures = [10.0, 100.0]
+        meta = {'axes': [{'name': 'chamber_pressure_bar', 'values': pressures},
+                         {'name': 'Castor Oil', 'values': [5.0, 15.0]}]}
+        grid = np.ones((2, 2))
+        table = ThermoTable(meta, {'c_star_m_s': grid * [[1000.0], [1100.0]], 'gamma': grid * 1.2,
+                                   't_flame_K': grid * 1500.0, 'product_molecular_weight_g_mol': grid * 25.0})
+        lookup = ChamberLookup.from_table(table, RECIPE)
+        np.testing.assert_allclose(lookup(np.array([10.0, 100.0]))[0], [1000.0, 1100.0])
+        self.assertAlmostEqual(lookup.rt[0], 8314.46261815324 / 25.0 * 1500.0)
+        with self.assertRaises(ValueError):
+            ChamberLookup.from_table(table, {"Ammonium Nitrate": 100.0})
+
+    def test_main(self):
+        """Test the command line with a designs file and the curve output."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            designs = os.path.join(tmpdir, 'designs.json')
+            with open(designs, 'w') as f:
+                json.dump({'designs': [BATES, END_BURNER]}, f)
+            curves = os.path.join(tmpdir, 'curves.csv')
+            status = main(['data/example_recipe.json', designs, '--quiet', '--steps', '20',
+                           '--curves', curves])
+            self.assertEqual(status, 0)
+            with open(curves) as f:
+                self.assertEqual(len(f.readlines()), 1 + 2 * (20 + TAIL_STEPS))
+
+
+if __name__ == '__main__':
+    unittest.main()
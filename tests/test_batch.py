@@ -0,0 +1,99 @@
+import unittest
+import os
+import json
+import tempfile
+from ancp_sim.batch import load_recipes, load_error_records, make_jobs, run_batch, main
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        """Write a small recipe directory and JSONL file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = self.tmpdir.name
+        for name in ('a', 'b'):
+            with open(os.path.join(self.dir, f'{name}.json'), 'w') as f:
+                json.dump({"propellant_name": name, "composition": {"Ammonium Nitrate": 100.0}}, f)
+        self.jsonl = os.path.join(self.dir, 'recipes.jsonl')
+        with open(self.jsonl, 'w') as f:
+            f.write(json.dumps({"propellant_name": "first", "composition": {}}) + '\n\n')
+            f.write(json.dumps({"composition": {}}) + '\n')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_load_directory(self):
+        """Test that a directory yields its JSON recipes in sorted order."""
+        recipes = load_recipes(self.dir)
+        self.assertEqual([data['propellant_name'] for _, data in recipes], ['a', 'b'])
+
+    def test_load_jsonl(self):
+        """Test that blank lines are skipped and unnamed recipes get a line id."""
+        recipes = load_recipes(self.jsonl)
+        self.assertEqual([recipe_id for recipe_id, _ in recipes], ['first', f'{self.jsonl}:3'])
+
+    def test_unreadable_recipes_are_reported(self):
+        """Test that a malformed JSONL line or recipe file is reported and the other recipes still load."""
+        with open(self.jsonl, 'a') as f:
+            f.write('{"propellant_name": "truncated", \n')
+            f.write(json.dumps({"propellant_name": "last", "composition": {}}) + '\n')
+        with open(os.path.join(self.dir, 'broken.json'), 'w') as f:
+            f.write('[1, 2')
+        with self.assertRaises(ValueError):
+            load_recipes(self.jsonl)
+
+        errors = []
+        recipes = load_recipes(os.path.join(self.dir, '*.json*'), errors=errors)
+        self.assertEqual([recipe_id for recipe_id, _ in recipes],
+                         [os.path.join(self.dir, name) for name in ('a.json', 'b.json')] +
+                         ['first', f'{self.jsonl}:3', 'last'])
+        self.assertEqual([recipe_id for recipe_id, _ in errors],
+                         [os.path.join(self.dir, 'broken.json'), f'{self.jsonl}:4'])
+        records = load_error_records(errors, [50.0, 70.0])
+        self.assertEqual(len(records), 4)
+        self.assertTrue(all('error' in record for record in records))
+
+    def test_batch_continues_past_unreadable_recipe(self):
+        """Test that the batch command writes a failed record for an unreadable recipe and runs the rest."""
+        with open(os.path.join(self.dir, 'broken.json'), 'w') as f:
+            f.write('{')
+        path = os.path.join(self.dir, 'results.jsonl')
+        status = main([self.dir, '--config', os.path.join(ROOT, 'config.json'), '--workers', '1',
+                       '--quiet', '--output', path])
+        self.assertEqual(status, 1)
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(sorted(record['propellant_name'] for record in records), ['N/A', 'a', 'b'])
+        self.assertEqual([record['recipe'] for record in records if 'error' in record],
+                         [os.path.join(self.dir, 'broken.json')])
+
+    def test_exit_status(self):
+        """Test that the batch command exits 0 on success and 1 when the configuration cannot be loaded."""
+        config = os.path.join(ROOT, 'config.json')
+        self.assertEqual(main([os.path.join(self.dir, 'a.json'), '--config', config, '--workers', '1',
+                               '--quiet']), 0)
+        broken = os.path.join(self.dir, 'broken_config.json')
+        with open(broken, 'w') as f:
+            f.write('{')
+        self.assertEqual(main([self.dir, '--config', broken, '--quiet']), 1)
+
+    def test_jobs_cross_pressures(self):
+        """Test that every recipe is paired with every pressure."""
+        jobs = make_jobs(load_recipes(self.dir), [50.0, 70.0])
+        self.assertEqual(len(jobs), 4)
+        self.assertEqual([job[2] for job in jobs], [50.0, 70.0, 50.0, 70.0])
+
+    def test_failed_case_does_not_stop_batch(self):
+        """Test that an invalid recipe is reported and the batch continues."""
+        jobs = [
+            ('bad', {"composition": {"Unobtainium": 100.0}}, 70.0),
+            ('also bad', {"composition": {"Unobtainium": 50.0}}, 70.0),
+        ]
+        records = list(run_batch(jobs, {}, {}, workers=1))
+        self.assertEqual([record['recipe'] for record in records], ['bad', 'also bad'])
+        self.assertTrue(all('error' in record for record in records))
+
+if __name__ == '__main__':
+    unittest.main()
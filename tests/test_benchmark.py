@@ -0,0 +1,39 @@
+import unittest
+import os
+import tempfile
+from ancp_sim.benchmark import compare, run_benchmarks, save_baseline, load_baseline, time_call
+from ancp_sim.chemdb import load_chemdb
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_compare_statuses(self):
+        """Test that slowdowns beyond the threshold are regressions and new benchmarks are marked."""
+        baseline = {'fast': 1.0, 'same': 1.0, 'slow': 1.0}
+        results = {'fast': 0.5, 'same': 1.1, 'slow': 1.3, 'added': 2.0}
+        statuses = {row[0]: row[4] for row in compare(results, baseline, threshold=0.25)}
+        self.assertEqual(statuses, {'fast': 'improvement', 'same': 'ok', 'slow': 'regression', 'added': 'new'})
+
+    def test_time_call_runs_setup(self):
+        """Test that setup runs once per repetition and the function number times per repetition."""
+        calls = {'setup': 0, 'func': 0}
+        seconds = time_call(lambda: calls.__setitem__('func', calls['func'] + 1),
+                            lambda: calls.__setitem__('setup', calls['setup'] + 1), repeat=3, number=4)
+        self.assertEqual(calls, {'setup': 3, 'func': 12})
+        self.assertGreaterEqual(seconds, 0.0)
+
+    def test_filtered_run_and_baseline_round_trip(self):
+        """Test that a pattern selects benchmarks and results survive a baseline file."""
+        results = run_benchmarks(load_chemdb(), repeat=1, pattern='calculate_stoichiometry*')
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(name.startswith('calculate_stoichiometry[') for name in results))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'baseline.json')
+            save_baseline(path, results)
+            baseline = load_baseline(path)
+        self.assertEqual(baseline['results'], results)
+        self.assertIn('cantera', baseline['environment'])
+
+
+if __name__ == '__main__':
+    unittest.main()
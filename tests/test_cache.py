@@ -0,0 +1,159 @@
+import unittest
+import os
+import tempfile
+from ancp_sim.cache import ResultCache, WarmStartIndex, result_key, hash_ingredients_db
+from ancp_sim.performance import ChamberState
+from ancp_sim.thermo import ThermoEngine
+
+CONFIG = {"efficiencies": {"combustion_efficiency": 0.90}}
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        """Create a cache in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, 'results.sqlite'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_is_canonical(self):
+        """Test that scaling, ordering and zero entries do not change the key."""
+        key = result_key({"Ammonium Nitrate": 80.0, "Magnesium": 20.0}, 70, 'db', 'species')
+        same = result_key({"Magnesium": 40.0, "Ammonium Nitrate": 160.0, "Castor Oil": 0.0}, 70.0, 'db', 'species')
+        self.assertEqual(key, same)
+        self.assertNotEqual(key, result_key({"Ammonium Nitrate": 80.0, "Magnesium": 20.0}, 71, 'db', 'species'))
+        self.assertNotEqual(key, result_key({"Ammonium Nitrate": 80.0, "Magnesium": 20.0}, 70, 'db2', 'species'))
+
+    def test_empty_recipe_is_not_cached(self):
+        """Test that a recipe without positive percentages has no key and fails as a plain solve would."""
+        self.assertIsNone(result_key({}, 70, 'db', 'species'))
+        self.assertIsNone(result_key({"Ammonium Nitrate": 0.0}, 70, 'db', 'species'))
+        engine = ThermoEngine(cache=self.cache)
+        with self.assertRaises(ValueError):
+            engine.chamber_state({"Ammonium Nitrate": 0.0}, {}, 70)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_round_trip(self):
+        """Test that a stored result dictionary comes back unchanged."""
+        result = {'t_flame_K': 1627.0235654140297, 'gamma': 1.2482412214989234}
+        self.assertIsNone(self.cache.get('k'))
+        self.cache.put('k', result)
+        self.assertEqual(self.cache.get('k'), result)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted beyond the size bound."""
+        self.cache.max_bytes = 100
+        for key in ('a', 'b', 'c'):
+            self.cache.put(key, {'value': key * 30})
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_hits_are_written_in_batches(self):
+        """Test that a hit does not write to the database but still counts for the eviction order."""
+        self.cache.max_bytes = 100
+        for key in ('a', 'b'):
+            self.cache.put(key, {'value': key * 30})
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertEqual(self.cache._connect().total_changes, 2)
+        self.cache.put('c', {'value': 'c' * 30})
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_engine_hit_skips_solve(self):
+        """Test that a cache hit is returned by the engine without an equilibrium solve."""
+        engine = ThermoEngine(cache=self.cache)
+        recipe = {"Ammonium Nitrate": 100.0}
+        db = {"Ammonium Nitrate": {"formula": "H4N2O3", "enthalpy_formation_kJ_mol": -365.56, "molecular_weight_g_mol": 80.043}}
+        stored = ChamberState(70.0, 1234.5, 1.25, 22.0, {'H2O': 0.5, 'N2': 0.5})
+        self.cache.put(result_key(recipe, 70, hash_ingredients_db(db), engine.species_hash), stored.as_dict())
+        results = engine.calculate(recipe, db, CONFIG, chamber_pressure_bar=70)
+        self.assertEqual(results['t_flame_K'], stored.t_flame_K)
+        self.assertAlmostEqual(results['isp_vacuum_sec_delivered'], 0.90 * results['isp_vacuum_sec_ideal'])
+        self.assertTrue(results['diagnostics']['cached'])
+        self.assertIsNone(results['diagnostics']['hp_solver'])
+        self.assertEqual(engine._solutions, {})
+
+    def test_config_change_hits_cache(self):
+        """Test that the cache holds chamber states, so other efficiencies reuse the solve."""
+        engine = ThermoEngine(cache=self.cache)
+        recipe = {"Ammonium Nitrate": 90.0, "Castor Oil": 10.0}
+        db = {
+            "Ammonium Nitrate": {"formula": "H4N2O3", "enthalpy_formation_kJ_mol": -365.56, "molecular_weight_g_mol": 80.043},
+            "Castor Oil": {"formula": "C57H104O9", "enthalpy_formation_kJ_mol": -2660.0, "molecular_weight_g_mol": 933.45},
+        }
+        first = engine.calculate(recipe, db, CONFIG)
+        second = engine.calculate(recipe, db, {"efficiencies": {"combustion_efficiency": 0.45}})
+        self.assertFalse(first['diagnostics']['cached'])
+        self.assertTrue(second['diagnostics']['cached'])
+        self.assertAlmostEqual(second['isp_vacuum_sec_delivered'], first['isp_vacuum_sec_delivered'] / 2)
+
+
+class TestWarmStartIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Create an index in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'warmstart.sqlite')
+        self.index = WarmStartIndex(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_nearest_neighbour(self):
+        """Test that the closest state with the same elements is returned, regardless of scale."""
+        self.assertIsNone(self.index.nearest(['H', 'O'], [2.0, 1.0], 7e6))
+        self.index.add(['H', 'O'], [2.0, 1.0], 7e6, 3000.0, {'H2O': 1.0})
+        self.index.add(['H', 'O'], [4.0, 1.0], 7e6, 2500.0, {'H2': 0.5, 'H2O': 0.5})
+        self.index.add(['C', 'H', 'O'], [1.0, 2.0, 1.0], 7e6, 2000.0, {'CO': 1.0})
+        self.assertEqual(self.index.nearest(['O', 'H'], [0.55, 1.1], 6e6)[0], 3000.0)
+        self.assertEqual(self.index.nearest(['H', 'O'], [3.9, 1.0], 7e6)[0], 2500.0)
+        self.assertIsNone(self.index.nearest(['H', 'N'], [1.0, 1.0], 7e6))
+
+    def test_persists_across_instances(self):
+        """Test that states are shared through the database, and duplicates and old states are dropped."""
+        self.index.add(['H', 'O'], [2.0, 1.0], 7e6, 3000.0, {'H2O': 1.0})
+        self.index.add(['H', 'O'], [2.0, 1.0], 7e6, 3000.0, {'H2O': 1.0})
+        self.assertEqual(len(self.index), 1)
+        reopened = WarmStartIndex(self.path, max_states=2)
+        self.assertEqual(reopened.nearest(['H', 'O'], [2.0, 1.0], 7e6), (3000.0, {'H2O': 1.0}))
+        reopened.add(['H', 'O'], [3.0, 1.0], 7e6, 2800.0, {'H2O': 1.0})
+        reopened.add(['H', 'O'], [4.0, 1.0], 7e6, 2500.0, {'H2O': 1.0})
+        self.assertEqual(len(reopened), 2)
+        reopened.clear()
+        self.assertEqual(len(reopened), 0)
+
+    def test_memory_is_trimmed_with_the_database(self):
+        """Test that states evicted from the database are also dropped from the in-memory groups."""
+        index = WarmStartIndex(self.path, max_states=2)
+        index.add(['H', 'O'], [2.0, 1.0], 7e6, 3000.0, {'H2O': 1.0})
+        index.add(['C', 'O'], [1.0, 1.0], 7e6, 2000.0, {'CO': 1.0})
+        index.add(['H', 'O'], [3.0, 1.0], 7e6, 2800.0, {'H2O': 1.0})
+        index.add(['H', 'O'], [4.0, 1.0], 7e6, 2500.0, {'H2O': 1.0})
+        self.assertEqual(len(index), 2)
+        self.assertEqual(sum(len(group['states']) for group in index._groups.values()), 2)
+        self.assertIsNone(index.nearest(['C', 'O'], [1.0, 1.0], 7e6))
+        self.assertEqual(index.nearest(['H', 'O'], [2.0, 1.0], 7e6)[0], 2800.0)
+
+    def test_engine_seeds_from_index(self):
+        """Test that a second engine starts from a stored neighbour and matches the cold result."""
+        db = {
+            "Ammonium Nitrate": {"formula": "H4N2O3", "enthalpy_formation_kJ_mol": -365.56, "molecular_weight_g_mol": 80.043},
+            "Castor Oil": {"formula": "C57H104O9", "enthalpy_formation_kJ_mol": -2660.0, "molecular_weight_g_mol": 933.45},
+        }
+        cold = ThermoEngine(warm_start_index=self.index).calculate({"Ammonium Nitrate": 90.0, "Castor Oil": 10.0}, db, CONFIG)
+        self.assertIsNone(cold['diagnostics']['warm_start'])
+        self.assertEqual(len(self.index), 1)
+        recipe = {"Ammonium Nitrate": 91.0, "Castor Oil": 9.0}
+        warm = ThermoEngine(warm_start_index=WarmStartIndex(self.path)).calculate(recipe, db, CONFIG)
+        self.assertEqual(warm['diagnostics']['warm_start'], 'index')
+        reference = ThermoEngine().calculate(recipe, db, CONFIG)
+        self.assertAlmostEqual(warm['t_flame_K'], reference['t_flame_K'], delta=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import os
+import json
+import tempfile
+from ancp_sim.chemdb import ChemDB, DEFAULT_INGREDIENTS_PATH, load_ingredients
+from ancp_sim.stoichiometry import calculate_stoichiometry
+
+
+class TestChemDB(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary directory for overlay and compiled files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = ChemDB.load(DEFAULT_INGREDIENTS_PATH)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_json(self, name, data):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        return path
+
+    def test_precomputed_element_data(self):
+        """Test the precomputed element counts and element vectors."""
+        self.assertEqual(self.db.element_counts('Ammonium Nitrate'), {'H': 4, 'N': 2, 'O': 3})
+        vector = self.db.element_vector('Potassium Nitrate')
+        self.assertEqual(dict(zip(self.db.elements, vector))['K'], 1.0)
+
+    def test_acts_as_ingredients_dict(self):
+        """Test that a ChemDB gives the same stoichiometry as the plain JSON dict."""
+        recipe = {"Ammonium Nitrate": 80.0, "Magnesium": 20.0}
+        plain = calculate_stoichiometry(recipe, load_ingredients(DEFAULT_INGREDIENTS_PATH))
+        indexed = calculate_stoichiometry(recipe, self.db)
+        self.assertEqual(plain, indexed)
+
+    def test_overlay_merges_fields(self):
+        """Test that an overlay can change one field and add new ingredients."""
+        overlay = self.write_json('site.json', {
+            "Magnesium": {"enthalpy_formation_kJ_mol": 5.0},
+            "Aluminium": {"formula": "Al", "enthalpy_formation_kJ_mol": 0, "molecular_weight_g_mol": 26.98}
+        })
+        db = ChemDB.load(DEFAULT_INGREDIENTS_PATH, overlay)
+        self.assertEqual(db['Magnesium']['enthalpy_formation_kJ_mol'], 5.0)
+        self.assertEqual(db['Magnesium']['molecular_weight_g_mol'], 24.305)
+        self.assertIn('Al', db.elements)
+        self.assertNotEqual(db.content_hash, self.db.content_hash)
+
+    def test_with_enthalpies(self):
+        """Test that changing enthalpies leaves the original alone and keeps the element data."""
+        db = self.db.with_enthalpies({"Magnesium": 5.0})
+        self.assertIsInstance(db, ChemDB)
+        self.assertEqual(db['Magnesium']['enthalpy_formation_kJ_mol'], 5.0)
+        self.assertEqual(db['Magnesium']['molecular_weight_g_mol'], 24.305)
+        self.assertEqual(self.db['Magnesium']['enthalpy_formation_kJ_mol'], 0)
+        self.assertIs(db.element_vector('Magnesium'), self.db.element_vector('Magnesium'))
+        self.assertEqual(db.content_hash, ChemDB(dict(db)).content_hash)
+        self.assertNotEqual(db.content_hash, self.db.content_hash)
+
+    def test_validation(self):
+        """Test that incomplete or malformed records are rejected."""
+        with self.assertRaises(ValueError):
+            ChemDB({"Broken": {"formula": "H2O"}})
+        with self.assertRaises(ValueError):
+            ChemDB({"Broken": {"formula": "h2o", "enthalpy_formation_kJ_mol": 0, "molecular_weight_g_mol": 18.0}})
+        with self.assertRaises(ValueError):
+            ChemDB({"Broken": {"formula": "H2O", "enthalpy_formation_kJ_mol": 0, "molecular_weight_g_mol": -1}})
+
+    def test_compiled_round_trip(self):
+        """Test that the compiled binary form reloads to an identical database."""
+        path = os.path.join(self.tmpdir.name, 'ingredients.npz')
+        self.db.save(path)
+        loaded = ChemDB.load_compiled(path)
+        self.assertEqual(loaded.content_hash, self.db.content_hash)
+        self.assertEqual(loaded.elements, self.db.elements)
+        self.assertEqual(dict(loaded), dict(self.db))
+        self.assertEqual(loaded.element_counts('Castor Oil'), self.db.element_counts('Castor Oil'))
+
+if __name__ == '__main__':
+    unittest.main()
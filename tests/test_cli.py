@@ -0,0 +1,51 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from ancp_sim.main import main
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+EXAMPLE_RECIPE = os.path.join(ROOT, 'data', 'example_recipe.json')
+
+
+class TestCli(unittest.TestCase):
+
+    def test_main_import_is_light(self):
+        """Test that importing the CLI does not import Cantera or NumPy."""
+        code = "import sys, ancp_sim.main; print(sorted(m for m in ('cantera', 'numpy') if m in sys.modules))"
+        env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_stoich_command(self):
+        """Test that quiet stoich writes one JSON record per recipe and fails on a missing file."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = main(['stoich', '--quiet', EXAMPLE_RECIPE])
+        self.assertEqual(status, 0)
+        record = json.loads(stdout.getvalue())
+        self.assertEqual(record['propellant_name'], 'AN-Mg Test Propellant')
+        self.assertAlmostEqual(record['oxygen_balance_percent'], -40.41, places=2)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main(['stoich', '--quiet', os.path.join(ROOT, 'missing.json')]), 1)
+
+    def test_tables_command(self):
+        """Test that the tables subcommand generates a lookup table and fails on a missing recipe."""
+        from ancp_sim.tables import ThermoTable
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'table')
+            arguments = ['--pc', '50:70:20', '--axis', 'Magnesium=10:15:5', '--workers', '1', '--quiet',
+                         '--config', os.path.join(ROOT, 'config.json')]
+            self.assertEqual(main(['tables', EXAMPLE_RECIPE, path] + arguments), 0)
+            table = ThermoTable.load(path)
+            self.assertEqual([len(axis) for axis in table.axes], [2, 2])
+            self.assertEqual(main(['tables', os.path.join(ROOT, 'missing.json'), path] + arguments), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import unittest
+import cantera as ct
+import numpy as np
+from ancp_sim.batch import run_batch_native
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.gibbs import GibbsSolver, NativeEngine
+from ancp_sim.thermo import ThermoEngine
+
+with open(os.path.join(os.path.dirname(__file__), '..', 'data', 'example_recipe.json')) as f:
+    EXAMPLE = json.load(f)['composition']
+
+RECIPES = [
+    EXAMPLE,
+    {"Ammonium Nitrate": 80.0, "Potassium Nitrate": 10.0, "Castor Oil": 10.0},
+    {"Ammonium Nitrate": 85.0, "Castor Oil": 15.0},
+    {"Ammonium Nitrate": 70.0, "Magnesium": 20.0, "Castor Oil": 10.0},
+    {"Ammonium Nitrate": 60.0, "Magnesium": 10.0, "Ferric Oxide": 2.0, "Castor Oil": 14.0,
+     "Methylene Diphenyl Diisocyanate": 14.0},
+]
+
+
+class TestNativeEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = load_chemdb()
+        cls.thermo_engine = ThermoEngine()
+        cls.engine = NativeEngine(cls.thermo_engine)
+
+    def test_agrees_with_thermo_engine(self):
+        """Test T_flame, gamma, M and the major products against `ThermoEngine` across recipes and pressures."""
+        for pressure in (10.0, 70.0, 200.0):
+            states = self.engine.chamber_states(RECIPES, self.db, pressure)
+            for recipe, (state, error, iterations) in zip(RECIPES, states):
+                with self.subTest(recipe=recipe, pressure=pressure):
+                    self.assertIsNone(error)
+                    self.assertLess(iterations, 50)
+                    expected = self.thermo_engine.chamber_state(recipe, self.db, pressure)
+                    # Limited by the convergence tolerance of the Cantera solve (rtol 1e-6)
+                    self.assertAlmostEqual(state.t_flame_K, expected.t_flame_K, delta=1e-2)
+                    self.assertAlmostEqual(state.gamma, expected.gamma, delta=1e-6)
+                    self.assertAlmostEqual(state.molecular_weight_g_mol, expected.molecular_weight_g_mol, delta=1e-5)
+                    for name, x in expected.product_mole_fractions.items():
+                        if x > 1e-4:
+                            self.assertAlmostEqual(state.product_mole_fractions[name], x, delta=1e-5 * max(x, 1e-2))
+
+    def test_batch_matches_single(self):
+        """Test that cases solved together equal cases solved alone, with per-case pressures and errors."""
+        recipes = RECIPES + [{"Unobtainium": 100.0}, {}]
+        pressures = np.linspace(20.0, 150.0, len(recipes))
+        together = self.engine.chamber_states(recipes, self.db, pressures)
+        self.assertIn('Unobtainium', together[-2][1])
+        self.assertIsNotNone(together[-1][1])
+        for i, recipe in enumerate(RECIPES):
+            alone = self.engine.chamber_states([recipe], self.db, pressures[i])[0][0]
+            self.assertAlmostEqual(together[i][0].t_flame_K, alone.t_flame_K, delta=1e-6)
+            self.assertEqual(together[i][0].chamber_pressure_bar, pressures[i])
+
+    def test_unsupported_species(self):
+        """Test that species without NASA7 data are rejected."""
+        nasa9 = [sp for sp in ct.Species.list_from_file('nasa_condensed.yaml')
+                 if type(sp.thermo).__name__ != 'NasaPoly2']
+        with self.assertRaises(ValueError):
+            GibbsSolver.from_species(nasa9, set().union(*(sp.composition for sp in nasa9)))
+
+    def test_run_batch_native(self):
+        """Test batch records from the native engine, with diagnostics for the solve statistics."""
+        jobs = [('a', {'propellant_name': 'A', 'composition': RECIPES[1]}, 70.0),
+                ('b', {'composition': {"Unobtainium": 100.0}}, 70.0)]
+        first, second = run_batch_native(jobs, self.db, {"efficiencies": {}}, chunk_size=1)
+        self.assertEqual((first['recipe'], first['propellant_name']), ('a', 'A'))
+        self.assertGreater(first['isp_vacuum_sec_delivered'], 0.0)
+        self.assertEqual(first['diagnostics']['hp_solver'], 'native')
+        self.assertIn('error', second)
+
+
+if __name__ == '__main__':
+    unittest.main()
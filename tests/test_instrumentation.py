@@ -0,0 +1,46 @@
+import unittest
+from ancp_sim.instrumentation import SolveTrace, SolveStatistics
+
+
+def _diagnostics(hp_solver, fallbacks=0, cached=False):
+    return {'stages_s': {'hp_equilibrate': 0.5}, 'total_s': 0.5, 'attempts': [],
+            'hp_solver': hp_solver, 'fallbacks': fallbacks, 'cached': cached}
+
+
+class TestSolveTrace(unittest.TestCase):
+
+    def test_fallback_chain_is_recorded(self):
+        """Test that failed attempts propagate their error and the converged solver is reported."""
+        trace = SolveTrace()
+        with self.assertRaises(RuntimeError):
+            with trace.span('hp_equilibrate'), trace.attempt('hp_equilibrate', 'vcs'):
+                raise RuntimeError("no convergence")
+        with trace.span('hp_equilibrate'), trace.attempt('hp_equilibrate', 'vcs_relaxed'):
+            pass
+
+        diagnostics = trace.as_dict()
+        self.assertEqual(diagnostics['hp_solver'], 'vcs_relaxed')
+        self.assertEqual(diagnostics['fallbacks'], 1)
+        self.assertEqual([a['converged'] for a in diagnostics['attempts']], [False, True])
+        self.assertEqual(list(diagnostics['stages_s']), ['hp_equilibrate'])
+        self.assertFalse(diagnostics['cached'])
+
+    def test_statistics_rank_fallback_cases(self):
+        """Test that the aggregate counts solver paths and ranks the cases needing fallbacks."""
+        statistics = SolveStatistics()
+        statistics.add({'diagnostics': _diagnostics('vcs')}, label='a')
+        statistics.add({'diagnostics': _diagnostics('auto', fallbacks=2)}, label='b')
+        statistics.add({'diagnostics': _diagnostics('vcs_relaxed', fallbacks=1)}, label='b')
+        statistics.add({'diagnostics': _diagnostics('auto', fallbacks=2)}, label='c')
+        statistics.add({'diagnostics': _diagnostics(None, cached=True)}, label='a')
+        statistics.add({'error': 'BrokenProcessPool', 't_flame_K': 0}, label='d')
+
+        summary = statistics.summary()
+        self.assertEqual((summary['cases'], summary['cached'], summary['failed']), (6, 1, 1))
+        self.assertEqual(summary['hp_solvers'], {'vcs': 1, 'auto': 2, 'vcs_relaxed': 1})
+        self.assertEqual(summary['fallback_cases'][0], ('b', 2))
+        self.assertAlmostEqual(summary['stage_seconds']['hp_equilibrate'], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from ancp_sim.cache import ResultCache
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.optimize import optimize_composition
+from ancp_sim.thermo import ThermoEngine
+
+INGREDIENTS = ["Ammonium Nitrate", "Potassium Nitrate", "Castor Oil"]
+START = {"Ammonium Nitrate": 70.0, "Potassium Nitrate": 15.0, "Castor Oil": 15.0}
+BOUNDS = {"Castor Oil": (5.0, 20.0), "Potassium Nitrate": (0.0, 15.0)}
+CONFIG = {"efficiencies": {"combustion_efficiency": 0.90}}
+
+
+class TestOptimizeComposition(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = load_chemdb()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = ThermoEngine(cache=ResultCache(os.path.join(self.tmpdir.name, 'results.sqlite')))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def optimize(self, **kwargs):
+        return optimize_composition(self.db, CONFIG, INGREDIENTS, bounds=BOUNDS, initial_recipe=START,
+                                    engine=self.engine, **kwargs)
+
+    def test_improves_within_bounds(self):
+        """Test that the optimum beats the start, sums to 100% and respects the bounds."""
+        start = self.engine.calculate(START, self.db, CONFIG)
+        result = self.optimize()
+        self.assertTrue(result['success'], result['message'])
+        recipe = result['recipe']
+        self.assertAlmostEqual(sum(recipe.values()), 100.0, places=6)
+        for name, (low, high) in BOUNDS.items():
+            self.assertGreaterEqual(recipe[name], low - 1e-6)
+            self.assertLessEqual(recipe[name], high + 1e-6)
+        self.assertGreater(result['results']['isp_vacuum_sec_delivered'], start['isp_vacuum_sec_delivered'])
+        # Memoization: the gradient steps of objective and constraints share solves
+        self.assertLess(result['solves'], result['evaluations'])
+        self.assertLess(result['solves'], 200)
+
+    def test_constraints_are_respected(self):
+        """Test that flame temperature, oxygen balance and density limits hold at the optimum."""
+        result = self.optimize(objective='cstar', flame_temperature=(None, 1600.0), oxygen_balance=(-45.0, None),
+                               min_density=1.5)
+        self.assertTrue(result['success'], result['message'])
+        self.assertLessEqual(result['results']['t_flame_K'], 1600.0 + 0.1)
+        self.assertGreaterEqual(result['oxygen_balance_percent'], -45.0 - 1e-6)
+        self.assertGreaterEqual(result['density_g_cm3'], 1.5 - 1e-6)
+
+    def test_repeated_run_hits_the_cache(self):
+        """Test that repeating a search needs no new equilibrium solves."""
+        first = self.optimize()
+        second = self.optimize()
+        self.assertEqual(second['solves'], 0)
+        self.assertEqual(second['cache_hits'], first['solves'])
+        self.assertEqual(second['recipe'], first['recipe'])
+
+    def test_start_without_optimized_ingredients(self):
+        """Test that a start recipe sharing no ingredient with the optimized set falls back to mid-bounds."""
+        result = optimize_composition(self.db, CONFIG, INGREDIENTS, bounds=BOUNDS, engine=self.engine,
+                                      initial_recipe={"Magnesium": 100.0})
+        self.assertTrue(result['success'], result['message'])
+        self.assertAlmostEqual(sum(result['recipe'].values()), 100.0, places=6)
+
+    def test_invalid_bounds(self):
+        """Test that unsatisfiable bounds and unknown ingredients are rejected."""
+        with self.assertRaises(ValueError):
+            optimize_composition(self.db, CONFIG, INGREDIENTS, bounds={"Castor Oil": (0.0, 10.0),
+                                                                       "Ammonium Nitrate": (0.0, 50.0),
+                                                                       "Potassium Nitrate": (0.0, 20.0)})
+        with self.assertRaises(ValueError):
+            optimize_composition(self.db, CONFIG, INGREDIENTS + ["Unobtainium"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import pickle
+import subprocess
+import sys
+import unittest
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.config import Config, DEFAULT_CONFIG
+from ancp_sim.performance import (ChamberState, performance, config_sweep, burn_rate_law, burn_rate_mm_s,
+                                  two_phase_efficiency)
+from ancp_sim.thermo import ThermoEngine
+
+RECIPE = {"Ammonium Nitrate": 80.0, "Potassium Nitrate": 10.0, "Castor Oil": 10.0}
+STATE = ChamberState(70.0, 1600.0, 1.24, 23.0, {'H2O': 0.4, 'N2': 0.3, 'CO2': 0.3})
+
+
+class TestConfig(unittest.TestCase):
+
+    def test_immutable(self):
+        """Test that configs cannot be modified and that replace returns a changed copy."""
+        with self.assertRaises(TypeError):
+            DEFAULT_CONFIG['burn_rate']['a'] = 5.0
+        changed = DEFAULT_CONFIG.replace({'burn_rate.a': 5.0, 'nozzle.area_ratio': 10.0})
+        self.assertEqual(DEFAULT_CONFIG['burn_rate']['a'], 3.5)
+        self.assertEqual(changed['burn_rate']['a'], 5.0)
+        self.assertEqual(changed['nozzle'], {'area_ratio': 10.0})
+        with self.assertRaises(ValueError):
+            DEFAULT_CONFIG.replace({'burn_rate.a.b': 1.0})
+
+    def test_mapping_behaviour(self):
+        """Test equality with plain dicts, hashing and pickling for worker processes."""
+        data = DEFAULT_CONFIG.to_dict()
+        self.assertEqual(DEFAULT_CONFIG, data)
+        self.assertEqual(hash(Config(data)), hash(DEFAULT_CONFIG))
+        self.assertEqual(pickle.loads(pickle.dumps(DEFAULT_CONFIG)), DEFAULT_CONFIG)
+
+
+class TestPerformance(unittest.TestCase):
+
+    def test_matches_engine(self):
+        """Test that post-processing a chamber state reproduces `ThermoEngine.calculate`."""
+        db = load_chemdb()
+        engine = ThermoEngine()
+        state = engine.chamber_state(RECIPE, db, 70.0)
+        results = engine.calculate(RECIPE, db, DEFAULT_CONFIG, chamber_pressure_bar=70.0)
+        processed = performance(state, DEFAULT_CONFIG, RECIPE)
+        for key, value in processed.items():
+            if key != 'product_mole_fractions':
+                self.assertAlmostEqual(value, results[key], delta=1e-6 * abs(value), msg=key)
+
+    def test_config_sweep(self):
+        """Test that efficiency and burn-rate sweeps follow from one state."""
+        rows = config_sweep(STATE, DEFAULT_CONFIG, 'efficiencies.nozzle_efficiency', [0.5, 1.0])
+        self.assertEqual([row['efficiencies.nozzle_efficiency'] for row in rows], [0.5, 1.0])
+        self.assertAlmostEqual(rows[1]['isp_vacuum_sec_delivered'], 2 * rows[0]['isp_vacuum_sec_delivered'])
+        self.assertEqual(rows[0]['c_star_m_s'], rows[1]['c_star_m_s'])
+
+        rows = config_sweep(STATE, DEFAULT_CONFIG.to_dict(), 'burn_rate.n', [0.0, 1.0])
+        self.assertAlmostEqual(rows[0]['burn_rate_mm_s'], 3.5)
+        self.assertAlmostEqual(rows[1]['burn_rate_mm_s'], 3.5 * 7.0)
+
+    def test_catalyst(self):
+        """Test that the ferric oxide multiplier only applies above the threshold."""
+        self.assertEqual(burn_rate_law({"Ferric Oxide": 0.5}, DEFAULT_CONFIG), (3.5, 0.5))
+        a, n = burn_rate_law({"Ferric Oxide": 2.0}, DEFAULT_CONFIG)
+        self.assertAlmostEqual(a, 3.5 * 1.7)
+        self.assertIsNone(burn_rate_law({}, {"efficiencies": {}}))
+        self.assertAlmostEqual(burn_rate_mm_s(40.0, 2.0, 0.5), 4.0)
+
+    def test_two_phase_efficiency(self):
+        """Test the efficiency limits and that it replaces the fixed value only for multiphase states."""
+        state = ChamberState(70.0, 2800.0, 1.18, 26.0, condensed_mass_fraction=0.3, gas_gamma=1.24)
+        self.assertEqual(two_phase_efficiency(state, 0.0), 1.0)
+        lagging = two_phase_efficiency(state, 1.0)
+        self.assertLess(lagging, 1.0)
+        self.assertAlmostEqual(two_phase_efficiency(state, 0.5), (1.0 + lagging) / 2)
+
+        config = DEFAULT_CONFIG.replace({'two_phase.particle_lag': 1.0})
+        results = performance(state, config)
+        self.assertEqual(results['two_phase_efficiency'], lagging)
+        self.assertEqual(results['condensed_mass_fraction'], 0.3)
+        self.assertAlmostEqual(results['isp_vacuum_sec_delivered'],
+                               results['isp_vacuum_sec_ideal'] * 0.90 * 0.92 * lagging)
+        fixed = performance(STATE, config)
+        self.assertNotIn('two_phase_efficiency', fixed)
+        self.assertAlmostEqual(fixed['isp_vacuum_sec_delivered'], fixed['isp_vacuum_sec_ideal'] * 0.90 * 0.92 * 0.95)
+
+    def test_no_cantera_import(self):
+        """Test that post-processing does not import Cantera."""
+        code = ("import sys; from ancp_sim.performance import performance, ChamberState; "
+                "performance(ChamberState(70.0, 1600.0, 1.24, 23.0), {}); "
+                "sys.exit('cantera' in sys.modules)")
+        self.assertEqual(subprocess.run([sys.executable, '-c', code]).returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import math
+import os
+import tempfile
+import unittest
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.sensitivity import analyze, shift_ingredient, main, ENTHALPY_STEP_KJ_MOL
+from ancp_sim.thermo import ThermoEngine
+
+RECIPE = {"Ammonium Nitrate": 80.0, "Potassium Nitrate": 10.0, "Castor Oil": 10.0}
+CONFIG = {"efficiencies": {"combustion_efficiency": 0.90}}
+
+
+class TestSensitivity(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = load_chemdb()
+        cls.reports = analyze([('good', {'propellant_name': 'Good', 'composition': RECIPE}),
+                               ('bad', {'composition': {"Unobtainium": 100.0}})],
+                              cls.db, CONFIG, workers=1)
+
+    def test_shift_ingredient(self):
+        """Test that the other ingredients are rescaled proportionally to keep 100%."""
+        shifted = shift_ingredient(RECIPE, "Castor Oil", 12.0)
+        self.assertAlmostEqual(sum(shifted.values()), 100.0)
+        self.assertAlmostEqual(shifted["Ammonium Nitrate"] / shifted["Potassium Nitrate"], 8.0)
+        with self.assertRaises(ValueError):
+            shift_ingredient({"Ammonium Nitrate": 100.0}, "Ammonium Nitrate", 90.0)
+
+    def test_ranked_report(self):
+        """Test the parameters, their ranking and a derivative against a direct finite difference."""
+        good, bad = self.reports
+        self.assertEqual(good['failed'], 0)
+        self.assertEqual(len(good['sensitivities']), 2 * len(RECIPE) + 1)
+        ranks = [max(abs(e) for e in row['elasticities'].values()) for row in good['sensitivities']]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+        rows = {row['parameter']: row for row in good['sensitivities']}
+        engine = ThermoEngine()
+        low = engine.calculate(shift_ingredient(RECIPE, "Castor Oil", 9.5), self.db, CONFIG)
+        high = engine.calculate(shift_ingredient(RECIPE, "Castor Oil", 10.5), self.db, CONFIG)
+        self.assertAlmostEqual(rows['composition:Castor Oil']['derivatives']['t_flame_K'],
+                               high['t_flame_K'] - low['t_flame_K'], delta=0.5)
+        # More energetic reactants give a hotter flame; higher pressure a higher Isp
+        self.assertGreater(rows['enthalpy:Ammonium Nitrate']['derivatives']['t_flame_K'], 0.0)
+        self.assertGreater(rows['chamber_pressure']['derivatives']['isp_vacuum_sec_delivered'], 0.0)
+        # A nonzero enthalpy is normalized by its magnitude, independent of the step
+        nitrate = rows['enthalpy:Ammonium Nitrate']
+        self.assertEqual((nitrate['scale'], nitrate['per_step']), (abs(nitrate['value']), False))
+        self.assertAlmostEqual(nitrate['elasticities']['t_flame_K'], nitrate['derivatives']['t_flame_K']
+                               * abs(nitrate['value']) / good['base']['t_flame_K'])
+
+        self.assertIn('error', bad['base'])
+        self.assertEqual(bad['sensitivities'], [])
+
+    def test_zero_enthalpy_ingredient(self):
+        """Test that an ingredient with a zero enthalpy of formation gets an elasticity per enthalpy step."""
+        self.assertEqual(self.db["Magnesium"]["enthalpy_formation_kJ_mol"], 0.0)
+        recipe = {"Ammonium Nitrate": 80.0, "Magnesium": 10.0, "Castor Oil": 10.0}
+        report, = analyze([('mg', {'composition': recipe})], self.db, CONFIG, workers=1)
+        row = next(row for row in report['sensitivities'] if row['parameter'] == 'enthalpy:Magnesium')
+        self.assertEqual(row['scale'], ENTHALPY_STEP_KJ_MOL)
+        self.assertTrue(row['per_step'])
+        derivative = row['derivatives']['t_flame_K']
+        self.assertGreater(derivative, 0.0)
+        self.assertAlmostEqual(row['elasticities']['t_flame_K'],
+                               derivative * ENTHALPY_STEP_KJ_MOL / report['base']['t_flame_K'])
+
+    def test_main(self):
+        """Test the command line with a JSON report."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'report.json')
+            status = main(['data/example_recipe.json', '--workers', '1', '--quiet', '--report', path])
+            self.assertEqual(status, 0)
+            with open(path) as f:
+                reports = json.load(f)
+        self.assertEqual(len(reports), 1)
+        self.assertTrue(all(not math.isnan(row['derivatives']['c_star_m_s']) for row in reports[0]['sensitivities']))
+
+
+if __name__ == '__main__':
+    unittest.main()
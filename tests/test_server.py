@@ -0,0 +1,114 @@
+import asyncio
+import io
+import json
+import unittest
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.server import SimulationService, parse_case, serve_http, serve_stdio
+
+RECIPE = {"Ammonium Nitrate": 80.0, "Potassium Nitrate": 10.0, "Castor Oil": 10.0}
+CONFIG = {"efficiencies": {"combustion_efficiency": 0.90}}
+
+
+class TestSimulationService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = SimulationService(load_chemdb(), CONFIG, workers=1).__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.__exit__(None, None, None)
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_parse_case(self):
+        """Test that cases are validated and the chamber pressure defaults to 70 bar."""
+        self.assertEqual(parse_case({'recipe': RECIPE}), (RECIPE, 70.0))
+        self.assertEqual(parse_case({'recipe': RECIPE, 'chamber_pressure_bar': 50}), (RECIPE, 50.0))
+        for case in ({}, {'recipe': {}}, {'recipe': {'Magnesium': 'ten'}}, {'recipe': RECIPE, 'chamber_pressure_bar': -1}):
+            with self.assertRaises(ValueError):
+                parse_case(case)
+
+    def test_single_and_batch(self):
+        """Test that a single case returns a result dict and a batch a list in request order."""
+        single = self.run_async(self.service.calculate({'recipe': RECIPE, 'chamber_pressure_bar': 70}))
+        self.assertIn('isp_vacuum_sec_delivered', single)
+        batch = self.run_async(self.service.calculate({'cases': [
+            {'recipe': RECIPE, 'chamber_pressure_bar': 40},
+            {'recipe': {"Unobtainium": 100.0}},
+            {'recipe': RECIPE, 'chamber_pressure_bar': 70},
+        ]}))
+        self.assertEqual(len(batch), 3)
+        self.assertIn('error', batch[1])
+        self.assertAlmostEqual(batch[2]['t_flame_K'], single['t_flame_K'], delta=0.1)
+        self.assertLess(batch[0]['t_flame_K'], batch[2]['t_flame_K'])
+
+        stats = self.service.statistics.as_dict()
+        self.assertGreaterEqual(stats['requests'], 2)
+        self.assertGreaterEqual(stats['cases'], 4)
+        self.assertGreaterEqual(stats['failed'], 1)
+        self.assertEqual(stats['case_latency_ms']['count'], stats['cases'])
+        self.assertGreater(stats['case_latency_ms']['percentiles']['p50'], 0.0)
+
+    def test_jsonrpc(self):
+        """Test JSON-RPC results, errors and notifications."""
+        handle = lambda message: self.run_async(self.service.handle_jsonrpc(message))
+        response = handle(json.dumps({'jsonrpc': '2.0', 'id': 7, 'method': 'calculate', 'params': {'recipe': RECIPE}}))
+        self.assertEqual(response['id'], 7)
+        self.assertIn('c_star_m_s', response['result'])
+        self.assertEqual(handle('{not json')['error']['code'], -32700)
+        self.assertEqual(handle(json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'nope'}))['error']['code'], -32601)
+        self.assertEqual(handle(json.dumps({'jsonrpc': '2.0', 'id': 2, 'method': 'calculate', 'params': {}}))['error']['code'],
+                         -32602)
+        self.assertIsNone(handle(json.dumps({'jsonrpc': '2.0', 'method': 'stats'})))
+
+    def test_stdio(self):
+        """Test that every line of stdin gets a response on stdout."""
+        stdin = io.StringIO(json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'stats'}) + '\n\n' +
+                            json.dumps({'jsonrpc': '2.0', 'id': 2, 'method': 'calculate', 'params': {'recipe': RECIPE}}) + '\n')
+        stdout = io.StringIO()
+        self.run_async(serve_stdio(self.service, stdin, stdout))
+        responses = {response['id']: response for response in map(json.loads, stdout.getvalue().splitlines())}
+        self.assertEqual(set(responses), {1, 2})
+        self.assertIn('throughput_cases_per_s', responses[1]['result'])
+
+    def test_http(self):
+        """Test a keep-alive HTTP connection with a calculation, the counters and an unknown path."""
+        async def exchange():
+            bound = asyncio.get_running_loop().create_future()
+            server = asyncio.ensure_future(serve_http(self.service, '127.0.0.1', 0, ready=bound.set_result))
+            host, port = await bound
+            reader, writer = await asyncio.open_connection(host, port)
+
+            async def request(method, path, payload=None):
+                body = json.dumps(payload).encode() if payload is not None else b''
+                writer.write(f"{method} {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+                status = int((await reader.readline()).split()[1])
+                headers = {}
+                while (line := await reader.readline()) != b'\r\n':
+                    name, _, value = line.decode().partition(':')
+                    headers[name.lower()] = value.strip()
+                return status, json.loads(await reader.readexactly(int(headers['content-length'])))
+
+            try:
+                return [
+                    await request('POST', '/calculate', {'cases': [{'recipe': RECIPE}]}),
+                    await request('GET', '/stats'),
+                    await request('GET', '/nowhere'),
+                    await request('POST', '/calculate', {'recipe': 5}),
+                ]
+            finally:
+                writer.close()
+                server.cancel()
+
+        (status, results), (_, stats), (missing, _), (invalid, _) = self.run_async(exchange())
+        self.assertEqual(status, 200)
+        self.assertIn('gamma', results[0])
+        self.assertGreaterEqual(stats['cases'], 1)
+        self.assertEqual((missing, invalid), (404, 400))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 import os
 import json
-from ancp_sim.stoichiometry import calculate_stoichiometry
+from ancp_sim.stoichiometry import calculate_stoichiometry, StoichiometryMatrix
 from ancp_sim.chemdb import load_ingredients
 
 class TestStoichiometry(unittest.TestCase):
@@ -46,6 +46,34 @@ class TestStoichiometry(unittest.TestCase):
         self.assertAlmostEqual(results['elemental_moles']['C'], 0.908, places=3)
         self.assertAlmostEqual(results['reactant_enthalpy_kJ_100g'], -335.0, places=1)
         self.assertAlmostEqual(results['oxygen_balance_percent'], -40.4087, places=4) # Increased precision
+    def test_batch_matches_scalar(self):
+        """Test that the vectorized batch API reproduces calculate_stoichiometry row by row."""
+        recipes = [
+            {"Ammonium Nitrate": 100.0},
+            {
+                "Ammonium Nitrate": 65.0,
+                "Potassium Nitrate": 5.0,
+                "Magnesium": 15.0,
+                "Castor Oil": 7.5,
+                "Methylene Diphenyl Diisocyanate": 7.5
+            }
+        ]
+        matrix = StoichiometryMatrix(self.db)
+        batch = matrix.calculate(matrix.mass_fractions(recipes))
+
+        for row, recipe in enumerate(recipes):
+            scalar = calculate_stoichiometry(recipe, self.db)
+            for element, moles in scalar['elemental_moles'].items():
+                column = batch['elements'].index(element)
+                self.assertAlmostEqual(batch['elemental_moles'][row, column], moles, places=9)
+            self.assertAlmostEqual(batch['reactant_enthalpy_kJ_100g'][row], scalar['reactant_enthalpy_kJ_100g'], places=9)
+            self.assertAlmostEqual(batch['oxygen_balance_percent'][row], scalar['oxygen_balance_percent'], places=9)
+
+    def test_batch_rejects_wrong_width(self):
+        """Test that a mass-fraction array with the wrong number of columns is rejected."""
+        matrix = StoichiometryMatrix(self.db, ["Ammonium Nitrate", "Magnesium"])
+        with self.assertRaises(ValueError):
+            matrix.calculate([[0.5, 0.25, 0.25]])
 
 if __name__ == '__main__':
     unittest.main()
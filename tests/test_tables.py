@@ -0,0 +1,61 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from ancp_sim.tables import ThermoTable, axis_recipe, generate_table
+from ancp_sim.chemdb import ChemDB
+
+
+class TestThermoTable(unittest.TestCase):
+
+    def setUp(self):
+        """Build a synthetic table that is linear in log(p) and composition."""
+        pressures = [10.0, 50.0, 200.0]
+        magnesium = [0.0, 10.0, 20.0]
+        log_p, mg = np.meshgrid(np.log(pressures), magnesium, indexing='ij')
+        meta = {
+            'axes': [{'name': 'chamber_pressure_bar', 'values': pressures},
+                     {'name': 'Magnesium', 'values': magnesium}],
+            'quantities': ['c_star_m_s'],
+        }
+        self.table = ThermoTable(meta, {'c_star_m_s': 1000.0 + 10.0 * log_p + 5.0 * mg})
+
+    def test_interpolation_is_exact_for_linear_data(self):
+        """Test multilinear interpolation on vectorized query points."""
+        pressures = np.array([10.0, 30.0, 70.0, 200.0])
+        magnesium = np.array([0.0, 2.5, 15.0, 20.0])
+        values = self.table.interpolate('c_star_m_s', pressures, magnesium)
+        np.testing.assert_allclose(values, 1000.0 + 10.0 * np.log(pressures) + 5.0 * magnesium)
+
+    def test_out_of_range(self):
+        """Test that queries outside the grid are reported, returned as NaN or clipped."""
+        pressures, magnesium = [70.0, 300.0], [5.0, 5.0]
+        np.testing.assert_array_equal(self.table.out_of_range(pressures, magnesium), [False, True])
+        with self.assertRaises(ValueError):
+            self.table.interpolate('c_star_m_s', pressures, magnesium)
+        values = self.table.interpolate('c_star_m_s', pressures, magnesium, bounds='nan')
+        self.assertTrue(np.isnan(values[1]))
+        clipped = self.table.interpolate('c_star_m_s', pressures, magnesium, bounds='clip')
+        self.assertAlmostEqual(clipped[1], 1000.0 + 10.0 * np.log(200.0) + 25.0)
+
+    def test_axis_recipe_scales_other_ingredients(self):
+        """Test that non-axis ingredients are scaled to keep the total at 100%."""
+        recipe = axis_recipe({"Ammonium Nitrate": 80.0, "Castor Oil": 20.0, "Magnesium": 0.0}, {"Magnesium": 10.0})
+        self.assertAlmostEqual(recipe["Ammonium Nitrate"], 72.0)
+        self.assertAlmostEqual(recipe["Castor Oil"], 18.0)
+        self.assertAlmostEqual(sum(recipe.values()), 100.0)
+
+    def test_generate_and_reload(self):
+        """Test generating a small table and reading it back memory-mapped."""
+        db = ChemDB.load()
+        base = {"Ammonium Nitrate": 85.0, "Castor Oil": 15.0}
+        with tempfile.TemporaryDirectory() as path:
+            generate_table(path, base, db, {}, [50.0, 70.0], [("Castor Oil", [10.0, 15.0])], workers=1)
+            table = ThermoTable.load(path)
+            self.assertIsInstance(table.arrays['t_flame_K'], np.memmap)
+            self.assertEqual(table.meta['failed_points'], 0)
+            self.assertGreater(table.interpolate('t_flame_K', 60.0, 12.5), 1000.0)
+            del table
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import unittest
+import os
+import io
+import copy
+import contextlib
+from unittest import mock
+from ancp_sim.thermo import ThermoEngine
+from ancp_sim.chemdb import load_ingredients
+from ancp_sim.gibbs import NativeEngine
+from ancp_sim.stoichiometry import calculate_stoichiometry
+
+EXAMPLE_RECIPE = {
+    "Ammonium Nitrate": 65.0,
+    "Potassium Nitrate": 5.0,
+    "Magnesium": 15.0,
+    "Castor Oil": 7.5,
+    "Methylene Diphenyl Diisocyanate": 7.5
+}
+
+CONFIG = {
+    "efficiencies": {
+        "combustion_efficiency": 0.90,
+        "nozzle_efficiency": 0.92,
+        "two_phase_efficiency": 0.95
+    }
+}
+
+
+class TestThermoEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Share one engine so the product species are only loaded once."""
+        cls.db = load_ingredients(os.path.join(os.path.dirname(__file__), '..', 'data', 'ingredients.json'))
+        cls.engine = ThermoEngine()
+
+    def calculate(self, recipe, db, pc=70.0, engine=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return (engine or self.engine).calculate(recipe, db, CONFIG, chamber_pressure_bar=pc)
+
+    def test_solution_is_reused(self):
+        """Test that repeated calls with the same reactants share a Solution."""
+        first = self.engine.get_solution(EXAMPLE_RECIPE, self.db)
+        second = self.engine.get_solution(dict(EXAMPLE_RECIPE, Magnesium=10.0), self.db)
+        self.assertIs(first, second)
+
+    def test_redefined_ingredient_gets_its_own_solution(self):
+        """Test that an ingredient redefined under the same name is solved with its new formula and enthalpy."""
+        recipe = {"Ammonium Nitrate": 90.0, "Fuel": 10.0}
+        hydrogen = dict(self.db, Fuel={"formula": "H2", "enthalpy_formation_kJ_mol": 0.0,
+                                       "molecular_weight_g_mol": 2.016})
+        methane = dict(self.db, Fuel={"formula": "CH4", "enthalpy_formation_kJ_mol": -74.87,
+                                      "molecular_weight_g_mol": 16.043})
+        heated = dict(hydrogen, Fuel=dict(hydrogen["Fuel"], enthalpy_formation_kJ_mol=50.0))
+        engine = ThermoEngine()
+        for db in (hydrogen, methane, heated):
+            reused = self.calculate(recipe, db, engine=engine)
+            fresh = self.calculate(recipe, db, engine=ThermoEngine())
+            self.assertAlmostEqual(reused['t_flame_K'], fresh['t_flame_K'], delta=0.01)
+            self.assertEqual('CO2' in reused['product_mole_fractions'], db is methane)
+
+    def test_species_filtered_by_elements(self):
+        """Test that only products formed from the recipe's elements are selected."""
+        species = self.engine.product_species_for({'H', 'N', 'O'})
+        names = [sp.name for sp in species]
+        self.assertIn('H2O', names)
+        self.assertNotIn('CO2', names)
+        self.assertTrue(all(set(sp.composition) <= {'H', 'N', 'O'} for sp in species))
+        self.assertIs(species, self.engine.product_species_for({'O', 'N', 'H'}))
+
+        self.assertNotIn('MgO(s)', [sp.name for sp in self.engine.product_species_for({'Mg', 'O'})])
+        metallized = [sp.name for sp in self.engine.condensed_species_for({'Mg', 'O'})]
+        self.assertIn('MgO(s)', metallized)
+        self.assertNotIn('MgO(L)', metallized)
+
+    def test_example_recipe_performance(self):
+        """Test the flame temperature and Isp of the example recipe."""
+        results = self.calculate(EXAMPLE_RECIPE, self.db)
+        self.assertNotIn('error', results)
+        self.assertAlmostEqual(results['t_flame_K'], 1785.1, delta=1.0)
+        self.assertAlmostEqual(results['isp_vacuum_sec_ideal'], 264.3, delta=0.2)
+        self.assertTrue(15.0 < results['product_molecular_weight_g_mol'] < 30.0)
+        # The single-phase model holds gaseous products only
+        condensed = {sp.name for sp in self.engine.product_species[1]}
+        self.assertFalse(condensed & set(results['product_mole_fractions']))
+
+    def test_flame_temperature_rises_with_pressure(self):
+        """Test that higher pressure suppresses dissociation, as no condensed species count as gas moles."""
+        temperatures = [self.calculate(EXAMPLE_RECIPE, self.db, pc=pc)['t_flame_K'] for pc in (20.0, 70.0, 150.0)]
+        self.assertEqual(temperatures, sorted(temperatures))
+
+
+    def test_product_mole_fractions(self):
+        """Test that the results carry the full equilibrium composition."""
+        results = self.calculate(EXAMPLE_RECIPE, self.db)
+        fractions = results['product_mole_fractions']
+        self.assertAlmostEqual(sum(fractions.values()), 1.0, places=6)
+        self.assertIn('H2O', fractions)
+        self.assertTrue(all(x > 0 for x in fractions.values()))
+
+    def test_diagnostics(self):
+        """Test that the results report the solver path and per-stage timings."""
+        diagnostics = self.calculate(EXAMPLE_RECIPE, self.db)['diagnostics']
+        self.assertEqual(diagnostics['hp_solver'], 'vcs')
+        self.assertIn('hp_equilibrate', diagnostics['stages_s'])
+        self.assertGreater(diagnostics['total_s'], 0.0)
+        self.assertFalse(diagnostics['cached'])
+    def test_enthalpy_update_matches_fresh_engine(self):
+        """Test that a changed enthalpy of formation is picked up by a cached Solution."""
+        self.engine.get_solution(EXAMPLE_RECIPE, self.db)
+        db = copy.deepcopy(self.db)
+        db["Methylene Diphenyl Diisocyanate"]["enthalpy_formation_kJ_mol"] = -50.0
+        cached = self.calculate(EXAMPLE_RECIPE, db)
+        fresh = self.calculate(EXAMPLE_RECIPE, db, engine=ThermoEngine())
+        self.assertAlmostEqual(cached['t_flame_K'], fresh['t_flame_K'], places=6)
+    def test_sweep_matches_cold_solves(self):
+        """Test that a warm-started pressure sweep agrees with independent solves."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            table = self.engine.sweep(EXAMPLE_RECIPE, self.db, CONFIG, [40.0, 80.0])
+        self.assertEqual([row['chamber_pressure_bar'] for row in table], [40.0, 80.0])
+        cold = self.calculate(EXAMPLE_RECIPE, self.db, pc=80.0)
+        self.assertAlmostEqual(table[1]['t_flame_K'], cold['t_flame_K'], delta=0.1)
+        self.assertAlmostEqual(table[1]['c_star_m_s'], cold['c_star_m_s'], delta=0.1)
+
+    def test_warm_start_from_neighbouring_recipe(self):
+        """Test that a warm start from another recipe's products converges to the cold solution."""
+        neighbour = self.calculate(EXAMPLE_RECIPE, self.db)
+        recipe = dict(EXAMPLE_RECIPE, **{"Ammonium Nitrate": 67.0, "Magnesium": 13.0})
+        cold = self.calculate(recipe, self.db, engine=ThermoEngine())
+        warm = self.engine.calculate(recipe, self.db, CONFIG, chamber_pressure_bar=70.0,
+                                     warm_start=(neighbour['t_flame_K'], neighbour['product_mole_fractions']))
+        self.assertAlmostEqual(warm['t_flame_K'], cold['t_flame_K'], delta=0.1)
+        self.assertAlmostEqual(warm['isp_vacuum_sec_delivered'], cold['isp_vacuum_sec_delivered'], delta=0.01)
+    def test_frozen_nozzle(self):
+        """Test frozen expansion against the closed-form C* and its own area-ratio inversion."""
+        results = self.calculate(EXAMPLE_RECIPE, self.db)
+        with contextlib.redirect_stdout(io.StringIO()):
+            nozzle = self.engine.nozzle(EXAMPLE_RECIPE, self.db, 70.0, area_ratios=[10.0], exit_pressures_bar=[0.5])
+        self.assertAlmostEqual(nozzle['c_star_m_s'], results['c_star_m_s'], delta=0.005 * results['c_star_m_s'])
+        by_ratio, by_pressure = nozzle['points']
+        self.assertAlmostEqual(by_ratio['area_ratio'], 10.0, places=4)
+        self.assertGreater(by_ratio['exit_mach'], 1.0)
+        self.assertGreater(by_pressure['area_ratio'], by_ratio['area_ratio'])
+        self.assertLess(by_ratio['isp_ambient_sec'], by_ratio['isp_vacuum_sec'])
+
+    def test_nozzle_from_solved_chamber(self):
+        """Test that a nozzle from an already solved chamber state skips the solve and gives the same expansion."""
+        state = self.engine.chamber_state(EXAMPLE_RECIPE, self.db, 70.0)
+        solved = self.engine.nozzle(EXAMPLE_RECIPE, self.db, 70.0, area_ratios=[10.0], mode='shifting')
+        with mock.patch.object(self.engine, 'equilibrate', side_effect=AssertionError("chamber solved again")):
+            restored = self.engine.nozzle(EXAMPLE_RECIPE, self.db, 70.0, area_ratios=[10.0], mode='shifting',
+                                          chamber=state)
+        self.assertAlmostEqual(restored['c_star_m_s'], solved['c_star_m_s'], delta=1e-6 * solved['c_star_m_s'])
+        self.assertAlmostEqual(restored['points'][0]['isp_vacuum_sec'], solved['points'][0]['isp_vacuum_sec'],
+                               delta=1e-3)
+
+    def test_shifting_nozzle_exceeds_frozen(self):
+        """Test that shifting equilibrium delivers at least the frozen Isp at the same area ratio."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            frozen = self.engine.nozzle(EXAMPLE_RECIPE, self.db, 70.0, area_ratios=[8.0], mode='frozen')
+            shifting = self.engine.nozzle(EXAMPLE_RECIPE, self.db, 70.0, area_ratios=[8.0], mode='shifting')
+        self.assertGreaterEqual(shifting['points'][0]['isp_vacuum_sec'], frozen['points'][0]['isp_vacuum_sec'])
+
+
+class TestMultiphase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = load_ingredients(os.path.join(os.path.dirname(__file__), '..', 'data', 'ingredients.json'))
+        cls.engine = ThermoEngine(multiphase=True)
+
+    def test_conserves_elements_and_enthalpy(self):
+        """Test that the equilibrium keeps the reactant elements and enthalpy, with MgO as a condensed phase."""
+        mixture = self.engine.equilibrate_multiphase(EXAMPLE_RECIPE, self.db, 70.0)
+        stoichiometry = calculate_stoichiometry(EXAMPLE_RECIPE, self.db)
+        for element, moles in stoichiometry['elemental_moles'].items():
+            self.assertAlmostEqual(mixture.element_moles(element) * 1000, moles, delta=1e-8 * moles)
+        enthalpy = sum(mixture.phase(i).enthalpy_mole * mixture.phase_moles(i) for i in range(mixture.n_phases))
+        self.assertAlmostEqual(enthalpy / 1000, stoichiometry['reactant_enthalpy_kJ_100g'], delta=1e-3)
+
+        state = self.engine.chamber_state(EXAMPLE_RECIPE, self.db, 70.0)
+        self.assertGreater(state.product_mole_fractions['MgO(s)'], 0.1)
+        # Nearly all the magnesium ends up as MgO(s): 15 g Mg -> 24.9 g MgO
+        self.assertAlmostEqual(state.condensed_mass_fraction, 0.249, delta=0.01)
+        self.assertLess(state.gamma, state.gas_gamma)
+        self.assertAlmostEqual(sum(state.product_mole_fractions.values()), 1.0)
+
+    def test_phases_are_reused(self):
+        """Test that recipes with the same elements share one Mixture."""
+        first = self.engine.get_mixture({'C', 'H', 'K', 'Mg', 'N', 'O'})
+        self.engine.chamber_state(dict(EXAMPLE_RECIPE, Magnesium=10.0), self.db, 50.0)
+        self.assertIs(first, self.engine.get_mixture({'O', 'N', 'Mg', 'K', 'H', 'C'}))
+        self.assertNotEqual(self.engine.species_hash, ThermoEngine().species_hash)
+
+    def test_gas_only_matches_native_engine(self):
+        """Test that without stable condensed products the result is the gas equilibrium of the native engine."""
+        recipe = {"Ammonium Nitrate": 100.0}
+        state = self.engine.chamber_state(recipe, self.db, 70.0)
+        native, error, _ = NativeEngine().chamber_states([recipe], self.db, 70.0)[0]
+        self.assertIsNone(error)
+        self.assertEqual(state.condensed_mass_fraction, 0.0)
+        self.assertAlmostEqual(state.t_flame_K, native.t_flame_K, delta=1e-3)
+        self.assertAlmostEqual(state.gamma, native.gamma, delta=1e-5)
+        self.assertAlmostEqual(state.molecular_weight_g_mol, native.molecular_weight_g_mol, delta=1e-4)
+
+    def test_calculate_and_sweep(self):
+        """Test the results, sweep and the unsupported nozzle expansion."""
+        config = dict(CONFIG, two_phase={"particle_lag": 0.5})
+        results = self.engine.calculate(EXAMPLE_RECIPE, self.db, config, chamber_pressure_bar=70.0)
+        self.assertGreater(results['condensed_mass_fraction'], 0.2)
+        self.assertLess(results['two_phase_efficiency'], 1.0)
+        self.assertEqual(results['diagnostics']['hp_solver'], 'vcs')
+        sweep = self.engine.sweep(EXAMPLE_RECIPE, self.db, config, [70.0, 100.0])
+        self.assertAlmostEqual(sweep[0]['t_flame_K'], results['t_flame_K'], delta=1e-6)
+        self.assertGreater(sweep[1]['t_flame_K'], sweep[0]['t_flame_K'])
+        with self.assertRaises(ValueError):
+            self.engine.nozzle(EXAMPLE_RECIPE, self.db, 70.0, area_ratios=[8.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
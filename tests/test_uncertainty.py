@@ -0,0 +1,97 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import numpy as np
+from ancp_sim.chemdb import load_chemdb
+from ancp_sim.uncertainty import (P2Quantile, RunningStatistics, UncertaintyStatistics, sample_chunks, run_samples,
+                                  main)
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+RECIPE = {"Ammonium Nitrate": 80.0, "Potassium Nitrate": 10.0, "Castor Oil": 10.0}
+CONFIG = {"efficiencies": {"combustion_efficiency": 0.90}}
+
+
+class TestStreamingStatistics(unittest.TestCase):
+
+    def test_p2_matches_exact_percentiles(self):
+        """Test that the P-square estimates agree with exact percentiles of a large sample."""
+        values = np.random.default_rng(1).normal(1600.0, 40.0, 20000)
+        for percentile in (5, 50, 95):
+            quantile = P2Quantile(percentile)
+            for x in values:
+                quantile.add(x)
+            self.assertAlmostEqual(quantile.value, np.percentile(values, percentile), delta=2.0)
+
+    def test_running_moments(self):
+        """Test the Welford mean and standard deviation, and exact percentiles for tiny samples."""
+        values = np.random.default_rng(2).uniform(0.0, 10.0, 1000)
+        statistics = RunningStatistics()
+        for x in values:
+            statistics.add(x)
+        self.assertAlmostEqual(statistics.mean, values.mean(), places=10)
+        self.assertAlmostEqual(statistics.std, values.std(ddof=1), places=10)
+        self.assertEqual((statistics.min, statistics.max), (values.min(), values.max()))
+
+        few = RunningStatistics(percentiles=(50,))
+        for x in (3.0, 1.0, 2.0):
+            few.add(x)
+        self.assertEqual(few.as_dict()['percentiles'], {'p50': 2.0})
+
+    def test_failed_samples_are_counted(self):
+        """Test that failed samples are counted but excluded from the statistics."""
+        statistics = UncertaintyStatistics(quantities=('t_flame_K',))
+        statistics.add({'t_flame_K': 1500.0})
+        statistics.add({'error': 'Equilibration failed', 't_flame_K': 0})
+        summary = statistics.summary()
+        self.assertEqual((summary['samples'], summary['failed']), (2, 1))
+        self.assertEqual(summary['quantities']['t_flame_K']['mean'], 1500.0)
+
+
+class TestSampling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = load_chemdb()
+
+    def test_chunks_are_reproducible_and_normalized(self):
+        """Test that samples sum to 100%, only perturb requested enthalpies and repeat for a seed."""
+        first = [s for chunk in sample_chunks(RECIPE, self.db, 40, 1.0, {"Castor Oil": 50.0}, seed=7) for s in chunk]
+        second = [s for chunk in sample_chunks(RECIPE, self.db, 40, 1.0, {"Castor Oil": 50.0}, seed=7) for s in chunk]
+        self.assertEqual(first, second)
+        self.assertEqual([index for index, _, _ in first], list(range(40)))
+        for _, recipe, enthalpies in first:
+            self.assertAlmostEqual(sum(recipe.values()), 100.0)
+            self.assertEqual(list(enthalpies), ["Castor Oil"])
+        self.assertGreater(np.std([e["Castor Oil"] for _, _, e in first]), 10.0)
+
+    def test_zero_noise_reproduces_nominal_case(self):
+        """Test that unperturbed samples all solve to the nominal result."""
+        records = list(run_samples(RECIPE, self.db, CONFIG, 3, 70.0, composition_sigma_pct=0.0, workers=1))
+        self.assertEqual(sorted(record['sample'] for record in records), [0, 1, 2])
+        flame_temperatures = {round(record['t_flame_K'], 6) for record in records}
+        self.assertEqual(len(flame_temperatures), 1)
+
+    def test_pool_yields_samples_in_order(self):
+        """Test that a process pool yields the same records in sample order as a single process."""
+        serial = list(run_samples(RECIPE, self.db, CONFIG, 40, 70.0, seed=3, workers=1))
+        pooled = list(run_samples(RECIPE, self.db, CONFIG, 40, 70.0, seed=3, workers=2))
+        self.assertEqual([record['sample'] for record in pooled], list(range(40)))
+        self.assertEqual([record['t_flame_K'] for record in pooled], [record['t_flame_K'] for record in serial])
+
+    def test_quiet_prints_only_the_summary(self):
+        """Test that quiet mode prints the summary as JSON and writes no samples unless asked to."""
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = main([os.path.join(ROOT, 'data', 'example_recipe.json'), '--samples', '4', '--workers', '1',
+                           '--config', os.path.join(ROOT, 'config.json'), '--quiet'])
+        self.assertIn(status, (None, 0))
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['samples'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
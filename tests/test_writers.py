@@ -0,0 +1,78 @@
+import unittest
+import csv
+import json
+import math
+import os
+import tempfile
+from ancp_sim.writers import open_writer, load_columns, JsonlWriter, CsvWriter, ColumnWriter
+
+FIRST = {
+    'recipe': 'a.json', 'propellant_name': 'A', 'chamber_pressure_bar': 50.0,
+    't_flame_K': 1600.0, 'gamma': 1.25, 'product_molecular_weight_g_mol': 24.0, 'c_star_m_s': 1200.0,
+    'isp_vacuum_sec_ideal': 250.0, 'isp_vacuum_sec_delivered': 200.0,
+    'product_mole_fractions': {'H2O': 0.6, 'N2': 0.4},
+}
+SECOND = dict(FIRST, chamber_pressure_bar=70.0, product_mole_fractions={'H2O': 0.5, 'N2': 0.3, 'MgO(s)': 0.2})
+FAILED = {'recipe': 'b.json', 'propellant_name': 'B', 'chamber_pressure_bar': 70.0,
+          'error': 'CanteraError: no convergence', 't_flame_K': 0}
+
+
+class TestWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_format_from_extension(self):
+        """Test that the format defaults to CSV for .csv paths and JSONL otherwise."""
+        for name, cls in (('out.csv', CsvWriter), ('out.jsonl', JsonlWriter)):
+            with open_writer(os.path.join(self.dir, name)) as writer:
+                self.assertIsInstance(writer, cls)
+        with open_writer(os.path.join(self.dir, 'cols'), 'npy') as writer:
+            self.assertIsInstance(writer, ColumnWriter)
+        with self.assertRaises(ValueError):
+            open_writer('-', 'npy')
+
+    def test_jsonl_round_trip(self):
+        """Test that every record is written as one JSON line."""
+        path = os.path.join(self.dir, 'out.jsonl')
+        with open_writer(path) as writer:
+            for record in (FIRST, FAILED):
+                writer.write(record)
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records, [FIRST, FAILED])
+
+    def test_csv_rows(self):
+        """Test the CSV columns, the product column and blank results of failed cases."""
+        path = os.path.join(self.dir, 'out.csv')
+        with open_writer(path) as writer:
+            writer.write(FIRST)
+            writer.write(FAILED)
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(float(rows[0]['c_star_m_s']), 1200.0)
+        self.assertEqual(json.loads(rows[0]['product_mole_fractions']), FIRST['product_mole_fractions'])
+        self.assertEqual(rows[1]['t_flame_K'], '')
+        self.assertEqual(rows[1]['error'], FAILED['error'])
+
+    def test_columns_backfill_new_species(self):
+        """Test that species first seen later are zero in earlier rows and failed rows are NaN."""
+        path = os.path.join(self.dir, 'cols')
+        with open_writer(path, 'npy') as writer:
+            for record in (FIRST, SECOND, FAILED):
+                writer.write(record)
+        columns, labels = load_columns(path)
+        self.assertEqual(list(columns['chamber_pressure_bar']), [50.0, 70.0, 70.0])
+        self.assertEqual(list(columns['X_MgO(s)']), [0.0, 0.2, 0.0])
+        self.assertEqual(list(columns['X_H2O'][:2]), [0.6, 0.5])
+        self.assertTrue(math.isnan(columns['t_flame_K'][2]))
+        self.assertEqual([label['propellant_name'] for label in labels], ['A', 'A', 'B'])
+        self.assertEqual(labels[2]['error'], FAILED['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()